@@ -0,0 +1,186 @@
+"""
+Бенчмарк разбора ответов Targets API в pydantic-модели.
+
+Сравнивает на синтетических данных:
+- граф карты: полную валидацию MapGraph, потоковый разбор (TARGETS_STREAM_MAP_GRAPH)
+  и сборку через model_construct без валидации; для загрузки с записью в дисковый
+  кэш — копию тела во временный файл и прежнюю сериализацию MapGraph;
+- список карт и КР: поэлементную валидацию и предсобранный TypeAdapter (parse_maps).
+
+Для каждого случая печатается лучшее время и пиковый прирост памяти (tracemalloc).
+
+Запуск:
+    python -m benchmarks.bench_parse --nodes 10000
+"""
+
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable
+
+from src.models.targets import (
+    GoalNode, GoalStatus, MapGraph, MapInfo, PeriodInfo, ResponsiblePerson,
+    StructuralUnitInfo, TargetsMap, KeyResult,
+)
+from src.services import json_stream, targets_api
+
+
+def make_graph(count: int) -> dict:
+    """Синтетический ответ GetTargetsMap: дерево из count узлов со всеми вложенными объектами."""
+    nodes = []
+    for i in range(count):
+        nodes.append({
+            "TargetId": i + 1,
+            "Id": str(i + 1),
+            "Code": f"T-{i + 1}",
+            "Name": f"Цель {i + 1}: повысить показатель направления {i % 40}",
+            "ParentId": str(i // 3) if i else None,
+            "ChildIds": [str(i * 3 + 2), str(i * 3 + 3)] if i * 3 + 3 <= count else [],
+            "Priority": ("High", "Medium", "Low")[i % 3],
+            "Progress": (i * 7) % 100,
+            "KeyResultCount": i % 5,
+            "Status": {"State": "Active", "Name": "В работе", "Icon": "play", "LastAchievementStatus": None},
+            "Responsible": {"Id": i % 200, "Name": f"Сотрудник {i % 200}", "TypeGuid": "b7905516"},
+            "StructuralUnit": {"Id": i % 30, "Name": f"Подразделение {i % 30}", "TypeGuid": "61b1c19f"},
+            "Period": {"Name": "I квартал 2026", "Code": "Q1-2026", "TimeFrame": "Quarter", "StartDate": "2026-01-01"},
+            "MapId": 1,
+            "ParentRelationType": "Decomposition",
+            "LinksCount": 0,
+        })
+    return {"Nodes": nodes, "Map": {"Id": 1, "Name": "Синтетическая карта", "Progress": 42.0}}
+
+
+def make_maps(count: int) -> dict:
+    """Синтетический ответ ITargetsTargetsMaps из count карт."""
+    return {"value": [
+        {"Id": i, "Name": f"Карта {i}", "Code": f"M-{i}", "PeriodLabel": "2026",
+         "AchievementPercentage": 12.5, "Status": "Active"}
+        for i in range(count)
+    ]}
+
+
+def make_key_results(count: int) -> dict:
+    """Синтетический ответ GetKeyResults из count КР."""
+    return {"Payload": {"Data": [
+        {"Description": f"КР {i}", "AchievementPercentage": "50", "Metric": "%", "PlannedValue": "100"}
+        for i in range(count)
+    ]}}
+
+
+def construct_graph(data: dict) -> MapGraph:
+    """Сборка графа через model_construct без валидации (вложенные модели — тоже через construct)."""
+    nested = {
+        "Status": GoalStatus, "Responsible": ResponsiblePerson,
+        "StructuralUnit": StructuralUnitInfo, "Period": PeriodInfo,
+    }
+    nodes = []
+    for raw in data["Nodes"]:
+        values = {key: value for key, value in raw.items() if key in GoalNode.model_fields}
+        for key, model in nested.items():
+            if isinstance(values.get(key), dict):
+                values[key] = model.model_construct(**values[key])
+        nodes.append(GoalNode.model_construct(**values))
+    return MapGraph.model_construct(Nodes=nodes, Map=MapInfo.model_construct(**data["Map"]))
+
+
+async def stream_graph(body: bytes, chunk_size: int = 64 * 1024, copy_to=None) -> MapGraph:
+    """Потоковый разбор тела ответа, как в targets_api.fetch_map_graph (с копией тела в copy_to)."""
+    async def chunks():
+        for i in range(0, len(body), chunk_size):
+            yield body[i:i + chunk_size]
+
+    source = chunks() if copy_to is None else targets_api._copy_chunks(chunks(), copy_to)
+    data = await json_stream.parse_object(source, {"Nodes": GoalNode.model_validate})
+    return MapGraph(**data)
+
+
+def load_and_dump(body: bytes) -> None:
+    """Разбор тела целиком и сериализация декодированного JSON для дискового кэша (TARGETS_STREAM_MAP_GRAPH=false)."""
+    data = json.loads(body)
+    targets_api.parse_map_graph(data)
+    json.dumps({"data": data}, ensure_ascii=False).encode("utf-8")
+
+
+def stream_and_spool(loop: asyncio.AbstractEventLoop, body: bytes) -> None:
+    """Потоковый разбор с копией тела во временный файл для дискового кэша (текущая схема)."""
+    with tempfile.TemporaryFile() as f:
+        loop.run_until_complete(stream_graph(body, copy_to=f))
+
+
+def stream_and_dump(loop: asyncio.AbstractEventLoop, body: bytes) -> None:
+    """Потоковый разбор и сериализация MapGraph для дискового кэша (прежняя схема)."""
+    graph = loop.run_until_complete(stream_graph(body))
+    json.dumps({"data": graph.model_dump(mode="json")}, ensure_ascii=False).encode("utf-8")
+
+
+def per_item(model: type, items: list) -> list:
+    """Поэлементная валидация с пропуском невалидных записей (прежняя реализация parse_*)."""
+    result = []
+    for item in items:
+        try:
+            result.append(model(**item))
+        except ValueError:
+            continue
+    return result
+
+
+def measure(fn: Callable[[], Any], repeat: int) -> float:
+    """Возвращает лучшее время выполнения fn в миллисекундах."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def peak_memory(fn: Callable[[], Any]) -> float:
+    """Возвращает пиковый прирост памяти за один вызов fn в мегабайтах."""
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak / 1024 / 1024
+
+
+def main() -> None:
+    """Запускает бенчмарк и печатает таблицу результатов."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--nodes", type=int, default=10_000, help="Число узлов графа и записей списков")
+    parser.add_argument("--repeat", type=int, default=7, help="Число повторов каждого замера")
+    args = parser.parse_args()
+
+    graph = make_graph(args.nodes)
+    body = json.dumps(graph, ensure_ascii=False).encode("utf-8")
+    maps = make_maps(args.nodes)
+    key_results = make_key_results(args.nodes)
+
+    # Один цикл событий на все замеры: asyncio.run() сам по себе стоит заметного времени
+    loop = asyncio.new_event_loop()
+    cases = [
+        ("graph: json.loads + MapGraph(**data)", lambda: targets_api.parse_map_graph(json.loads(body))),
+        ("graph: MapGraph(**data)", lambda: targets_api.parse_map_graph(graph)),
+        ("graph: model_construct", lambda: construct_graph(graph)),
+        ("graph: streaming parse", lambda: loop.run_until_complete(stream_graph(body))),
+        ("graph + disk: json.loads + MapGraph + dump", lambda: load_and_dump(body)),
+        ("graph + disk: streaming + model_dump", lambda: stream_and_dump(loop, body)),
+        ("graph + disk: streaming + spooled body", lambda: stream_and_spool(loop, body)),
+        ("maps: per-item validation", lambda: per_item(TargetsMap, maps["value"])),
+        ("maps: parse_maps (TypeAdapter)", lambda: targets_api.parse_maps(maps)),
+        ("key results: per-item validation", lambda: per_item(KeyResult, key_results["Payload"]["Data"])),
+        ("key results: parse_key_results (TypeAdapter)", lambda: targets_api.parse_key_results(key_results)),
+    ]
+    print(f"{args.nodes} records, {len(body) / 1024 / 1024:.1f} MB graph body, best of {args.repeat}")
+    print(f"  {'case':<48} {'time':>11} {'peak':>10}")
+    for name, fn in cases:
+        print(f"  {name:<48} {measure(fn, args.repeat):8.1f} ms {peak_memory(fn):7.1f} MB")
+    loop.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -23,6 +23,96 @@ def get_openai_server() -> str | None:
     return server if server else None
 
 
+def get_openai_timeout() -> float:
+    """Возвращает таймаут запросов к OpenAI API в секундах (чтение ответа, в том числе между фрагментами потока)."""
+    return float(os.getenv("OPENAI_TIMEOUT", "300"))
+
+
+def get_openai_connect_timeout() -> float:
+    """Возвращает таймаут установки соединения с OpenAI API в секундах."""
+    return float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+
+
+def get_openai_max_retries() -> int:
+    """Возвращает число повторов запроса к OpenAI API при сетевых ошибках и 429/5xx."""
+    return int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+
+def get_openai_max_connections() -> int:
+    """Возвращает максимальное число одновременных соединений к OpenAI API."""
+    return int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+
+
+def get_openai_max_keepalive_connections() -> int:
+    """Возвращает максимальное число keep-alive соединений в пуле OpenAI API."""
+    return int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "20"))
+
+
+def get_openai_keepalive_expiry() -> float:
+    """Возвращает время жизни простаивающего keep-alive соединения к OpenAI API в секундах."""
+    return float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "30"))
+
+
+# Размер окна контекста моделей (токены); модель ищется по самому длинному совпадающему префиксу
+_MODEL_CONTEXT_WINDOWS = {
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-4.1": 1047576,
+    "gpt-4-turbo": 128000,
+    "gpt-4": 8192,
+    "gpt-3.5-turbo": 16385,
+    "o1": 200000,
+    "o3": 200000,
+    "o4-mini": 200000,
+}
+
+
+def get_model_context_window(model: str | None = None) -> int:
+    """
+    Возвращает размер окна контекста модели в токенах.
+
+    LLM_CONTEXT_WINDOW (> 0) задаёт размер явно — для моделей за кастомным
+    OPENAI_SERVER. Иначе размер берётся из таблицы известных моделей,
+    для неизвестных — 128000.
+    """
+    override = int(os.getenv("LLM_CONTEXT_WINDOW", "0"))
+    if override > 0:
+        return override
+    name = model or get_openai_model()
+    matches = [prefix for prefix in _MODEL_CONTEXT_WINDOWS if name.startswith(prefix)]
+    if not matches:
+        return 128000
+    return _MODEL_CONTEXT_WINDOWS[max(matches, key=len)]
+
+
+def get_llm_reserve_tokens() -> int:
+    """Возвращает число токенов окна, оставляемых под инструкции кейса, историю чата и ответ модели."""
+    return int(os.getenv("LLM_RESERVE_TOKENS", "8000"))
+
+
+def get_llm_response_tokens() -> int:
+    """Возвращает число токенов окна, которое должно остаться на ответ модели при проверке запроса."""
+    return int(os.getenv("LLM_RESPONSE_TOKENS", "4096"))
+
+
+def get_map_context_max_tokens(model: str | None = None) -> int:
+    """
+    Возвращает лимит токенов контекста карты для модели.
+
+    MAP_CONTEXT_MAX_TOKENS (> 0) задаёт лимит явно, иначе это окно
+    контекста модели за вычетом LLM_RESERVE_TOKENS.
+    """
+    limit = int(os.getenv("MAP_CONTEXT_MAX_TOKENS", "0"))
+    if limit > 0:
+        return limit
+    return max(get_model_context_window(model) - get_llm_reserve_tokens(), 0)
+
+
+def get_map_reduce_concurrency() -> int:
+    """Возвращает число одновременных запросов к LLM при анализе большой карты по частям."""
+    return int(os.getenv("MAP_REDUCE_CONCURRENCY", "4"))
+
+
 def get_data_dir() -> str:
     """Возвращает путь к директории с данными."""
     return os.getenv("DATA_DIR", "/app/data")
@@ -50,3 +140,176 @@ def get_backoffice_credentials() -> tuple[str, str]:
     user = os.getenv("BACKOFFICE_USER", "admin").strip()
     password = os.getenv("BACKOFFICE_PASSWORD", "admin").strip()
     return user, password
+
+
+def _get_bool(name: str, default: bool = False) -> bool:
+    """Читает булеву переменную окружения (1/true/yes/on)."""
+    value = os.getenv(name, "").strip().lower()
+    if not value:
+        return default
+    return value in ("1", "true", "yes", "on")
+
+
+def get_targets_timeout() -> float:
+    """Возвращает таймаут запросов к Targets API в секундах."""
+    return float(os.getenv("TARGETS_TIMEOUT", "30"))
+
+
+def get_targets_max_connections() -> int:
+    """Возвращает максимальное число одновременных соединений к Targets API."""
+    return int(os.getenv("TARGETS_MAX_CONNECTIONS", "20"))
+
+
+def get_targets_max_keepalive_connections() -> int:
+    """Возвращает максимальное число keep-alive соединений в пуле Targets API."""
+    return int(os.getenv("TARGETS_MAX_KEEPALIVE_CONNECTIONS", "10"))
+
+
+def get_targets_keepalive_expiry() -> float:
+    """Возвращает время жизни простаивающего keep-alive соединения в секундах."""
+    return float(os.getenv("TARGETS_KEEPALIVE_EXPIRY", "30"))
+
+
+def get_targets_http2() -> bool:
+    """Возвращает True, если для Targets API включён HTTP/2."""
+    return _get_bool("TARGETS_HTTP2", False)
+
+
+def get_targets_max_response_bytes() -> int:
+    """Возвращает максимальный размер ответа Targets API в байтах."""
+    return int(float(os.getenv("TARGETS_MAX_RESPONSE_MB", "64")) * 1024 * 1024)
+
+
+def get_targets_odata_select() -> bool:
+    """Возвращает True, если запросы к OData Targets ограничивают поля через $select."""
+    return _get_bool("TARGETS_ODATA_SELECT", True)
+
+
+def get_targets_stream_map_graph() -> bool:
+    """Возвращает True, если граф карты разбирается потоково, без декодирования ответа целиком."""
+    return _get_bool("TARGETS_STREAM_MAP_GRAPH", True)
+
+
+def get_targets_page_concurrency() -> int:
+    """Возвращает число страниц OData, загружаемых из Targets API параллельно."""
+    return int(os.getenv("TARGETS_PAGE_CONCURRENCY", "4"))
+
+
+def get_targets_max_concurrent_requests() -> int:
+    """Возвращает максимальное число одновременных запросов к Targets API."""
+    return int(os.getenv("TARGETS_MAX_CONCURRENT_REQUESTS", "10"))
+
+
+def get_targets_rate_limit() -> float:
+    """Возвращает допустимую частоту запросов к Targets API в секунду (0 — без ограничения)."""
+    return float(os.getenv("TARGETS_RATE_LIMIT", "20"))
+
+
+def get_targets_rate_burst() -> int:
+    """Возвращает число запросов к Targets API, которые можно выполнить без паузы подряд."""
+    return int(os.getenv("TARGETS_RATE_BURST", "20"))
+
+
+def get_targets_retries() -> int:
+    """Возвращает число повторов идемпотентных запросов к Targets API."""
+    return int(os.getenv("TARGETS_RETRIES", "2"))
+
+
+def get_targets_retry_base_delay() -> float:
+    """Возвращает базовую задержку перед повтором запроса к Targets API в секундах."""
+    return float(os.getenv("TARGETS_RETRY_BASE_DELAY", "0.2"))
+
+
+def get_targets_retry_max_delay() -> float:
+    """Возвращает максимальную задержку перед повтором запроса к Targets API в секундах."""
+    return float(os.getenv("TARGETS_RETRY_MAX_DELAY", "2"))
+
+
+def get_targets_breaker_threshold() -> int:
+    """Возвращает число ошибок подряд, после которого размыкается circuit breaker."""
+    return int(os.getenv("TARGETS_BREAKER_THRESHOLD", "5"))
+
+
+def get_targets_breaker_reset_timeout() -> float:
+    """Возвращает время в секундах, через которое разомкнутый breaker пропускает пробный запрос."""
+    return float(os.getenv("TARGETS_BREAKER_RESET_TIMEOUT", "30"))
+
+
+def get_targets_prefetch_enabled() -> bool:
+    """Возвращает True, если включена фоновая предзагрузка целей карты."""
+    return _get_bool("TARGETS_PREFETCH_ENABLED", False)
+
+
+def get_targets_prefetch_concurrency() -> int:
+    """Возвращает число параллельных запросов фоновой предзагрузки целей."""
+    return int(os.getenv("TARGETS_PREFETCH_CONCURRENCY", "4"))
+
+
+def get_targets_prefetch_max_targets() -> int:
+    """Возвращает максимальное число целей карты, предзагружаемых в фоне (верхние уровни в первую очередь)."""
+    return int(os.getenv("TARGETS_PREFETCH_MAX_TARGETS", "50"))
+
+
+def get_session_cache_ttl() -> float:
+    """Возвращает время жизни записей кэша сессий в секундах."""
+    return float(os.getenv("SESSION_CACHE_TTL", "3600"))
+
+
+def get_session_cache_max_bytes() -> int:
+    """Возвращает лимит объёма кэша сессий в байтах (задаётся в мегабайтах)."""
+    return int(float(os.getenv("SESSION_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+def get_shared_cache_ttl() -> float:
+    """Возвращает окно свежести общего (межсессионного) кэша Targets в секундах."""
+    return float(os.getenv("SHARED_CACHE_TTL", "300"))
+
+
+def get_shared_cache_retention() -> float:
+    """Возвращает, сколько секунд устаревшие записи общего кэша хранятся для условного обновления."""
+    return float(os.getenv("SHARED_CACHE_RETENTION", "86400"))
+
+
+def get_shared_cache_max_bytes() -> int:
+    """Возвращает лимит объёма общего кэша Targets в байтах (задаётся в мегабайтах)."""
+    return int(float(os.getenv("SHARED_CACHE_MAX_MB", "256")) * 1024 * 1024)
+
+
+def get_context_cache_ttl() -> float:
+    """Возвращает время жизни готовых контекстов карт для LLM в секундах."""
+    return float(os.getenv("CONTEXT_CACHE_TTL", "3600"))
+
+
+def get_context_cache_max_bytes() -> int:
+    """Возвращает лимит объёма кэша готовых контекстов в байтах (задаётся в мегабайтах)."""
+    return int(float(os.getenv("CONTEXT_CACHE_MAX_MB", "64")) * 1024 * 1024)
+
+
+def get_disk_cache_enabled() -> bool:
+    """Возвращает True, если включён дисковый кэш ответов Targets API."""
+    return _get_bool("DISK_CACHE_ENABLED", True)
+
+
+def get_disk_cache_max_bytes() -> int:
+    """Возвращает лимит объёма дискового кэша в байтах (задаётся в мегабайтах)."""
+    return int(float(os.getenv("DISK_CACHE_MAX_MB", "512")) * 1024 * 1024)
+
+
+def get_disk_cache_fresh_ttl() -> float:
+    """Возвращает возраст (сек), до которого запись дискового кэша считается свежей."""
+    return float(os.getenv("DISK_CACHE_FRESH_TTL", "300"))
+
+
+def get_disk_cache_stale_ttl() -> float:
+    """Возвращает максимальный возраст (сек) записи, отдаваемой с фоновым обновлением."""
+    return float(os.getenv("DISK_CACHE_STALE_TTL", "86400"))
+
+
+def get_map_graph_soft_ttl() -> float:
+    """Возвращает возраст графа карты (сек), после которого он обновляется в фоне."""
+    return float(os.getenv("MAP_GRAPH_SOFT_TTL", "300"))
+
+
+def get_map_graph_hard_ttl() -> float:
+    """Возвращает возраст графа карты (сек), после которого запрос ждёт свежие данные."""
+    return float(os.getenv("MAP_GRAPH_HARD_TTL", "86400"))
@@ -1,47 +1,88 @@
 """Главный модуль FastAPI приложения ИИ-помощника для Directum Targets."""
 
+import asyncio
 import os
 import json
 import secrets
 import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Optional
 
 logger = logging.getLogger(__name__)
 
-from fastapi import FastAPI, Request, UploadFile, File, Form, HTTPException, Depends
+from fastapi import FastAPI, Request, Response, UploadFile, File, Form, HTTPException, Depends
 from fastapi.responses import HTMLResponse, StreamingResponse, JSONResponse
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
 
-from src.config import get_data_dir, get_targets_base_url, get_backoffice_credentials
+from src.config import (
+    get_data_dir, get_targets_base_url, get_backoffice_credentials,
+    get_targets_prefetch_enabled, get_targets_prefetch_concurrency, get_targets_prefetch_max_targets,
+    get_session_cache_ttl, get_session_cache_max_bytes,
+    get_map_graph_soft_ttl, get_map_graph_hard_ttl,
+    get_openai_model, get_map_context_max_tokens,
+)
 from src.models.api import (
     CaseRequest, ChatRequest, FeedbackRequest, ChatFeedbackRequest,
     DataLoadResponse, GoalListItem, JsonUploadRequest,
 )
 from src.services.json_parser import parse_goals_map, format_map_for_llm
 from src.services.docx_parser import parse_docx_bytes, parse_docx_file
-from src.services import cases_service, chat_service, targets_api, context_builder
+from src.services import (
+    cases_service, chat_service, llm_service, targets_api, targets_cache, context_builder, context_cache,
+)
 from src.services.metrics_storage import (
     init_db, log_request, save_feedback,
     save_chat_feedback, update_chat_feedback_summary, get_metrics,
 )
 from src.services.llm_service import get_completion
+from src.services.prefetch import TargetPrefetcher
+from src.services.cache import SessionCache, SessionView
+from src.models.goal_graph import GoalGraph
+from src.models.targets import TargetsMap
 
 _basic_security = HTTPBasic(auto_error=True)
 
 # Инициализация базы данных при запуске
 init_db()
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Создаёт общие HTTP-клиенты и загружает кодировки tiktoken при старте, закрывает клиенты при остановке."""
+    await targets_api.startup()
+    await llm_service.startup()
+    await asyncio.to_thread(context_builder.load_encodings, [get_openai_model()])
+    try:
+        yield
+    finally:
+        await app.state.prefetcher.shutdown()
+        await targets_cache.shutdown()
+        await targets_api.shutdown()
+        await llm_service.shutdown()
+
+
 app = FastAPI(
     title="Directum Targets AI Assistant",
     description="ИИ-помощник для работы с целями и KR из Directum Targets",
     version="2.0.0",
+    lifespan=lifespan,
+)
+
+# Фоновая предзагрузка целей карты (включается TARGETS_PREFETCH_ENABLED)
+app.state.prefetcher = TargetPrefetcher(
+    concurrency=get_targets_prefetch_concurrency(),
+    max_targets=get_targets_prefetch_max_targets(),
 )
 
-# Session-based кэширование (in-memory)
-app.state.cache = {}
+# Session-based кэширование (in-memory, TTL + LRU-лимит по объёму)
+app.state.cache = SessionCache(
+    max_bytes=get_session_cache_max_bytes(),
+    ttl=get_session_cache_ttl(),
+    on_session_expired=app.state.prefetcher.cancel,
+)
 
 app.add_middleware(
     CORSMiddleware,
@@ -119,6 +160,207 @@ def _goals_to_list(goals_map) -> list[GoalListItem]:
     ]
 
 
+def _get_session(request: Request) -> SessionView:
+    """
+    Возвращает кэш сессии по заголовку X-Session-Id.
+
+    Args:
+        request: Объект входящего запроса FastAPI.
+
+    Returns:
+        SessionView: Данные Targets API, закэшированные для сессии.
+    """
+    session_id = request.headers.get("X-Session-Id", "default")
+    return app.state.cache.session(session_id)
+
+
+def _session_maps(session: SessionView, period: Optional[str] = None) -> list[TargetsMap] | None:
+    """
+    Возвращает список карт из кэша сессии.
+
+    Если в сессии нет списка для периода, но есть полный список карт,
+    он фильтруется на месте без запроса к Targets API.
+
+    Args:
+        session: Кэш сессии.
+        period: Значение PeriodLabel для фильтрации (опционально).
+
+    Returns:
+        list[TargetsMap] | None: Список карт или None при промахе.
+    """
+    maps = session.get_maps(period)
+    if maps is None and period:
+        all_maps = session.get_maps()
+        if all_maps is not None:
+            maps = [m for m in all_maps if m.PeriodLabel == period]
+            session.set_maps(maps, period)
+    return maps
+
+
+async def _load_periods(session: SessionView) -> list[str]:
+    """
+    Возвращает список периодов карт: из кэша сессии, из полного списка
+    карт сессии или отдельным лёгким запросом ($select=PeriodLabel).
+
+    Args:
+        session: Кэш сессии.
+
+    Returns:
+        list[str]: Отсортированные уникальные значения PeriodLabel.
+    """
+    periods = session.get_periods()
+    if periods is None:
+        all_maps = session.get_maps()
+        if all_maps is not None:
+            periods = sorted({m.PeriodLabel for m in all_maps if m.PeriodLabel})
+        else:
+            periods = await targets_cache.get_map_periods()
+        session.set_periods(periods)
+    return periods
+
+
+async def _load_map_graph(session: SessionView, map_id: int) -> GoalGraph:
+    """
+    Возвращает граф карты из кэша сессии, при промахе — из общего кэша
+    или Targets API.
+
+    Args:
+        session: Кэш сессии.
+        map_id: ID карты.
+
+    Returns:
+        GoalGraph: Граф целей карты.
+    """
+    graph, _, _ = await _load_map_graph_with_age(session, map_id)
+    return graph
+
+
+async def _load_map_graph_with_age(session: SessionView, map_id: int) -> tuple[GoalGraph, float, bool]:
+    """
+    Возвращает граф карты по правилам stale-while-revalidate.
+
+    Граф моложе MAP_GRAPH_SOFT_TTL отдаётся как есть; между SOFT и HARD
+    отдаётся сразу, а свежий граф запрашивается в фоне и заменяет запись
+    сессии; старше MAP_GRAPH_HARD_TTL (или при промахе) запрос ждёт загрузки.
+    После загрузки нового графа запускается фоновая предзагрузка его целей,
+    если она включена.
+
+    Args:
+        session: Кэш сессии.
+        map_id: ID карты.
+
+    Returns:
+        tuple[GoalGraph, float, bool]: Граф, возраст данных в секундах и
+                                      признак запущенного фонового обновления.
+    """
+    soft_ttl = get_map_graph_soft_ttl()
+    hard_ttl = get_map_graph_hard_ttl()
+
+    def replace_in_session(fresh: GoalGraph) -> None:
+        session.set_map_graph(map_id, fresh)
+        context_cache.invalidate_map(map_id, keep_version=fresh.version)
+
+    graph = session.get_map_graph(map_id)
+    age = session.get_map_graph_age(map_id) if graph is not None else None
+    if graph is not None and age < hard_ttl:
+        refreshing = age >= soft_ttl
+        if refreshing:
+            targets_cache.refresh_map_graph_in_background(map_id, replace_in_session)
+        return graph, age, refreshing
+
+    graph, age = await targets_cache.get_map_graph_with_age(map_id)
+    refreshing = False
+    if age >= hard_ttl:
+        graph, age = await targets_cache.refresh_map_graph(map_id), 0.0
+        context_cache.invalidate_map(map_id, keep_version=graph.version)
+    elif age >= soft_ttl:
+        targets_cache.refresh_map_graph_in_background(map_id, replace_in_session)
+        refreshing = True
+
+    session.set_map_graph(map_id, graph, age=age)
+    if get_targets_prefetch_enabled():
+        app.state.prefetcher.schedule(
+            session.session_id,
+            _prefetch_order(graph),
+            lambda target_id: _prefetch_target_bundle(session, target_id),
+        )
+    return graph, age, refreshing
+
+
+def _prefetch_order(graph: GoalGraph) -> list[int]:
+    """Возвращает ID целей карты для предзагрузки: сначала корни и верхние уровни, которые открывают первыми."""
+    depth = graph.index.depth
+    return [graph.target_ids[i] for i in sorted(range(len(graph)), key=depth.__getitem__)]
+
+
+async def _prefetch_target_bundle(session: SessionView, target_id: int) -> dict:
+    """Предзагружает цель в кэш сессии фоновыми запросами, уступающими интерактивным."""
+    with targets_api.background_requests():
+        return await _load_target_bundle(session, target_id)
+
+
+async def _load_target_bundle(session: SessionView, target_id: int) -> dict:
+    """
+    Возвращает детали цели и КР из кэша сессии, при промахе — из общего кэша
+    или Targets API (детали и КР запрашиваются параллельно).
+
+    Args:
+        session: Кэш сессии.
+        target_id: ID цели.
+
+    Returns:
+        dict: {"detail": TargetDetail, "key_results": List[KeyResult]}.
+    """
+    target_data = session.get_target(target_id)
+    if target_data is None:
+        target, key_results = await targets_cache.get_target_bundle(target_id)
+        target_data = {"detail": target, "key_results": key_results}
+        session.set_target(target_id, target_data)
+    return target_data
+
+
+def _find_map_info(session: SessionView, map_id: int, graph: GoalGraph) -> TargetsMap | None:
+    """
+    Находит карту в закэшированном списке карт сессии.
+
+    Если список не загружен или карты в нём нет, информация о карте
+    собирается из заголовка графа.
+
+    Args:
+        session: Кэш сессии.
+        map_id: ID карты.
+        graph: Граф целей карты.
+
+    Returns:
+        TargetsMap | None: Информация о карте или None, если её нет нигде.
+    """
+    for m in session.get_maps() or []:
+        if m.Id == map_id:
+            return m
+    if graph.map_info:
+        info = graph.map_info
+        return TargetsMap(Id=info.Id, Name=info.Name, AchievementPercentage=info.Progress)
+    return None
+
+
+def _map_context(map_id: int, graph: GoalGraph, map_info: TargetsMap) -> str:
+    """
+    Возвращает контекст карты для LLM, сокращённый под лимит токенов модели.
+
+    Args:
+        map_id: ID карты.
+        graph: Граф целей карты.
+        map_info: Информация о карте.
+
+    Returns:
+        str: Текст контекста (из кэша контекстов при повторных запросах).
+    """
+    model = get_openai_model()
+    return context_cache.get_map_context(
+        map_id, graph, map_info, max_tokens=get_map_context_max_tokens(model), model=model,
+    ).text
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index(request: Request):
     """Главная страница приложения."""
@@ -139,17 +381,43 @@ async def backoffice(request: Request, _: str = Depends(_check_backoffice_auth))
 
 @app.get("/api/health")
 async def health():
-    """Healthcheck endpoint."""
-    return {"status": "ok", "service": "Directum Targets AI Assistant"}
+    """
+    Healthcheck endpoint.
+
+    Возвращает состояние circuit breaker'ов Targets API; если хотя бы один
+    разомкнут, статус — "degraded" (код ответа остаётся 200).
+    """
+    breakers = targets_api.breaker_states()
+    degraded = any(b["state"] != "closed" for b in breakers.values())
+    return {
+        "status": "degraded" if degraded else "ok",
+        "service": "Directum Targets AI Assistant",
+        "targets_api": breakers,
+    }
 
 
 # ===== V2 API ENDPOINTS (Targets API Integration) =====
 
+def _map_to_dict(m: TargetsMap) -> dict:
+    """Преобразует карту в элемент ответа /api/maps."""
+    return {
+        "id": m.Id,
+        "name": m.Name,
+        "code": m.Code,
+        "period_label": m.PeriodLabel,
+        "achievement_percentage": m.AchievementPercentage,
+        "status": m.Status,
+    }
+
+
 @app.get("/api/maps")
 async def get_maps_endpoint(request: Request, period: Optional[str] = None):
     """
     Возвращает список карт целей с фильтрацией по периоду.
 
+    Если карт нет в кэше сессии, ответ передаётся потоком: карты каждой
+    страницы Targets API отправляются клиенту сразу после её загрузки.
+
     Args:
         period: Значение PeriodLabel для фильтрации (опционально).
 
@@ -164,96 +432,97 @@ async def get_maps_endpoint(request: Request, period: Optional[str] = None):
             "error": "Targets API не настроен. Установите TARGETS_BASE_URL и TARGETS_TOKEN в .env"
         }
 
-    session_id = request.headers.get("X-Session-Id", "default")
+    session = _get_session(request)
     ip = _get_client_ip(request)
     log_request(ip, "/api/maps")
 
-    # Проверка кэша
-    if session_id not in app.state.cache:
-        app.state.cache[session_id] = {"maps": None, "map_graph": {}, "targets": {}}
-
-    cache = app.state.cache[session_id]
-
-    # Загрузка карт если не в кэше
-    if cache["maps"] is None:
-        maps = await targets_api.get_maps()
-        cache["maps"] = maps
-    else:
-        maps = cache["maps"]
-
-    # Извлечение уникальных периодов
-    periods = sorted(list(set(m.PeriodLabel for m in maps)))
-
-    # Фильтрация по периоду
-    if period:
-        filtered_maps = [m for m in maps if m.PeriodLabel == period]
-    else:
-        filtered_maps = maps
-
-    # Формирование ответа
-    maps_data = [
-        {
-            "id": m.Id,
-            "name": m.Name,
-            "code": m.Code,
-            "period_label": m.PeriodLabel,
-            "achievement_percentage": m.AchievementPercentage,
-            "status": m.Status,
-        }
-        for m in filtered_maps
-    ]
-
-    return {"maps": maps_data, "periods": periods}
+    maps = _session_maps(session, period)
+    if maps is not None:
+        periods = await _load_periods(session)
+        return {"maps": [_map_to_dict(m) for m in maps], "periods": periods}
+
+    # Промах кэша сессии: карты отдаются потоком по мере загрузки страниц
+    # (фильтр по периоду выполняет Targets API)
+    periods = await _load_periods(session) if period else None
+    pages = targets_cache.iter_maps(period)
+    # Первая страница загружается до начала ответа, чтобы ошибки API
+    # вернулись клиенту с правильным HTTP-статусом
+    first_page = await anext(pages, [])
+
+    async def stream():
+        collected = list(first_page)
+        yield '{"maps":['
+        chunk = ",".join(json.dumps(_map_to_dict(m), ensure_ascii=False) for m in first_page)
+        yield chunk
+        separator = "," if chunk else ""
+        try:
+            async for page in pages:
+                if not page:
+                    continue
+                collected.extend(page)
+                yield separator + ",".join(json.dumps(_map_to_dict(m), ensure_ascii=False) for m in page)
+                separator = ","
+        except Exception as e:
+            # Заголовки уже отправлены — обрываем ответ, клиент получит невалидный JSON
+            logger.error("Streaming /api/maps failed: %s", e)
+            raise
+
+        session.set_maps(collected, period)
+        result_periods = periods
+        if result_periods is None:
+            result_periods = sorted({m.PeriodLabel for m in collected if m.PeriodLabel})
+            session.set_periods(result_periods)
+        yield '],"periods":' + json.dumps(result_periods, ensure_ascii=False) + "}"
+
+    return StreamingResponse(stream(), media_type="application/json")
 
 
 @app.get("/api/maps/{map_id}/goals")
-async def get_map_goals(map_id: int, request: Request):
+async def get_map_goals(map_id: int, request: Request, response: Response):
     """
     Возвращает граф целей карты (список узлов).
 
+    Возраст данных передаётся в заголовке Age; если граф устарел и
+    обновляется в фоне, добавляется заголовок X-Data-Stale: true.
+
     Args:
         map_id: ID карты.
 
     Returns:
         dict: {"map": {...}, "nodes": [...]}.
     """
-    session_id = request.headers.get("X-Session-Id", "default")
+    session = _get_session(request)
     ip = _get_client_ip(request)
     log_request(ip, f"/api/maps/{map_id}/goals")
 
-    if session_id not in app.state.cache:
-        app.state.cache[session_id] = {"maps": None, "map_graph": {}, "targets": {}}
-
-    cache = app.state.cache[session_id]
-
     # Загрузка графа если не в кэше
-    if map_id not in cache["map_graph"]:
-        graph = await targets_api.get_map_graph(map_id)
-        cache["map_graph"][map_id] = graph
-    else:
-        graph = cache["map_graph"][map_id]
+    graph, age, refreshing = await _load_map_graph_with_age(session, map_id)
+    response.headers["Age"] = str(int(age))
+    if refreshing:
+        response.headers["X-Data-Stale"] = "true"
 
     # Формирование ответа
+    info = graph.map_info
     map_info = {
-        "id": graph.Map.Id if graph.Map else 0,
-        "name": graph.Map.Name if graph.Map else "",
-        "progress": graph.Map.Progress if graph.Map else 0.0,
+        "id": info.Id if info else 0,
+        "name": info.Name if info else "",
+        "progress": info.Progress if info else 0.0,
     }
 
     nodes_data = [
         {
-            "target_id": node.TargetId,
-            "code": node.Code,
-            "name": node.Name,
-            "progress": node.Progress,
-            "status_name": (node.Status.Name or "—") if node.Status else "—",
-            "status_icon": node.Status.Icon if node.Status else None,
-            "priority": node.Priority,
-            "responsible_name": (node.Responsible.Name or "—") if node.Responsible else "—",
-            "period_name": (node.Period.Name or "—") if node.Period else "—",
-            "key_result_count": node.KeyResultCount,
+            "target_id": node.target_id,
+            "code": node.code,
+            "name": node.name,
+            "progress": node.progress,
+            "status_name": node.status_name or "—",
+            "status_icon": node.status_icon,
+            "priority": node.priority,
+            "responsible_name": node.responsible_name or "—",
+            "period_name": node.period_name or "—",
+            "key_result_count": node.key_result_count,
         }
-        for node in graph.Nodes
+        for node in graph
     ]
 
     return {"map": map_info, "nodes": nodes_data}
@@ -270,23 +539,15 @@ async def get_target_endpoint(target_id: int, request: Request):
     Returns:
         dict: {"target": {...}, "key_results": [...]}.
     """
-    session_id = request.headers.get("X-Session-Id", "default")
+    session = _get_session(request)
     ip = _get_client_ip(request)
     log_request(ip, f"/api/targets/{target_id}")
 
-    if session_id not in app.state.cache:
-        app.state.cache[session_id] = {"maps": None, "map_graph": {}, "targets": {}}
-
-    cache = app.state.cache[session_id]
-
     # Загрузка цели и КР если не в кэше
-    if target_id not in cache["targets"]:
-        target = await targets_api.get_target(target_id)
-        key_results = await targets_api.get_key_results(target_id)
-        cache["targets"][target_id] = {"detail": target, "key_results": key_results}
-    else:
-        target = cache["targets"][target_id]["detail"]
-        key_results = cache["targets"][target_id]["key_results"]
+    app.state.prefetcher.record_access(session.session_id, target_id)
+    target_data = await _load_target_bundle(session, target_id)
+    target = target_data["detail"]
+    key_results = target_data["key_results"]
 
     # Формирование ответа
     target_data = {
@@ -374,6 +635,8 @@ async def run_case(case_id: int, request: Request):
     Запускает один из 7 кейсов OKR-анализа с потоковым ответом (SSE).
 
     Поддерживает v1 (с goals_map) и v2 (с map_id/target_id) форматы запросов.
+    Кейсы 5 и 7 по карте, которая не помещается в лимит токенов модели,
+    выполняются по частям (map-reduce); в поток передаётся итоговый ответ.
 
     Args:
         case_id: Номер кейса (1-7).
@@ -401,51 +664,49 @@ async def run_case(case_id: int, request: Request):
     try:
         if is_v2:
             # V2 API: используем кэш и строковые контексты
-            session_id = request.headers.get("X-Session-Id", "default")
+            session = _get_session(request)
             mode = body_json.get("mode")
             map_id = body_json.get("map_id")
             target_id = body_json.get("target_id")
 
-            if session_id not in app.state.cache:
-                raise HTTPException(status_code=400, detail="Сессия не найдена. Загрузите карту целей.")
-
-            cache = app.state.cache[session_id]
-
             # Строим контексты
             map_context = None
+            map_partitions = None
             target_context = None
 
             if mode == "map" and map_id is not None:
-                # Режим карты — используем граф карты
-                if map_id not in cache["map_graph"]:
-                    raise HTTPException(status_code=400, detail=f"Карта {map_id} не загружена в сессии.")
-                graph = cache["map_graph"][map_id]
-                # Формируем текстовый контекст карты
-                map_context = context_builder.build_map_context(
-                    nodes=graph.Nodes,
-                    map_info=cache["maps"][0] if cache["maps"] else None  # Находим карту по ID
-                )
-                # Ищем карту в списке
-                for m in cache["maps"]:
-                    if m.Id == map_id:
-                        map_context = context_builder.build_map_context(graph.Nodes, m)
-                        break
+                # Режим карты — используем граф карты (догружаем при промахе кэша)
+                graph = await _load_map_graph(session, map_id)
+                map_info = _find_map_info(session, map_id, graph)
+                if map_info and case_id in cases_service.MAP_REDUCE_CASES:
+                    # Карта, которая не помещается в лимит, анализируется по частям
+                    partitions = context_cache.get_map_partitions(
+                        map_id, graph, map_info, get_map_context_max_tokens(), get_openai_model(),
+                    )
+                    if len(partitions) > 1:
+                        map_partitions = partitions
+                    else:
+                        map_context = partitions[0]
+                elif map_info:
+                    map_context = _map_context(map_id, graph, map_info)
 
             elif mode == "target" and target_id is not None:
-                # Режим цели — используем детали цели
-                if target_id not in cache["targets"]:
-                    raise HTTPException(status_code=400, detail=f"Цель {target_id} не загружена в сессии.")
-                target_data = cache["targets"][target_id]
-                target_context = context_builder.build_target_context(
-                    target=target_data["detail"],
-                    key_results=target_data["key_results"]
+                # Режим цели — используем детали цели (догружаем при промахе кэша)
+                target_data = await _load_target_bundle(session, target_id)
+                target_context = context_cache.get_target_context(target_id, target_data).text
+
+            if map_partitions:
+                generator = await cases_service.run_case_map_reduce(
+                    case_id=case_id,
+                    partitions=map_partitions,
+                    max_tokens=get_map_context_max_tokens(),
+                )
+            else:
+                generator = await cases_service.run_case_v2(
+                    case_id=case_id,
+                    map_context=map_context,
+                    target_context=target_context,
                 )
-
-            generator = await cases_service.run_case_v2(
-                case_id=case_id,
-                map_context=map_context,
-                target_context=target_context,
-            )
         else:
             # V1 API: используем GoalsMap напрямую
             from src.models.api import CaseRequest
@@ -463,6 +724,10 @@ async def run_case(case_id: int, request: Request):
         """Генератор SSE-событий для потоковой передачи ответа."""
         try:
             async for chunk in generator:
+                if isinstance(chunk, cases_service.Progress):
+                    # SSE-комментарий: держит соединение открытым, клиент его не показывает
+                    yield f": progress {chunk.done}/{chunk.total}\n\n"
+                    continue
                 yield f"data: {json.dumps(chunk)}\n\n"
         except ValueError as e:
             yield f"data: {json.dumps('[ERROR] ' + str(e))}\n\n"
@@ -504,39 +769,25 @@ async def chat(request: Request):
         if is_v2:
             # V2 API
             from src.models.api import ChatMessage
-            session_id = request.headers.get("X-Session-Id", "default")
+            session = _get_session(request)
             mode = body_json.get("mode")
             map_id = body_json.get("map_id")
             target_id = body_json.get("target_id")
             messages = [ChatMessage(**m) for m in body_json.get("messages", [])]
 
-            if session_id not in app.state.cache:
-                raise HTTPException(status_code=400, detail="Сессия не найдена. Загрузите карту целей.")
-
-            cache = app.state.cache[session_id]
-
             # Строим контексты
             map_context = None
             target_context = None
 
             if mode == "map" and map_id is not None:
-                if map_id not in cache["map_graph"]:
-                    raise HTTPException(status_code=400, detail=f"Карта {map_id} не загружена в сессии.")
-                graph = cache["map_graph"][map_id]
-                # Ищем карту в списке
-                for m in cache["maps"]:
-                    if m.Id == map_id:
-                        map_context = context_builder.build_map_context(graph.Nodes, m)
-                        break
+                graph = await _load_map_graph(session, map_id)
+                map_info = _find_map_info(session, map_id, graph)
+                if map_info:
+                    map_context = _map_context(map_id, graph, map_info)
 
             elif mode == "target" and target_id is not None:
-                if target_id not in cache["targets"]:
-                    raise HTTPException(status_code=400, detail=f"Цель {target_id} не загружена в сессии.")
-                target_data = cache["targets"][target_id]
-                target_context = context_builder.build_target_context(
-                    target=target_data["detail"],
-                    key_results=target_data["key_results"]
-                )
+                target_data = await _load_target_bundle(session, target_id)
+                target_context = context_cache.get_target_context(target_id, target_data).text
 
             generator = await chat_service.run_chat_v2(
                 map_context=map_context,
@@ -552,6 +803,12 @@ async def chat(request: Request):
                 messages=body.messages,
                 docx_content=body.docx_content,
             )
+    except HTTPException:
+        # Ошибки Targets API и сессии отдаём клиенту с исходным статусом
+        raise
+    except ValueError as e:
+        # Запрос не помещается в окно модели даже после сокращения истории
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -643,9 +900,21 @@ async def metrics(_: str = Depends(_check_backoffice_auth)):
     Возвращает агрегированные метрики использования для бэк-офиса.
 
     Returns:
-        dict: Метрики: статистика по IP, кейсам, оценкам, временной ряд.
+        dict: Метрики: статистика по IP, кейсам, оценкам, временной ряд,
+              счётчики предзагрузки целей, кэша сессий, общего кэша и кэша контекстов,
+              итоги предварительной проверки размера запросов к LLM (fits/pruned/rejected),
+              время и объём запросов к Targets API, ожидание в лимитере.
     """
-    return get_metrics()
+    return {
+        **get_metrics(),
+        "prefetch": app.state.prefetcher.get_stats(),
+        "session_cache": app.state.cache.stats(),
+        "shared_cache": targets_cache.stats(),
+        "context_cache": context_cache.stats(),
+        "llm_preflight": llm_service.preflight_stats(),
+        "targets_api": targets_api.request_stats(),
+        "targets_limiter": targets_api.limiter_stats(),
+    }
 
 
 @app.post("/api/feedback/chat")
@@ -0,0 +1,269 @@
+"""Компактное колоночное представление графа целей карты."""
+
+import hashlib
+from array import array
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.models.graph_index import GraphIndex
+from src.models.targets import GoalNode, MapGraph, MapInfo
+
+
+class GoalGraph:
+    """
+    Граф целей карты в виде типизированных столбцов.
+
+    Вместо pydantic-объекта GoalNode с четырьмя вложенными моделями на
+    каждый узел хранятся массивы array (ID, прогресс, число КР, индексы
+    строк) и списки кодов и названий. Повторяющиеся строки (ответственные,
+    подразделения, периоды, статусы, приоритеты) хранятся один раз в
+    таблице строк графа, в столбцах — их индексы. Связи между узлами,
+    корни, глубины и поддеревья — в GraphIndex (атрибут index), который
+    строится вместе с графом.
+
+    Узел читается через GoalView: graph[i] или итерацию по графу.
+    """
+
+    __slots__ = (
+        "map_info", "target_ids", "codes", "names", "progress", "key_result_counts",
+        "priority", "status_name", "status_icon", "responsible", "unit", "period",
+        "reports", "index", "_strings", "_version",
+    )
+
+    def __init__(self, map_info: Optional[MapInfo] = None):
+        self.map_info = map_info
+        self.target_ids = array("q")
+        self.codes: List[str] = []
+        self.names: List[str] = []
+        self.progress = array("d")
+        self.key_result_counts = array("i")
+        # Индексы в таблице строк _strings; 0 — значение отсутствует (None)
+        self.priority = array("i")
+        self.status_name = array("i")
+        self.status_icon = array("i")
+        self.responsible = array("i")
+        self.unit = array("i")
+        self.period = array("i")
+        # Последний отчёт о достижении есть у немногих узлов: {индекс: (дата, описание)}
+        self.reports: Dict[int, Tuple[str, str]] = {}
+        self._strings: List[Optional[str]] = [None]
+        self.index = GraphIndex([], [], [])
+        self._version: Optional[str] = None
+
+    @classmethod
+    def from_nodes(cls, nodes: Iterable[GoalNode], map_info: Optional[MapInfo] = None) -> "GoalGraph":
+        """
+        Строит граф из узлов GoalNode.
+
+        Args:
+            nodes: Узлы графа карты в исходном порядке.
+            map_info: Заголовок карты.
+
+        Returns:
+            GoalGraph: Колоночный граф.
+        """
+        graph = cls(map_info)
+        interned: Dict[str, int] = {}
+
+        def intern(value: Optional[str]) -> int:
+            if value is None:
+                return 0
+            index = interned.get(value)
+            if index is None:
+                index = interned[value] = len(graph._strings)
+                graph._strings.append(value)
+            return index
+
+        parent_ids: List[Optional[str]] = []
+        child_ids: List[List[Any]] = []
+        for i, node in enumerate(nodes):
+            graph.target_ids.append(node.TargetId)
+            graph.codes.append(node.Code)
+            graph.names.append(node.Name)
+            graph.progress.append(node.Progress)
+            graph.key_result_counts.append(node.KeyResultCount)
+            graph.priority.append(intern(node.Priority))
+            status = node.Status
+            graph.status_name.append(intern(status.Name if status else None))
+            graph.status_icon.append(intern(status.Icon if status else None))
+            graph.responsible.append(intern(node.Responsible.Name if node.Responsible else None))
+            graph.unit.append(intern(node.StructuralUnit.Name if node.StructuralUnit else None))
+            graph.period.append(intern(node.Period.Name if node.Period else None))
+            report = _report(status.LastAchievementStatus if status else None)
+            if report is not None:
+                graph.reports[i] = report
+            parent_ids.append(node.ParentId)
+            child_ids.append(node.ChildIds)
+
+        graph.index = GraphIndex(graph.target_ids, parent_ids, child_ids)
+        return graph
+
+    @classmethod
+    def from_map_graph(cls, graph: MapGraph) -> "GoalGraph":
+        """Строит колоночный граф из ответа GetTargetsMap."""
+        return cls.from_nodes(graph.Nodes, graph.Map)
+
+    def __len__(self) -> int:
+        return len(self.target_ids)
+
+    def __getitem__(self, index: int) -> "GoalView":
+        if not -len(self) <= index < len(self):
+            raise IndexError(index)
+        return GoalView(self, index % len(self))
+
+    def __iter__(self) -> Iterator["GoalView"]:
+        return (GoalView(self, i) for i in range(len(self)))
+
+    def string(self, index: int) -> Optional[str]:
+        """Возвращает строку из таблицы строк графа по индексу столбца."""
+        return self._strings[index]
+
+    def index_of(self, target_id: Any) -> Optional[int]:
+        """Возвращает индекс узла по ID цели (TargetId или строковый Id) или None."""
+        return self.index.index_of(target_id)
+
+    def children(self, index: int) -> array:
+        """Возвращает индексы дочерних узлов в порядке ChildIds (только присутствующие в карте)."""
+        return self.index.children(index)
+
+    @property
+    def version(self) -> str:
+        """
+        Хэш содержимого графа (считается один раз).
+
+        Совпадает у графов с одинаковыми данными, поэтому годится в ключ
+        кэша производных данных: обновление графа без изменений его не меняет.
+        """
+        if self._version is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for column in (
+                self.target_ids, self.progress, self.key_result_counts, self.priority,
+                self.status_name, self.status_icon, self.responsible, self.unit, self.period,
+                self.index.parent, self.index.child_offsets, self.index.child_index,
+            ):
+                digest.update(column.tobytes())
+            for texts in (self.codes, self.names, [s or "" for s in self._strings]):
+                digest.update("\x1f".join(texts).encode("utf-8", "surrogatepass"))
+                digest.update(b"\x1e")
+            digest.update(repr(sorted(self.reports.items())).encode("utf-8", "surrogatepass"))
+            if self.map_info is not None:
+                digest.update(self.map_info.model_dump_json().encode("utf-8"))
+            self._version = digest.hexdigest()
+        return self._version
+
+    @property
+    def nbytes(self) -> int:
+        """Приблизительный объём данных графа в байтах (для лимита кэша)."""
+        arrays = (
+            self.target_ids, self.progress, self.key_result_counts, self.priority,
+            self.status_name, self.status_icon, self.responsible, self.unit, self.period,
+        )
+        size = sum(a.itemsize * len(a) for a in arrays)
+        size += sum(len(s) * 2 + 50 for s in self.codes) + sum(len(s) * 2 + 50 for s in self.names)
+        size += sum(len(s) * 2 + 50 for s in self._strings if s)
+        size += sum(len(date) * 2 + len(text) * 2 + 120 for date, text in self.reports.values())
+        return size + self.index.nbytes
+
+
+class GoalView:
+    """Узел GoalGraph: доступ к столбцам графа по индексу без копирования данных."""
+
+    __slots__ = ("graph", "index")
+
+    def __init__(self, graph: GoalGraph, index: int):
+        self.graph = graph
+        self.index = index
+
+    @property
+    def target_id(self) -> int:
+        """Числовой ID цели (TargetId)."""
+        return self.graph.target_ids[self.index]
+
+    @property
+    def code(self) -> str:
+        """Код цели (например U-26.4.2)."""
+        return self.graph.codes[self.index]
+
+    @property
+    def name(self) -> str:
+        """Название цели."""
+        return self.graph.names[self.index]
+
+    @property
+    def progress(self) -> float:
+        """Прогресс достижения в процентах (0-100)."""
+        return self.graph.progress[self.index]
+
+    @property
+    def key_result_count(self) -> int:
+        """Количество ключевых результатов."""
+        return self.graph.key_result_counts[self.index]
+
+    @property
+    def priority(self) -> Optional[str]:
+        """Приоритет: High/Medium/Low."""
+        return self.graph.string(self.graph.priority[self.index])
+
+    @property
+    def status_name(self) -> Optional[str]:
+        """Название статуса цели."""
+        return self.graph.string(self.graph.status_name[self.index])
+
+    @property
+    def status_icon(self) -> Optional[str]:
+        """Иконка статуса цели."""
+        return self.graph.string(self.graph.status_icon[self.index])
+
+    @property
+    def responsible_name(self) -> Optional[str]:
+        """ФИО ответственного."""
+        return self.graph.string(self.graph.responsible[self.index])
+
+    @property
+    def unit_name(self) -> Optional[str]:
+        """Структурное подразделение."""
+        return self.graph.string(self.graph.unit[self.index])
+
+    @property
+    def period_name(self) -> Optional[str]:
+        """Период (например: I квартал 2026)."""
+        return self.graph.string(self.graph.period[self.index])
+
+    @property
+    def parent_index(self) -> int:
+        """Индекс родительского узла или -1, если родителя нет в карте."""
+        return self.graph.index.parent[self.index]
+
+    @property
+    def depth(self) -> int:
+        """Глубина узла от корня (корень — 0)."""
+        return self.graph.index.depth[self.index]
+
+    @property
+    def children(self) -> List["GoalView"]:
+        """Дочерние узлы в порядке ChildIds (только присутствующие в карте)."""
+        return [GoalView(self.graph, child) for child in self.graph.children(self.index)]
+
+    @property
+    def report(self) -> Optional[Tuple[str, str]]:
+        """Последний отчёт о достижении: (дата, описание) или None."""
+        return self.graph.reports.get(self.index)
+
+
+def _report(last_status: Any) -> Optional[Tuple[str, str]]:
+    """
+    Извлекает (дата, описание) последнего отчёта о достижении.
+
+    LastAchievementStatus может прийти словарём или объектом; отчёты без
+    описания не сохраняются.
+    """
+    if not last_status:
+        return None
+    if isinstance(last_status, dict):
+        description = last_status.get("Description") or ""
+        report_date = last_status.get("ReportDate") or "—"
+    else:
+        description = getattr(last_status, "Description", None) or ""
+        report_date = getattr(last_status, "ReportDate", None) or "—"
+    if not description:
+        return None
+    return report_date, description
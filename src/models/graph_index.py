@@ -0,0 +1,122 @@
+"""Индекс смежности графа целей: связи, корни, глубина и диапазоны поддеревьев."""
+
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+
+class GraphIndex:
+    """
+    Индекс графа целей, который строится один раз на граф.
+
+    Узлы адресуются позициями 0..n-1 в исходном списке. Индекс хранит:
+    - id → позиция (первое вхождение при дубликатах);
+    - родителя (ParentId) и детей (ChildIds) позициями, только для узлов из графа;
+    - корни — узлы, родителя которых нет в графе;
+    - обход в глубину от корней (order): поддерево узла i — это
+      order[position[i]:subtree_end[i]], глубина — depth[i].
+
+    Узлы, недостижимые от корней (например, в цикле), добавляются в
+    обход отдельными поддеревьями, поэтому каждый узел встречается в
+    order ровно один раз.
+    """
+
+    __slots__ = (
+        "parent", "child_offsets", "child_index", "roots",
+        "order", "position", "subtree_end", "depth", "_index_by_id",
+    )
+
+    def __init__(self, ids: Sequence[Any], parent_ids: Sequence[Any], child_ids: Sequence[Iterable[Any]]):
+        """
+        Args:
+            ids: ID узлов в порядке графа.
+            parent_ids: ParentId каждого узла (None — нет родителя).
+            child_ids: ChildIds каждого узла.
+        """
+        self._index_by_id: Dict[str, int] = {}
+        for i, node_id in enumerate(ids):
+            self._index_by_id.setdefault(str(node_id), i)
+
+        self.parent = array("i", (self._resolve(parent_id) for parent_id in parent_ids))
+        self.child_offsets = array("i", [0])
+        self.child_index = array("i")
+        for children in child_ids:
+            for child_id in children:
+                child = self._resolve(child_id)
+                if child >= 0:
+                    self.child_index.append(child)
+            self.child_offsets.append(len(self.child_index))
+        self.roots = array("i", (i for i, parent in enumerate(self.parent) if parent < 0))
+        self._build_order(len(self.parent))
+
+    def _resolve(self, node_id: Any) -> int:
+        """Возвращает позицию узла по ID или -1, если его нет в графе."""
+        if node_id is None:
+            return -1
+        return self._index_by_id.get(str(node_id), -1)
+
+    def _build_order(self, count: int) -> None:
+        """Строит обход в глубину, глубины и границы поддеревьев (без рекурсии)."""
+        self.order = array("i")
+        self.position = array("i", [-1]) * count
+        self.depth = array("i", [0]) * count
+        tree_parent = array("i", [-1]) * count
+
+        starts = list(self.roots) + list(range(count))
+        for start in starts:
+            if self.position[start] >= 0:
+                continue
+            stack = [(start, 0, -1)]
+            while stack:
+                node, depth, parent = stack.pop()
+                if self.position[node] >= 0:
+                    continue
+                self.position[node] = len(self.order)
+                self.order.append(node)
+                self.depth[node] = depth
+                tree_parent[node] = parent
+                # Дети кладутся в обратном порядке, чтобы обход шёл в порядке ChildIds
+                for child in reversed(self.children(node)):
+                    if self.position[child] < 0:
+                        stack.append((child, depth + 1, node))
+
+        sizes = array("i", [1]) * count
+        for node in reversed(self.order):
+            if tree_parent[node] >= 0:
+                sizes[tree_parent[node]] += sizes[node]
+        self.subtree_end = array("i", (self.position[i] + sizes[i] for i in range(count)))
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def index_of(self, node_id: Any) -> Optional[int]:
+        """Возвращает позицию узла по ID (строкой или числом) или None."""
+        index = self._resolve(node_id)
+        return index if index >= 0 else None
+
+    def children(self, index: int) -> array:
+        """Возвращает позиции дочерних узлов в порядке ChildIds."""
+        return self.child_index[self.child_offsets[index]:self.child_offsets[index + 1]]
+
+    def subtree(self, index: int) -> array:
+        """Возвращает позиции узлов поддерева (включая сам узел) в порядке обхода в глубину."""
+        return self.order[self.position[index]:self.subtree_end[index]]
+
+    def ancestors(self, index: int) -> List[int]:
+        """Возвращает позиции предков узла от родителя к корню."""
+        result: List[int] = []
+        seen = {index}
+        parent = self.parent[index]
+        while parent >= 0 and parent not in seen:
+            result.append(parent)
+            seen.add(parent)
+            parent = self.parent[parent]
+        return result
+
+    @property
+    def nbytes(self) -> int:
+        """Приблизительный объём индекса в байтах."""
+        arrays = (
+            self.parent, self.child_offsets, self.child_index, self.roots,
+            self.order, self.position, self.subtree_end, self.depth,
+        )
+        return sum(a.itemsize * len(a) for a in arrays) + 100 * len(self._index_by_id)
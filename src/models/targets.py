@@ -1,7 +1,9 @@
 """Pydantic-модели для Directum Targets API v2."""
 
 from typing import Optional, List, Any
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+from src.models.graph_index import GraphIndex
 
 
 # ============================================================
@@ -231,3 +233,29 @@ class GoalsMap(BaseModel):
     map_name: str = Field(default="", description="Название карты целей")
     map_id: Optional[int] = Field(default=None, description="ID карты")
     total_progress: float = Field(default=0.0, description="Общий прогресс карты")
+
+    _index: Optional[GraphIndex] = PrivateAttr(default=None)
+    _index_key: Optional[list] = PrivateAttr(default=None)
+
+    def _structure(self) -> list:
+        """Снимок связей узлов (id, parent_id, child_ids), по которому проверяется актуальность индекса."""
+        return [(n.id, n.parent_id, tuple(n.child_ids)) for n in self.nodes]
+
+    @property
+    def index(self) -> GraphIndex:
+        """
+        Индекс связей узлов; строится при первом обращении и переиспользуется.
+
+        Индекс перестраивается при любом изменении связей: замене, добавлении
+        или удалении узлов и правке их id, parent_id или child_ids. Сравнение
+        снимка связей примерно на порядок дешевле построения индекса.
+        """
+        key = self._structure()
+        if self._index is None or key != self._index_key:
+            self._index = GraphIndex(
+                [n.id for n in self.nodes],
+                [n.parent_id for n in self.nodes],
+                [n.child_ids for n in self.nodes],
+            )
+            self._index_key = key
+        return self._index
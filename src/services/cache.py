@@ -0,0 +1,345 @@
+"""In-memory кэш с TTL и LRU-вытеснением по объёму данных."""
+
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable, Optional
+
+from pydantic import BaseModel
+
+
+def estimate_size(value: Any) -> int:
+    """
+    Оценивает объём значения в байтах для учёта лимита памяти кэша.
+
+    Pydantic-модели оцениваются по размеру их JSON-сериализации (выполняется
+    в Rust-ядре pydantic), объекты с атрибутом nbytes (колоночный GoalGraph) —
+    по его значению, коллекции — суммой элементов.
+
+    Args:
+        value: Кэшируемое значение.
+
+    Returns:
+        int: Приблизительный размер в байтах.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, BaseModel):
+        return len(value.__pydantic_serializer__.to_json(value))
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    if isinstance(value, dict):
+        return sum(estimate_size(v) for v in value.values()) + 16 * len(value)
+    if isinstance(value, (list, tuple, set)):
+        return sum(estimate_size(v) for v in value) + 8 * len(value)
+    return 16
+
+
+@dataclass
+class _Entry:
+    """Запись кэша: значение, его размер и момент истечения."""
+
+    value: Any
+    size: int
+    stored_at: float
+    expires_at: float
+
+
+class TTLCache:
+    """
+    Кэш с TTL для каждой записи и LRU-вытеснением при превышении лимита в байтах.
+
+    Просроченные записи удаляются лениво при обращении и периодической
+    очисткой при записи. Счётчики hits/misses/evictions/expirations
+    доступны через stats().
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        default_ttl: float,
+        on_remove: Optional[Callable[[Hashable], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        purge_interval: float = 60.0,
+    ):
+        self._data: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._max_bytes = max_bytes
+        self._default_ttl = default_ttl
+        self._on_remove = on_remove
+        self._clock = clock
+        self._purge_interval = purge_interval
+        self._last_purge = clock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Возвращает значение по ключу, если оно есть и не просрочено.
+
+        Args:
+            key: Ключ записи.
+            default: Значение при отсутствии записи.
+
+        Returns:
+            Any: Закэшированное значение или default.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            self._stats["misses"] += 1
+            return default
+        if entry.expires_at <= self._clock():
+            self._remove(key)
+            self._stats["expirations"] += 1
+            self._stats["misses"] += 1
+            return default
+        self._data.move_to_end(key)
+        self._stats["hits"] += 1
+        return entry.value
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry.expires_at > self._clock()
+
+    def set(
+        self,
+        key: Hashable,
+        value: Any,
+        ttl: Optional[float] = None,
+        size: Optional[int] = None,
+        age: float = 0.0,
+    ) -> None:
+        """
+        Сохраняет значение с TTL и вытесняет давно неиспользуемые записи при переполнении.
+
+        Args:
+            key: Ключ записи.
+            value: Значение.
+            ttl: Время жизни в секундах (по умолчанию — default_ttl кэша).
+            size: Размер в байтах (по умолчанию оценивается через estimate_size).
+            age: Возраст данных на момент записи (если они взяты из другого кэша).
+        """
+        now = self._clock()
+        if now - self._last_purge >= self._purge_interval:
+            self.purge_expired()
+
+        if key in self._data:
+            self._remove(key, notify=False)
+
+        entry_size = estimate_size(value) if size is None else size
+        entry_ttl = self._default_ttl if ttl is None else ttl
+        self._data[key] = _Entry(value, entry_size, now - age, now + entry_ttl)
+        self._bytes += entry_size
+
+        while self._bytes > self._max_bytes and len(self._data) > 1:
+            oldest_key = next(iter(self._data))
+            self._remove(oldest_key)
+            self._stats["evictions"] += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Удаляет запись и возвращает её значение.
+
+        Args:
+            key: Ключ записи.
+            default: Значение при отсутствии записи.
+
+        Returns:
+            Any: Удалённое значение или default.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        self._remove(key)
+        return entry.value
+
+    def touch(self, key: Hashable, ttl: Optional[float] = None) -> bool:
+        """
+        Отмечает данные записи как только что подтверждённые: обнуляет возраст и продлевает TTL.
+
+        Args:
+            key: Ключ записи.
+            ttl: Новое время жизни в секундах (по умолчанию — default_ttl кэша).
+
+        Returns:
+            bool: True, если запись существует.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return False
+        now = self._clock()
+        entry.stored_at = now
+        entry.expires_at = now + (self._default_ttl if ttl is None else ttl)
+        self._data.move_to_end(key)
+        return True
+
+    def age(self, key: Hashable) -> Optional[float]:
+        """
+        Возвращает возраст данных записи в секундах или None, если записи нет.
+
+        Args:
+            key: Ключ записи.
+        """
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        return self._clock() - entry.stored_at
+
+    def purge_expired(self) -> int:
+        """
+        Удаляет все просроченные записи.
+
+        Returns:
+            int: Число удалённых записей.
+        """
+        now = self._clock()
+        self._last_purge = now
+        expired = [key for key, entry in self._data.items() if entry.expires_at <= now]
+        for key in expired:
+            self._remove(key)
+        self._stats["expirations"] += len(expired)
+        return len(expired)
+
+    def _remove(self, key: Hashable, notify: bool = True) -> None:
+        """Удаляет запись и уведомляет владельца кэша."""
+        entry = self._data.pop(key)
+        self._bytes -= entry.size
+        if notify and self._on_remove is not None:
+            self._on_remove(key)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """
+        Возвращает метрики кэша.
+
+        Returns:
+            dict: hits, misses, evictions, expirations, entries, bytes, max_bytes.
+        """
+        return {
+            **self._stats,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_bytes": self._max_bytes,
+        }
+
+
+class SessionView:
+    """Типизированный доступ к данным одной сессии в SessionCache."""
+
+    def __init__(self, owner: "SessionCache", session_id: str):
+        self._owner = owner
+        self.session_id = session_id
+
+    def get_maps(self, period: Optional[str] = None) -> Any:
+        """Возвращает список карт сессии (для периода или все) или None."""
+        return self._owner._get(self.session_id, "maps", period)
+
+    def set_maps(self, maps: Any, period: Optional[str] = None) -> None:
+        """Сохраняет список карт сессии (для периода или все)."""
+        self._owner._set(self.session_id, "maps", period, value=maps)
+
+    def get_periods(self) -> Any:
+        """Возвращает список периодов карт или None."""
+        return self._owner._get(self.session_id, "periods")
+
+    def set_periods(self, periods: Any) -> None:
+        """Сохраняет список периодов карт."""
+        self._owner._set(self.session_id, "periods", value=periods)
+
+    def get_map_graph(self, map_id: int) -> Any:
+        """Возвращает граф карты или None."""
+        return self._owner._get(self.session_id, "map_graph", map_id)
+
+    def set_map_graph(self, map_id: int, graph: Any, age: float = 0.0) -> None:
+        """Сохраняет граф карты с учётом возраста данных."""
+        self._owner._set(self.session_id, "map_graph", map_id, value=graph, age=age)
+
+    def get_map_graph_age(self, map_id: int) -> Optional[float]:
+        """Возвращает возраст данных графа карты в секундах или None."""
+        return self._owner._age(self.session_id, "map_graph", map_id)
+
+    def get_target(self, target_id: int) -> Any:
+        """Возвращает {"detail", "key_results"} цели или None."""
+        return self._owner._get(self.session_id, "targets", target_id)
+
+    def set_target(self, target_id: int, target_data: Any) -> None:
+        """Сохраняет {"detail", "key_results"} цели."""
+        self._owner._set(self.session_id, "targets", target_id, value=target_data)
+
+
+class SessionCache:
+    """
+    Кэш данных Targets API по сессиям браузера (X-Session-Id).
+
+    Каждая карта, граф и цель сессии — отдельная запись общего TTLCache,
+    поэтому TTL и LRU-вытеснение работают поштучно, а общий объём
+    ограничен в байтах. Когда у сессии не остаётся записей, вызывается
+    on_session_expired (например, для отмены фоновой предзагрузки).
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        ttl: float,
+        on_session_expired: Optional[Callable[[str], None]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._keys: dict[str, set] = {}
+        self._on_session_expired = on_session_expired
+        self._store = TTLCache(max_bytes, ttl, on_remove=self._forget_key, clock=clock)
+
+    def session(self, session_id: str) -> SessionView:
+        """
+        Возвращает представление данных сессии.
+
+        Args:
+            session_id: ID сессии браузера.
+
+        Returns:
+            SessionView: Доступ к картам, графам и целям сессии.
+        """
+        return SessionView(self, session_id)
+
+    def has_session(self, session_id: str) -> bool:
+        """Возвращает True, если у сессии есть хотя бы одна запись."""
+        return bool(self._keys.get(session_id))
+
+    def _get(self, session_id: str, *key: Hashable) -> Any:
+        return self._store.get((session_id, *key))
+
+    def _set(self, session_id: str, *key: Hashable, value: Any, age: float = 0.0) -> None:
+        full_key = (session_id, *key)
+        self._keys.setdefault(session_id, set()).add(full_key)
+        self._store.set(full_key, value, age=age)
+
+    def _age(self, session_id: str, *key: Hashable) -> Optional[float]:
+        return self._store.age((session_id, *key))
+
+    def _forget_key(self, full_key: tuple) -> None:
+        """Обновляет индекс сессий после удаления записи из хранилища."""
+        session_id = full_key[0]
+        keys = self._keys.get(session_id)
+        if keys is None:
+            return
+        keys.discard(full_key)
+        if not keys:
+            del self._keys[session_id]
+            if self._on_session_expired is not None:
+                self._on_session_expired(session_id)
+
+    def purge_expired(self) -> int:
+        """Удаляет просроченные записи всех сессий."""
+        return self._store.purge_expired()
+
+    def stats(self) -> dict:
+        """
+        Возвращает метрики кэша сессий.
+
+        Returns:
+            dict: Метрики TTLCache и число активных сессий.
+        """
+        return {**self._store.stats(), "sessions": len(self._keys)}
@@ -1,7 +1,12 @@
 """Сервис для выполнения 7 кейсов OKR-анализа через LLM."""
 
-from typing import AsyncGenerator, Optional
+import asyncio
+from contextlib import aclosing
+from typing import AsyncGenerator, Awaitable, NamedTuple, Optional
+
+from src.config import get_map_reduce_concurrency, get_openai_model
 from src.models.targets import GoalsMap, GoalNodeV1
+from src.services.context_builder import estimate_tokens, fits_tokens
 from src.services.json_parser import format_map_for_llm, get_goal_by_id
 from src.services import llm_service
 
@@ -136,7 +141,7 @@ def _case1_smart_check(
 Структурируй ответ с заголовками. Будь конкретным."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case2_key_results(
@@ -174,7 +179,7 @@ def _case2_key_results(
 Структурируй ответ с заголовками для каждого варианта."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case3_quarterly_decomp(
@@ -212,7 +217,7 @@ def _case3_quarterly_decomp(
 Структурируй как план с разделами по кварталам."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case4_management_verify(
@@ -248,7 +253,7 @@ def _case4_management_verify(
 Структурируй как верификационный чеклист."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case5_conflicts(
@@ -280,7 +285,7 @@ def _case5_conflicts(
 Структурируй как аналитический отчёт с разделами."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case6_risks(
@@ -320,7 +325,7 @@ def _case6_risks(
 Структурируй как риск-отчёт с таблицей рисков."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case7_express_report(
@@ -358,13 +363,36 @@ def _case7_express_report(
 Форматируй как управленческий отчёт: кратко, структурированно, по существу."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 # ============================================================
 # V2 CASE METHODS (with context strings instead of GoalsMap)
 # ============================================================
 
+# Задачи кейсов по всей карте: общие для запроса по карте целиком и для итогового запроса map-reduce
+_CASE5_TASK = """1. **Конфликты целей**: есть ли цели, которые противоречат друг другу (конкуренция за ресурсы, разные приоритеты, взаимоисключающие KR)?
+2. **Слепые зоны**: какие важные стратегические направления не охвачены в карте?
+3. **Дисбаланс приоритетов**: равномерно ли распределены усилия? Нет ли перегруза в одних областях при недостатке в других?
+4. **Проблемы структуры**: есть ли цели без логической связи с верхним уровнем? Есть ли «висячие» цели?
+5. **Рекомендации**: как устранить выявленные конфликты и закрыть слепые зоны?
+
+Структурируй как аналитический отчёт с разделами."""
+
+_CASE7_TASK = """1. **Топ-3 цели с наибольшим отставанием**:
+   - Название и код цели
+   - Текущий прогресс vs ожидаемый
+   - Ключевые проблемы
+   - Рекомендуемые действия
+
+2. **Топ-3 цели в хорошем прогрессе** (для контраста и понимания best practices)
+
+3. **Общая картина**: краткая сводка состояния портфеля целей (1-2 абзаца)
+
+4. **Рекомендации для совещания**: на чём сосредоточить внимание руководства на следующей сессии?
+
+Форматируй как управленческий отчёт: кратко, структурированно, по существу."""
+
 async def run_case_v2(
     case_id: int,
     map_context: str | None,
@@ -423,7 +451,7 @@ def _case1_smart_check_v2(
 Структурируй ответ с заголовками. Будь конкретным."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case2_key_results_v2(
@@ -453,7 +481,7 @@ def _case2_key_results_v2(
 Структурируй ответ с заголовками для каждого варианта."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case3_quarterly_decomp_v2(
@@ -482,7 +510,7 @@ def _case3_quarterly_decomp_v2(
 Структурируй как план с разделами по кварталам."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case4_management_verify_v2(
@@ -508,7 +536,7 @@ def _case4_management_verify_v2(
 Структурируй как верификационный чеклист."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case5_conflicts_v2(
@@ -527,16 +555,10 @@ def _case5_conflicts_v2(
 {map_context}
 
 ## Твоя задача:
-1. **Конфликты целей**: есть ли цели, которые противоречат друг другу (конкуренция за ресурсы, разные приоритеты, взаимоисключающие KR)?
-2. **Слепые зоны**: какие важные стратегические направления не охвачены в карте?
-3. **Дисбаланс приоритетов**: равномерно ли распределены усилия? Нет ли перегруза в одних областях при недостатке в других?
-4. **Проблемы структуры**: есть ли цели без логической связи с верхним уровнем? Есть ли «висячие» цели?
-5. **Рекомендации**: как устранить выявленные конфликты и закрыть слепые зоны?
-
-Структурируй как аналитический отчёт с разделами."""},
+{_CASE5_TASK}"""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case6_risks_v2(
@@ -567,7 +589,7 @@ def _case6_risks_v2(
 Структурируй как риск-отчёт с таблицей рисков."""},
     ]
 
-    return llm_service.stream_completion(messages)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
 
 def _case7_express_report_v2(
@@ -586,19 +608,205 @@ def _case7_express_report_v2(
 {map_context}
 
 ## Твоя задача:
-1. **Топ-3 цели с наибольшим отставанием**:
-   - Название и код цели
-   - Текущий прогресс vs ожидаемый
-   - Ключевые проблемы
-   - Рекомендуемые действия
+{_CASE7_TASK}"""},
+    ]
 
-2. **Топ-3 цели в хорошем прогрессе** (для контраста и понимания best practices)
+    return llm_service.stream_completion(llm_service.preflight(messages))
 
-3. **Общая картина**: краткая сводка состояния портфеля целей (1-2 абзаца)
 
-4. **Рекомендации для совещания**: на чём сосредоточить внимание руководства на следующей сессии?
+# ============================================================
+# MAP-REDUCE для карт, не помещающихся в один запрос (кейсы 5, 7)
+# ============================================================
 
-Форматируй как управленческий отчёт: кратко, структурированно, по существу."""},
+# Кейсы по всей карте, которые для больших карт выполняются по частям
+MAP_REDUCE_CASES = (5, 7)
+
+
+class Progress(NamedTuple):
+    """
+    Событие хода map-reduce: выполнено done из total запросов текущего этапа.
+
+    Не является частью ответа: генератор кейса отдаёт его между фрагментами
+    текста, чтобы поток не простаивал, пока идут запросы по частям карты.
+    """
+
+    done: int
+    total: int
+
+
+# Что извлекать из каждой части карты
+_PARTIAL_TASKS = {
+    5: """Это часть {number} из {total} большой карты целей; остальные части анализируются отдельно.
+Выпиши факты, нужные для поиска конфликтов и слепых зон во всей карте:
+1. Цели этой части, которые противоречат друг другу или конкурируют за ресурсы (коды целей и суть противоречия).
+2. Стратегические направления, которые покрыты в этой части, и заметные пробелы.
+3. Перекосы приоритетов и нагрузки (ответственные и подразделения с большим числом целей).
+4. Проблемы структуры: цели без связи с верхним уровнем, «висячие» цели.
+
+Пиши кратко, списками, с кодами целей. Без вступления и выводов по всей карте.""",
+    7: """Это часть {number} из {total} большой карты целей; остальные части анализируются отдельно.
+Выпиши факты для экспресс-отчёта по всей карте:
+1. До 5 целей этой части с наибольшим отставанием: код, название, прогресс, ключевые проблемы.
+2. До 3 целей этой части в хорошем прогрессе: код, название, прогресс.
+3. Краткая сводка состояния этой части (2-3 предложения): число целей, средний прогресс, статусы.
+
+Пиши кратко, списками, с кодами целей. Без вступления и выводов по всей карте.""",
+}
+
+_REDUCE_TASKS = {5: _CASE5_TASK, 7: _CASE7_TASK}
+
+_REDUCE_INTROS = {
+    5: "Проанализируй карту стратегических целей на конфликты, противоречия и слепые зоны.",
+    7: "Подготовь экспресс-отчёт по карте целей для руководства.",
+}
+
+_MERGE_TASK = """Объедини промежуточные итоги анализа частей карты целей в один итог того же формата.
+Сохрани коды целей и факты, убери повторы. Пиши кратко, списками."""
+
+
+async def run_case_map_reduce(
+    case_id: int,
+    partitions: list[str],
+    max_tokens: int,
+) -> AsyncGenerator[str, None]:
+    """
+    Запускает кейс по карте, которая не помещается в один запрос, в режиме map-reduce.
+
+    Каждая часть карты (см. context_builder.partition_map) анализируется
+    отдельным запросом, запросы выполняются параллельно (не больше
+    MAP_REDUCE_CONCURRENCY одновременно). Если промежуточные итоги вместе
+    не помещаются в лимит, они объединяются группами, пока не поместятся.
+    Итоговый запрос по промежуточным итогам возвращается потоком.
+
+    Пока выполняются запросы по частям, генератор отдаёт Progress после
+    каждого завершённого запроса. При ошибке одного запроса или закрытии
+    генератора остальные запросы отменяются.
+
+    Args:
+        case_id: Номер кейса (5 или 7).
+        partitions: Тексты частей карты.
+        max_tokens: Лимит токенов контекста одного запроса.
+
+    Returns:
+        AsyncGenerator[str | Progress, None]: Потоковый генератор событий Progress
+                                              и фрагментов итогового ответа.
+
+    Raises:
+        ValueError: Если кейс не поддерживает map-reduce или части карты не заданы.
+    """
+    if case_id not in MAP_REDUCE_CASES:
+        raise ValueError(f"Кейс {case_id} не выполняется по частям карты. Допустимые кейсы: 5, 7.")
+    if not partitions:
+        raise ValueError(f"Для кейса {case_id} необходимо выбрать карту целей.")
+
+    return _map_reduce(case_id, partitions, max_tokens)
+
+
+async def _map_reduce(
+    case_id: int, partitions: list[str], max_tokens: int
+) -> AsyncGenerator[str | Progress, None]:
+    """Выполняет анализ частей, объединение итогов и потоковый итоговый запрос."""
+    model = get_openai_model()
+    semaphore = asyncio.Semaphore(max(get_map_reduce_concurrency(), 1))
+
+    async def complete(messages: list[dict]) -> str:
+        async with semaphore:
+            return await llm_service.get_completion(llm_service.preflight(messages))
+
+    total = len(partitions)
+    partials: list[str] = []
+    # aclosing: при закрытии потока запросы по частям отменяются сразу, а не при сборке мусора
+    async with aclosing(_complete_all([
+        complete([
+            {"role": "system", "content": SYSTEM_BASE},
+            {"role": "user", "content": f"{_PARTIAL_TASKS[case_id].format(number=number, total=total)}\n\n{part}"},
+        ])
+        for number, part in enumerate(partitions, start=1)
+    ], partials)) as events:
+        async for event in events:
+            yield event
+
+    # Иерархическое объединение: пока итоги не помещаются в один запрос, сводим их группами
+    while len(partials) > 1 and not fits_tokens(_join_partials(partials), max_tokens, model):
+        groups = _group_partials(partials, max_tokens, model)
+        if len(groups) == len(partials):
+            break
+        merged: list[str] = []
+        async with aclosing(_complete_all([
+            complete([
+                {"role": "system", "content": SYSTEM_BASE},
+                {"role": "user", "content": f"{_MERGE_TASK}\n\n{_join_partials(group)}"},
+            ])
+            if len(group) > 1 else _completed(group[0])
+            for group in groups
+        ], merged)) as events:
+            async for event in events:
+                yield event
+        partials = merged
+
+    messages = [
+        {"role": "system", "content": SYSTEM_BASE},
+        {"role": "user", "content": f"""{_REDUCE_INTROS[case_id]}
+Карта слишком большая для одного запроса, поэтому она проанализирована по частям. Ниже — итоги анализа частей.
+
+## Итоги анализа частей карты:
+{_join_partials(partials)}
+
+## Твоя задача:
+{_REDUCE_TASKS[case_id]}"""},
     ]
+    async for chunk in llm_service.stream_completion(llm_service.preflight(messages)):
+        yield chunk
+
+
+async def _complete_all(aws: list[Awaitable[str]], results: list[str]) -> AsyncGenerator[Progress, None]:
+    """
+    Выполняет запросы параллельно и отдаёт Progress после завершения каждого.
+
+    При ошибке одного запроса (или закрытии генератора) остальные
+    отменяются, как в targets_api._gather_or_cancel: платные запросы
+    к LLM не продолжают выполняться впустую.
 
-    return llm_service.stream_completion(messages)
+    Args:
+        aws: Корутины запросов.
+        results: Список, в который после успешного завершения всех
+                 запросов записываются их результаты в порядке aws.
+
+    Raises:
+        Exception: Первое исключение среди запросов.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
+    try:
+        for done, finished in enumerate(asyncio.as_completed(tasks), start=1):
+            await finished
+            yield Progress(done, len(tasks))
+    finally:
+        for task in tasks:
+            task.cancel()
+        # Дожидаемся отмены, чтобы не оставлять висящих задач
+        await asyncio.gather(*tasks, return_exceptions=True)
+    results.extend(task.result() for task in tasks)
+
+
+async def _completed(value: str) -> str:
+    """Готовое значение в виде корутины (для asyncio.gather)."""
+    return value
+
+
+def _join_partials(partials: list[str]) -> str:
+    """Склеивает промежуточные итоги с заголовками по номерам."""
+    return "\n\n".join(f"### Итог {number}\n{text}" for number, text in enumerate(partials, start=1))
+
+
+def _group_partials(partials: list[str], max_tokens: int, model: str) -> list[list[str]]:
+    """Делит промежуточные итоги на группы подряд идущих итогов, каждая из которых помещается в лимит."""
+    groups: list[list[str]] = []
+    used = 0
+    for text in partials:
+        tokens = estimate_tokens(text, model) + 8
+        if not groups or used + tokens > max_tokens:
+            groups.append([])
+            used = 0
+        groups[-1].append(text)
+        used += tokens
+    return groups
@@ -60,7 +60,7 @@ async def run_chat(
     for msg in messages:
         llm_messages.append({"role": msg.role, "content": msg.content})
 
-    return llm_service.stream_completion(llm_messages)
+    return llm_service.stream_completion(llm_service.preflight(llm_messages, prune_history=True))
 
 
 async def run_chat_v2(
@@ -105,4 +105,4 @@ async def run_chat_v2(
     for msg in messages:
         llm_messages.append({"role": msg.role, "content": msg.content})
 
-    return llm_service.stream_completion(llm_messages)
+    return llm_service.stream_completion(llm_service.preflight(llm_messages, prune_history=True))
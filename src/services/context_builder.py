@@ -1,10 +1,76 @@
 """Формирование компактного текстового контекста для передачи в LLM."""
 
-from typing import List
+import logging
+from array import array
+from typing import Iterable, List, Optional, Tuple
+
 import tiktoken
 
+from src.models.goal_graph import GoalGraph, GoalView
 from src.models.targets import GoalNode, TargetsMap, TargetDetail, KeyResult
 
+logger = logging.getLogger("context_builder")
+
+# Кодировки tiktoken по моделям; None — словарь BPE недоступен, используется приблизительная оценка
+_encodings: dict[str, Optional[tiktoken.Encoding]] = {}
+
+
+class RenderedContext:
+    """
+    Готовый текстовый контекст для LLM с лениво посчитанным числом токенов.
+
+    Число токенов считается при первом запросе для каждой модели и
+    запоминается вместе с текстом; если оно уже посчитано при построении
+    контекста (TokenCounter), передаётся в конструктор.
+    """
+
+    __slots__ = ("text", "_tokens")
+
+    def __init__(self, text: str, tokens: Optional[dict[str, int]] = None):
+        self.text = text
+        self._tokens: dict[str, int] = dict(tokens or {})
+
+    def tokens(self, model: str = "gpt-4o") -> int:
+        """Возвращает число токенов текста для модели (см. estimate_tokens)."""
+        count = self._tokens.get(model)
+        if count is None:
+            count = self._tokens[model] = estimate_tokens(self.text, model)
+        return count
+
+    @property
+    def nbytes(self) -> int:
+        """Приблизительный объём в памяти (для лимита кэша)."""
+        return len(self.text) * 2 + 64 * (len(self._tokens) + 1)
+
+
+class TokenCounter:
+    """
+    Счётчик токенов по строкам контекста.
+
+    Каждая уникальная строка кодируется один раз, поэтому при построении
+    контекста бюджет проверяется по ходу добавления строк, а повторная
+    сборка с другими сокращениями не перекодирует весь текст. Сумма по
+    строкам с учётом переводов строк — оценка сверху для склеенного текста
+    с точностью до слияния токенов на границах строк.
+    """
+
+    __slots__ = ("model", "_lines")
+
+    def __init__(self, model: str = "gpt-4o"):
+        self.model = model
+        self._lines: dict[str, int] = {}
+
+    def line(self, text: str) -> int:
+        """Возвращает число токенов строки (с учётом перевода строки после неё)."""
+        count = self._lines.get(text)
+        if count is None:
+            count = self._lines[text] = estimate_tokens(text, self.model) + 1
+        return count
+
+    def lines(self, lines: Iterable[str]) -> int:
+        """Возвращает число токенов строк, склеенных через перевод строки."""
+        return sum(self.line(text) for text in lines)
+
 
 def normalize_text(text: str | None) -> str:
     """
@@ -33,12 +99,12 @@ def normalize_text(text: str | None) -> str:
     return result
 
 
-def build_map_context(nodes: List[GoalNode], map_info: TargetsMap) -> str:
+def build_map_context(graph: GoalGraph | List[GoalNode], map_info: TargetsMap) -> str:
     """
     Формирует компактный текстовый контекст карты целей.
 
     Args:
-        nodes: Список узлов целей из MapGraph.
+        graph: Граф карты (GoalGraph) или список узлов GoalNode.
         map_info: Информация о карте целей.
 
     Returns:
@@ -55,67 +121,422 @@ def build_map_context(nodes: List[GoalNode], map_info: TargetsMap) -> str:
           Отчёт ({ReportDate}): {LastAchievementStatus.Description}
         ---
     """
-    lines = []
-    lines.append(
+    if not isinstance(graph, GoalGraph):
+        graph = GoalGraph.from_nodes(graph)
+    return _render_map(graph, map_info, _Pruning())
+
+
+# Ранг приоритета для сворачивания листьев: сначала сворачиваются цели с меньшим рангом
+_PRIORITY_RANK = {"Low": 0, "Medium": 1, "High": 2}
+
+
+class _Pruning:
+    """
+    Параметры сокращения контекста карты.
+
+    Attributes:
+        reports: Включать тексты отчётов.
+        leaf_rank: Сворачивать листовые (не корневые) цели с рангом приоритета
+            не выше этого значения (-1 — не сворачивать).
+        depth_cap: Сворачивать цели глубже этого уровня в сводку по предку (None — не сворачивать).
+        root_limit: Сколько корневых поддеревьев выводить (None — все).
+    """
+
+    __slots__ = ("reports", "leaf_rank", "depth_cap", "root_limit")
+
+    def __init__(self, reports: bool = True, leaf_rank: int = -1,
+                 depth_cap: int | None = None, root_limit: int | None = None):
+        self.reports = reports
+        self.leaf_rank = leaf_rank
+        self.depth_cap = depth_cap
+        self.root_limit = root_limit
+
+    def describe(self) -> str:
+        """Описание применённых сокращений для заголовка контекста ("" — без сокращений)."""
+        parts = []
+        if not self.reports:
+            parts.append("без текстов отчётов")
+        if self.leaf_rank >= 0:
+            parts.append("свёрнуты листовые цели с приоритетом " + (
+                "Low" if self.leaf_rank == 0 else "ниже High"
+            ))
+        if self.depth_cap is not None:
+            parts.append(f"цели глубже уровня {self.depth_cap + 1} сведены в итоги по поддеревьям")
+        if self.root_limit is not None:
+            parts.append(f"показаны первые {self.root_limit} корневых поддеревьев")
+        return "; ".join(parts)
+
+
+def _hidden_nodes(graph: GoalGraph, pruning: _Pruning) -> bytearray:
+    """Отмечает узлы, которые не выводятся отдельными блоками (1 — свёрнут)."""
+    index = graph.index
+    hidden = bytearray(len(graph))
+    if pruning.leaf_rank >= 0:
+        for i in range(len(graph)):
+            if index.parent[i] >= 0 and not len(index.children(i)):
+                rank = _PRIORITY_RANK.get(graph.string(graph.priority[i]), 1)
+                if rank <= pruning.leaf_rank:
+                    hidden[i] = 1
+    if pruning.depth_cap is not None:
+        for i in range(len(graph)):
+            if index.depth[i] > pruning.depth_cap:
+                hidden[i] = 1
+    if pruning.root_limit is not None:
+        shown_roots = 0
+        for position, node in enumerate(index.order):
+            if index.depth[node] == 0:
+                shown_roots += 1
+            if shown_roots > pruning.root_limit:
+                for rest in index.order[position:]:
+                    hidden[rest] = 1
+                break
+    return hidden
+
+
+def _summary_line(graph: GoalGraph, members: List[int]) -> str:
+    """Строка-итог по свёрнутым подцелям: число, средний прогресс, статусы."""
+    progress = sum(graph.progress[i] for i in members) / len(members)
+    statuses: dict[str, int] = {}
+    for i in members:
+        name = graph.string(graph.status_name[i]) or "—"
+        statuses[name] = statuses.get(name, 0) + 1
+    status_str = ", ".join(
+        f"{name}: {count}" for name, count in sorted(statuses.items(), key=lambda item: -item[1])
+    )
+    return f"  Свёрнуто подцелей: {len(members)} | Средний прогресс: {progress:.1f}% | Статусы: {status_str}"
+
+
+def _map_header(map_info: TargetsMap) -> str:
+    """Заголовок контекста карты."""
+    return (
         f"Карта целей: {map_info.Name} | Период: {map_info.PeriodLabel} | "
         f"Прогресс: {map_info.AchievementPercentage}%\n"
     )
 
-    # Создаём словарь для быстрого поиска целей по ID
-    nodes_by_id = {str(node.TargetId): node for node in nodes}
-
-    for node in nodes:
-        lines.append(f"[{node.Code}] {node.Name}")
-
-        # Ответственный и подразделение
-        responsible = (node.Responsible.Name or "—") if node.Responsible else "—"
-        unit = (node.StructuralUnit.Name or "—") if node.StructuralUnit else "—"
-        lines.append(f"  Ответственный: {responsible} | Подразделение: {unit}")
-
-        # Период, приоритет, прогресс, КР
-        period = (node.Period.Name or "—") if node.Period else "—"
-        lines.append(
-            f"  Период: {period} | Приоритет: {node.Priority} | "
-            f"Прогресс: {node.Progress}% | КР: {node.KeyResultCount}"
-        )
-
-        # Статус
-        status_name = (node.Status.Name or "—") if node.Status else "—"
-        status_icon = f" {node.Status.Icon}" if node.Status and node.Status.Icon else ""
-        lines.append(f"  Статус: {status_name}{status_icon}")
-
-        # Дочерние цели
-        if node.ChildIds:
-            child_codes = []
-            for child_id in node.ChildIds:
-                child_node = nodes_by_id.get(str(child_id))
-                if child_node:
-                    child_codes.append(f"{child_node.Code}")
-            child_str = ", ".join(child_codes) if child_codes else "—"
-        else:
-            child_str = "—"
-        lines.append(f"  Дочерние: {child_str}")
-
-        # Последний отчёт (LastAchievementStatus может быть dict или объектом)
-        las = node.Status.LastAchievementStatus if node.Status else None
-        if las:
-            if isinstance(las, dict):
-                description = las.get("Description") or ""
-                report_date = las.get("ReportDate") or "—"
-            else:
-                description = getattr(las, "Description", None) or ""
-                report_date = getattr(las, "ReportDate", None) or "—"
-            if description:
-                description = normalize_text(description)
-                if len(description) > 500:
-                    description = description[:500] + "..."
-                lines.append(f"  Отчёт ({report_date}): {description}")
-
-        lines.append("---\n")
 
+def _node_lines(
+    graph: GoalGraph,
+    node: GoalView,
+    pruning: _Pruning,
+    hidden: bytearray | None = None,
+    collapsed: List[int] | None = None,
+) -> List[str]:
+    """
+    Формирует строки блока одной цели.
+
+    Args:
+        graph: Граф карты.
+        node: Узел графа.
+        pruning: Параметры сокращения (учитывается вывод отчётов).
+        hidden: Отметки свёрнутых узлов — они не перечисляются в дочерних.
+        collapsed: Свёрнутые в этот узел подцели для строки-итога.
+    """
+    lines = [f"[{node.code}] {node.name}"]
+
+    # Ответственный и подразделение
+    responsible = node.responsible_name or "—"
+    unit = node.unit_name or "—"
+    lines.append(f"  Ответственный: {responsible} | Подразделение: {unit}")
+
+    # Период, приоритет, прогресс, КР
+    period = node.period_name or "—"
+    lines.append(
+        f"  Период: {period} | Приоритет: {node.priority} | "
+        f"Прогресс: {node.progress}% | КР: {node.key_result_count}"
+    )
+
+    # Статус
+    status_name = node.status_name or "—"
+    status_icon = f" {node.status_icon}" if node.status_icon else ""
+    lines.append(f"  Статус: {status_name}{status_icon}")
+
+    # Дочерние цели (индексы детей посчитаны при построении графа)
+    child_codes = [
+        graph.codes[child] for child in graph.children(node.index) if hidden is None or not hidden[child]
+    ]
+    child_str = ", ".join(child_codes) if child_codes else "—"
+    lines.append(f"  Дочерние: {child_str}")
+    if collapsed:
+        lines.append(_summary_line(graph, collapsed))
+
+    # Последний отчёт
+    report = node.report
+    if report and pruning.reports:
+        report_date, description = report
+        description = normalize_text(description)
+        if len(description) > 500:
+            description = description[:500] + "..."
+        lines.append(f"  Отчёт ({report_date}): {description}")
+
+    lines.append("---\n")
+    return lines
+
+
+def _render_map_lines(
+    graph: GoalGraph,
+    map_info: TargetsMap,
+    pruning: _Pruning,
+    counter: Optional[TokenCounter] = None,
+    max_tokens: Optional[int] = None,
+) -> Optional[Tuple[List[str], int]]:
+    """
+    Формирует строки контекста карты с учётом сокращений.
+
+    Без сокращений результат совпадает с полным форматом build_map_context.
+    Свёрнутые цели не выводятся отдельными блоками: их число, средний
+    прогресс и статусы выводятся строкой-итогом у ближайшего показанного
+    предка, поэтому иерархия показанных целей сохраняется.
+
+    Args:
+        graph: Граф карты.
+        map_info: Информация о карте целей.
+        pruning: Параметры сокращения.
+        counter: Счётчик токенов; если задан, токены считаются по мере добавления строк.
+        max_tokens: Лимит токенов: сборка прекращается, как только он превышен.
+
+    Returns:
+        Optional[Tuple[List[str], int]]: Строки и число токенов (0 без счётчика)
+            или None, если лимит превышен.
+    """
+    index = graph.index
+    hidden = _hidden_nodes(graph, pruning)
+
+    # Свёрнутые узлы — к ближайшему показанному предку (обход в глубину идёт от предков к потомкам)
+    collapsed: dict[int, List[int]] = {}
+    skipped_roots: List[int] = []
+    owner = array("i", [-1]) * len(graph)
+    for node in index.order:
+        if not hidden[node]:
+            owner[node] = node
+            continue
+        parent = index.parent[node]
+        owner[node] = owner[parent] if parent >= 0 else -1
+        if owner[node] >= 0:
+            collapsed.setdefault(owner[node], []).append(node)
+        else:
+            skipped_roots.append(node)
+
+    lines = [_map_header(map_info)]
+    note = pruning.describe()
+    if note:
+        lines.append(f"Контекст сокращён под лимит модели: {note}.\n")
+    if skipped_roots:
+        roots = sum(1 for node in skipped_roots if index.depth[node] == 0)
+        footer = f"Не показано корневых поддеревьев: {roots} (целей: {len(skipped_roots)})"
+    else:
+        footer = None
+
+    tokens = 0
+    if counter is not None:
+        tokens = counter.lines(lines) + (counter.line(footer) if footer else 0)
+    for node in graph:
+        if hidden[node.index]:
+            continue
+        block = _node_lines(graph, node, pruning, hidden, collapsed.get(node.index))
+        lines.extend(block)
+        if counter is not None:
+            tokens += counter.lines(block)
+            if max_tokens is not None and tokens > max_tokens:
+                return None
+
+    if footer:
+        lines.append(footer)
+    if counter is not None and max_tokens is not None and tokens > max_tokens:
+        return None
+    return lines, tokens
+
+
+def _render_map(graph: GoalGraph, map_info: TargetsMap, pruning: _Pruning) -> str:
+    """Формирует текст контекста карты с учётом сокращений (см. _render_map_lines)."""
+    lines, _ = _render_map_lines(graph, map_info, pruning)
     return "\n".join(lines)
 
 
+def _pruning_steps(graph: GoalGraph) -> List[_Pruning]:
+    """
+    Возвращает шаги сокращения карты от мягкого к жёсткому (без ограничения числа корней).
+
+    Сначала убираются тексты отчётов, затем сворачиваются листовые цели
+    низкого и среднего приоритета, затем поддеревья сводятся в итоги,
+    начиная с самых глубоких уровней, вплоть до одних корней.
+    """
+    steps = [_Pruning(), _Pruning(reports=False), _Pruning(reports=False, leaf_rank=0),
+             _Pruning(reports=False, leaf_rank=1)]
+    max_depth = max(graph.index.depth, default=0)
+    for cap in range(max_depth - 1, -1, -1):
+        steps.append(_Pruning(reports=False, leaf_rank=1, depth_cap=cap))
+    return steps
+
+
+def fits_tokens(context: "RenderedContext | str", max_tokens: int, model: str = "gpt-4o") -> bool:
+    """
+    Проверяет, что текст укладывается в лимит токенов.
+
+    Токен BPE кодирует хотя бы один байт, поэтому текст, размер которого
+    в UTF-8 не больше лимита, не токенизируется.
+
+    Args:
+        context: Текст или RenderedContext (его число токенов запоминается).
+        max_tokens: Лимит токенов.
+        model: Модель, по токенизатору которой считается размер.
+
+    Returns:
+        bool: True, если текст помещается в лимит.
+    """
+    text = context.text if isinstance(context, RenderedContext) else context
+    if len(text.encode("utf-8")) <= max_tokens:
+        return True
+    if isinstance(context, RenderedContext):
+        return context.tokens(model) <= max_tokens
+    return estimate_tokens(text, model) <= max_tokens
+
+
+def build_map_context_budgeted(
+    graph: GoalGraph | List[GoalNode],
+    map_info: TargetsMap,
+    max_tokens: int,
+    model: str = "gpt-4o",
+) -> RenderedContext:
+    """
+    Формирует контекст карты, который укладывается в лимит токенов.
+
+    Если полный контекст (build_map_context) не помещается в лимит, он
+    сокращается по шагам: без текстов отчётов; со свёрнутыми листовыми
+    целями низкого, затем среднего приоритета; с поддеревьями, сведёнными
+    в итоги (число целей, средний прогресс, статусы) начиная с самых
+    глубоких уровней. Иерархия показанных целей сохраняется. Если не
+    помещаются даже корни, выводится столько корневых целей, сколько
+    помещается, и число непоказанных.
+
+    Args:
+        graph: Граф карты (GoalGraph) или список узлов GoalNode.
+        map_info: Информация о карте целей.
+        max_tokens: Лимит токенов контекста.
+        model: Модель, по токенизатору которой считается размер.
+
+    Токены считаются по строкам во время сборки (TokenCounter): сборка
+    варианта прекращается, как только лимит превышен, а строки, общие для
+    разных вариантов, не кодируются повторно.
+
+    Returns:
+        RenderedContext: Контекст с посчитанным числом токенов для model.
+    """
+    if not isinstance(graph, GoalGraph):
+        graph = GoalGraph.from_nodes(graph)
+    counter = TokenCounter(model)
+
+    def fits(pruning: _Pruning) -> RenderedContext | None:
+        rendered = _render_map_lines(graph, map_info, pruning, counter, max_tokens)
+        if rendered is None:
+            return None
+        lines, tokens = rendered
+        return RenderedContext("\n".join(lines), {model: tokens})
+
+    for pruning in _pruning_steps(graph):
+        context = fits(pruning)
+        if context is not None:
+            return context
+
+    # Не помещаются даже корни: бинарный поиск по числу корневых поддеревьев
+    best = None
+    low, high = 0, sum(1 for depth in graph.index.depth if depth == 0)
+    while low <= high:
+        middle = (low + high) // 2
+        context = fits(_Pruning(reports=False, leaf_rank=1, depth_cap=0, root_limit=middle))
+        if context is not None:
+            best, low = context, middle + 1
+        else:
+            high = middle - 1
+    if best is None:
+        lines, tokens = _render_map_lines(graph, map_info, _Pruning(
+            reports=False, leaf_rank=1, depth_cap=0, root_limit=0,
+        ), counter)
+        best = RenderedContext("\n".join(lines), {model: tokens})
+    return best
+
+
+def partition_map(
+    graph: GoalGraph | List[GoalNode],
+    map_info: TargetsMap,
+    max_tokens: int,
+    model: str = "gpt-4o",
+) -> List[str]:
+    """
+    Делит полный контекст карты на части, каждая из которых укладывается в лимит токенов.
+
+    Части собираются из целых поддеревьев в порядке обхода в глубину:
+    поддерево, которое помещается в лимит, целиком попадает в одну часть;
+    слишком большое поддерево делится по его дочерним поддеревьям. Каждая
+    часть начинается с заголовка карты с номером части и, если её первая
+    цель не корневая, с пути от корня до этой цели.
+
+    Args:
+        graph: Граф карты (GoalGraph) или список узлов GoalNode.
+        map_info: Информация о карте целей.
+        max_tokens: Лимит токенов одной части.
+        model: Модель, по токенизатору которой считается размер.
+
+    Returns:
+        List[str]: Тексты частей; одна часть — полный контекст карты, если он помещается в лимит.
+    """
+    if not isinstance(graph, GoalGraph):
+        graph = GoalGraph.from_nodes(graph)
+    counter = TokenCounter(model)
+    header_tokens = counter.line(_map_header(map_info))
+    full = _render_map_lines(graph, map_info, _Pruning(), counter, max_tokens)
+    if full is not None:
+        return ["\n".join(full[0])]
+
+    index = graph.index
+    pruning = _Pruning()
+    node_lines = [_node_lines(graph, graph[node], pruning) for node in index.order]
+    blocks = ["\n".join(lines) for lines in node_lines]
+    # Префиксные суммы токенов блоков в порядке обхода: токены поддерева — разность двух сумм
+    prefix = [0]
+    for lines in node_lines:
+        prefix.append(prefix[-1] + counter.lines(lines))
+    header_tokens += counter.line(" | Часть 0000 из 0000")
+
+    parts: List[tuple[str, List[str]]] = []
+    current: List[str] = []
+    used = 0
+    budget = max_tokens - header_tokens
+
+    def start_part(node: int) -> None:
+        nonlocal current, used, budget
+        path = " > ".join(f"[{graph.codes[i]}] {graph.names[i]}" for i in reversed(index.ancestors(node)))
+        path_line = f"Путь от корня: {path}\n" if path else ""
+        current = []
+        parts.append((path_line, current))
+        used = 0
+        budget = max_tokens - header_tokens - (counter.line(path_line) if path_line else 0)
+
+    position = 0
+    while position < len(blocks):
+        node = index.order[position]
+        end = index.subtree_end[node]
+        subtree_tokens = prefix[end] - prefix[position]
+        # Поддерево не помещается в остаток текущей части — оно начинает новую часть
+        if not parts or (current and used + subtree_tokens > budget):
+            start_part(node)
+        if used + subtree_tokens <= budget:
+            current.extend(blocks[position:end])
+            used += subtree_tokens
+            position = end
+        else:
+            # Поддерево больше части: берём сам узел, его дети распределяются дальше по частям
+            current.append(blocks[position])
+            used += prefix[position + 1] - prefix[position]
+            position += 1
+
+    total = len(parts)
+    header = _map_header(map_info).rstrip("\n")
+    return [
+        "\n".join([f"{header} | Часть {number} из {total}\n", *([path_line] if path_line else []), *part_blocks])
+        for number, (path_line, part_blocks) in enumerate(parts, start=1)
+    ]
+
+
 def build_target_context(target: TargetDetail, key_results: List[KeyResult]) -> str:
     """
     Формирует компактный текстовый контекст цели.
@@ -187,6 +608,43 @@ def build_target_context(target: TargetDetail, key_results: List[KeyResult]) ->
     return "\n".join(lines)
 
 
+def get_encoding(model: str = "gpt-4o") -> Optional[tiktoken.Encoding]:
+    """
+    Возвращает кодировку tiktoken для модели (загружается один раз на процесс).
+
+    Для неизвестных моделей используется cl100k_base. Словари BPE
+    читаются из TIKTOKEN_CACHE_DIR (в Docker-образ они загружаются при
+    сборке); если словарь недоступен (нет сети и кэша), возвращается None
+    и токены оцениваются приблизительно (см. estimate_tokens).
+
+    Args:
+        model: Название модели.
+
+    Returns:
+        Optional[tiktoken.Encoding]: Кодировка или None.
+    """
+    if model in _encodings:
+        return _encodings[model]
+    try:
+        name = tiktoken.encoding_name_for_model(model)
+    except KeyError:
+        # Fallback на cl100k_base для неизвестных моделей
+        name = "cl100k_base"
+    try:
+        encoding = tiktoken.get_encoding(name)
+    except Exception as e:
+        logger.warning("Tiktoken encoding %s for %s is unavailable, using approximate counts: %s", name, model, e)
+        encoding = None
+    _encodings[model] = encoding
+    return encoding
+
+
+def load_encodings(models: Iterable[str]) -> None:
+    """Загружает кодировки моделей заранее (при запуске приложения)."""
+    for model in models:
+        get_encoding(model)
+
+
 def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
     """
     Оценивает количество токенов в тексте через tiktoken.
@@ -199,11 +657,10 @@ def estimate_tokens(text: str, model: str = "gpt-4o") -> int:
         int: Примерное количество токенов.
 
     Используется для проверки размера контекста перед передачей в модель.
+    Если словарь BPE недоступен, оценка — один токен на три байта UTF-8
+    (с запасом для кириллицы и английского текста).
     """
-    try:
-        encoding = tiktoken.encoding_for_model(model)
-    except KeyError:
-        # Fallback на cl100k_base для неизвестных моделей
-        encoding = tiktoken.get_encoding("cl100k_base")
-
-    return len(encoding.encode(text))
+    encoding = get_encoding(model)
+    if encoding is None:
+        return (len(text.encode("utf-8")) + 2) // 3
+    return len(encoding.encode_ordinary(text))
@@ -0,0 +1,212 @@
+"""Кэш готовых текстовых контекстов карт и целей для LLM."""
+
+import hashlib
+from typing import Hashable, List, Optional
+
+from src.config import get_context_cache_ttl, get_context_cache_max_bytes
+from src.models.goal_graph import GoalGraph
+from src.models.targets import KeyResult, TargetDetail, TargetsMap
+from src.services.cache import TTLCache
+from src.services.context_builder import (
+    RenderedContext, build_map_context, build_map_context_budgeted, build_target_context, partition_map,
+)
+
+# Контексты общие для всех сессий: граф карты с одинаковым содержимым даёт одинаковый текст
+_cache: TTLCache | None = None
+
+# Ключи записей по владельцу (("map", ID карты) или ("target", ID цели)) —
+# чтобы сбрасывать контексты прежних версий данных
+_keys_by_owner: dict[tuple[str, int], set[tuple]] = {}
+
+# Отдельные счётчики обращений к контекстам целей
+_target_stats = {"hits": 0, "misses": 0}
+
+
+def _owner(key: tuple) -> tuple[str, int]:
+    """Возвращает владельца записи: ("target", ID цели) или ("map", ID карты)."""
+    return ("target" if key[0] == "target" else "map", key[1])
+
+
+def _forget_key(key: Hashable) -> None:
+    """Убирает ключ вытесненной или удалённой записи из _keys_by_owner."""
+    owner = _owner(key)
+    keys = _keys_by_owner.get(owner)
+    if keys is not None:
+        keys.discard(key)
+        if not keys:
+            del _keys_by_owner[owner]
+
+
+def _store(key: tuple, value: object) -> None:
+    """Сохраняет запись, предварительно удалив записи прежних версий того же владельца."""
+    owner = _owner(key)
+    _drop_versions(owner, keep_version=key[2])
+    get_cache().set(key, value)
+    _keys_by_owner.setdefault(owner, set()).add(key)
+
+
+def _drop_versions(owner: tuple[str, int], keep_version: Optional[str] = None) -> None:
+    """Удаляет записи владельца, кроме записей версии keep_version."""
+    cache = get_cache()
+    for key in list(_keys_by_owner.get(owner, ())):
+        if key[2] != keep_version:
+            cache.pop(key)
+
+
+def get_cache() -> TTLCache:
+    """
+    Возвращает кэш контекстов (создаётся при первом обращении).
+
+    Returns:
+        TTLCache: Кэш с TTL CONTEXT_CACHE_TTL и лимитом CONTEXT_CACHE_MAX_MB.
+    """
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(
+            max_bytes=get_context_cache_max_bytes(),
+            default_ttl=get_context_cache_ttl(),
+            on_remove=_forget_key,
+        )
+    return _cache
+
+
+def get_map_context(
+    map_id: int,
+    graph: GoalGraph,
+    map_info: TargetsMap,
+    max_tokens: Optional[int] = None,
+    model: str = "gpt-4o",
+) -> RenderedContext:
+    """
+    Возвращает контекст карты для LLM, отрисовывая его только при первом обращении.
+
+    Ключ записи — ID карты, хэш содержимого графа, поля заголовка карты и
+    лимит токенов, поэтому обновлённый граф с новыми данными получает новый
+    контекст, а контексты прежних версий графа этой карты удаляются.
+
+    Args:
+        map_id: ID карты.
+        graph: Граф карты.
+        map_info: Информация о карте для заголовка контекста.
+        max_tokens: Лимит токенов (None — полный контекст без сокращений).
+        model: Модель, по токенизатору которой проверяется лимит.
+
+    Returns:
+        RenderedContext: Текст контекста и число его токенов.
+    """
+    cache = get_cache()
+    key = (
+        "map", map_id, graph.version, map_info.Name, map_info.PeriodLabel, map_info.AchievementPercentage,
+        max_tokens, model if max_tokens is not None else None,
+    )
+    context = cache.get(key)
+    if context is None:
+        if max_tokens is None:
+            context = RenderedContext(build_map_context(graph, map_info))
+        else:
+            context = build_map_context_budgeted(graph, map_info, max_tokens, model)
+        _store(key, context)
+    return context
+
+
+def get_map_partitions(
+    map_id: int,
+    graph: GoalGraph,
+    map_info: TargetsMap,
+    max_tokens: int,
+    model: str = "gpt-4o",
+) -> List[str]:
+    """
+    Возвращает части контекста карты для анализа по частям (см. partition_map).
+
+    Кэшируется так же, как контекст карты: по версии графа, заголовку и лимиту.
+
+    Args:
+        map_id: ID карты.
+        graph: Граф карты.
+        map_info: Информация о карте для заголовков частей.
+        max_tokens: Лимит токенов одной части.
+        model: Модель, по токенизатору которой проверяется лимит.
+
+    Returns:
+        List[str]: Тексты частей (одна часть, если карта помещается в лимит целиком).
+    """
+    cache = get_cache()
+    key = (
+        "partitions", map_id, graph.version, map_info.Name, map_info.PeriodLabel,
+        map_info.AchievementPercentage, max_tokens, model,
+    )
+    partitions = cache.get(key)
+    if partitions is None:
+        partitions = partition_map(graph, map_info, max_tokens, model)
+        _store(key, partitions)
+    return partitions
+
+
+def invalidate_map(map_id: int, keep_version: Optional[str] = None) -> None:
+    """
+    Удаляет контексты карты.
+
+    Args:
+        map_id: ID карты.
+        keep_version: Версия графа, контексты которой сохраняются (None — удалить все).
+    """
+    _drop_versions(("map", map_id), keep_version)
+
+
+def target_version(target: TargetDetail, key_results: List[KeyResult]) -> str:
+    """
+    Хэш данных цели и её КР — версия, по которой проверяется готовый контекст.
+
+    Args:
+        target: Расширенная информация по цели.
+        key_results: Ключевые результаты цели.
+
+    Returns:
+        str: Hex-дайджест blake2b.
+    """
+    digest = hashlib.blake2b(target.model_dump_json().encode("utf-8"), digest_size=16)
+    for kr in key_results:
+        digest.update(b"\x1e")
+        digest.update(kr.model_dump_json().encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_target_context(target_id: int, target_data: dict) -> RenderedContext:
+    """
+    Возвращает контекст цели для LLM, отрисовывая его только при первом обращении.
+
+    Контексты целей хранятся в общем кэше контекстов по ключу из ID цели
+    и версии её данных (target_version), поэтому учитываются в лимите
+    CONTEXT_CACHE_MAX_MB; контекст прежней версии цели удаляется.
+    Данные цели из кэша сессии не изменяются.
+
+    Args:
+        target_id: ID цели.
+        target_data: {"detail": TargetDetail, "key_results": List[KeyResult]}.
+
+    Returns:
+        RenderedContext: Текст контекста и число его токенов.
+    """
+    key = ("target", target_id, target_version(target_data["detail"], target_data["key_results"]))
+    context = get_cache().get(key)
+    if context is not None:
+        _target_stats["hits"] += 1
+        return context
+    _target_stats["misses"] += 1
+    context = RenderedContext(build_target_context(target_data["detail"], target_data["key_results"]))
+    _store(key, context)
+    return context
+
+
+def clear() -> None:
+    """Сбрасывает кэш контекстов (используется в тестах и при смене настроек)."""
+    global _cache
+    _cache = None
+    _keys_by_owner.clear()
+    _target_stats.update(hits=0, misses=0)
+
+
+def stats() -> dict:
+    """Возвращает метрики кэша контекстов (hits, misses, entries, bytes...) и отдельно обращений к контекстам целей (targets)."""
+    return {**get_cache().stats(), "targets": dict(_target_stats)}
@@ -0,0 +1,262 @@
+"""Дисковый кэш сырых ответов Targets API (data/cache)."""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Hashable, NamedTuple, Optional
+
+logger = logging.getLogger("disk_cache")
+
+
+class JsonFile(NamedTuple):
+    """
+    Готовый JSON-текст в открытом файле (например, тело ответа, скопированное при потоковом разборе).
+
+    DiskCache.set копирует его в запись как есть, без разбора и сериализации в памяти.
+    """
+
+    file: BinaryIO
+
+
+class DiskEntry(NamedTuple):
+    """Запись дискового кэша: данные, возраст в секундах и метаданные."""
+
+    data: Any
+    age: float
+    meta: Optional[dict]
+
+
+class DiskCache:
+    """
+    Кэш JSON-ответов в файлах с атомарной записью и лимитом общего объёма.
+
+    Каждая запись — отдельный файл <sha256 ключа>.json с данными и
+    метаданными; момент сохранения — время изменения файла, поэтому
+    подтверждение актуальности записи (touch) не переписывает данные.
+    Индекс файлов строится лениво при первом обращении, сами данные
+    читаются с диска только по запросу. При превышении лимита удаляются
+    самые старые файлы. Методы безопасны для вызова из пула
+    потоков (aget/aset).
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int,
+        clock: Callable[[], float] = time.time,
+    ):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._clock = clock
+        self._index: Optional[dict[str, tuple[int, float]]] = None
+        self._lock = threading.RLock()
+        self._bytes = 0
+        self._stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0, "errors": 0}
+
+    @staticmethod
+    def _filename(key: Hashable) -> str:
+        """Возвращает имя файла записи по ключу."""
+        return hashlib.sha256(repr(key).encode("utf-8")).hexdigest() + ".json"
+
+    def _ensure_index(self) -> dict[str, tuple[int, float]]:
+        """Строит индекс файлов кэша (размер, время сохранения) при первом обращении."""
+        if self._index is not None:
+            return self._index
+
+        os.makedirs(self._directory, exist_ok=True)
+        index = {}
+        with os.scandir(self._directory) as entries:
+            for entry in entries:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".tmp"):
+                    # Остаток прерванной записи
+                    os.unlink(entry.path)
+                    continue
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    index[entry.name] = (stat.st_size, stat.st_mtime)
+        self._index = index
+        self._bytes = sum(size for size, _ in index.values())
+        return index
+
+    def get(self, key: Hashable) -> Optional[DiskEntry]:
+        """
+        Читает запись с диска.
+
+        Args:
+            key: Ключ записи.
+
+        Returns:
+            DiskEntry | None: (данные, возраст в секундах, метаданные) или None.
+        """
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: Hashable) -> Optional[DiskEntry]:
+        """Читает запись с диска (вызывается под блокировкой)."""
+        index = self._ensure_index()
+        name = self._filename(key)
+        if name not in index:
+            self._stats["misses"] += 1
+            return None
+
+        path = os.path.join(self._directory, name)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+            data = record["data"]
+            meta = record.get("meta")
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Повреждённый или удалённый файл — считаем промахом
+            logger.warning("Disk cache entry %s is unreadable: %s", name, e)
+            self._stats["errors"] += 1
+            self._stats["misses"] += 1
+            self._discard(name)
+            return None
+
+        self._stats["hits"] += 1
+        return DiskEntry(data, max(0.0, self._clock() - index[name][1]), meta)
+
+    def set(self, key: Hashable, data: Any, meta: Optional[dict] = None) -> None:
+        """
+        Атомарно сохраняет запись на диск и применяет лимит объёма.
+
+        Данные пишутся во временный файл в той же директории и подменяют
+        старую запись через os.replace, поэтому читатели никогда не видят
+        частично записанный файл.
+
+        Args:
+            key: Ключ записи.
+            data: JSON-сериализуемые данные или JsonFile с готовым JSON-текстом.
+            meta: JSON-сериализуемые метаданные (например, валидаторы HTTP-кэша).
+        """
+        with self._lock:
+            self._set(key, data, meta)
+
+    def _set(self, key: Hashable, data: Any, meta: Optional[dict]) -> None:
+        """Сохраняет запись на диск (вызывается под блокировкой)."""
+        index = self._ensure_index()
+        name = self._filename(key)
+        path = os.path.join(self._directory, name)
+        now = self._clock()
+        if isinstance(data, JsonFile):
+            payload = None
+            # Готовый JSON вставляется в запись потоково, после заголовка со служебными полями
+            header = json.dumps({"stored_at": now, "meta": meta}, ensure_ascii=False)
+            prefix = header[:-1].encode("utf-8") + b', "data": '
+        else:
+            payload = json.dumps(
+                {"stored_at": now, "data": data, "meta": meta}, ensure_ascii=False
+            ).encode("utf-8")
+
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                if payload is None:
+                    f.write(prefix)
+                    data.file.seek(0)
+                    shutil.copyfileobj(data.file, f)
+                    f.write(b"}")
+                else:
+                    f.write(payload)
+                size = f.tell()
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+            os.utime(path, (now, now))
+        except OSError as e:
+            logger.warning("Disk cache write %s failed: %s", name, e)
+            self._stats["errors"] += 1
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+
+        old = index.pop(name, None)
+        if old is not None:
+            self._bytes -= old[0]
+        index[name] = (size, now)
+        self._bytes += size
+        self._stats["writes"] += 1
+        self._enforce_limit(keep=name)
+
+    def touch(self, key: Hashable) -> bool:
+        """
+        Отмечает запись как только что подтверждённую, не переписывая данные.
+
+        Args:
+            key: Ключ записи.
+
+        Returns:
+            bool: True, если запись существует.
+        """
+        with self._lock:
+            index = self._ensure_index()
+            name = self._filename(key)
+            if name not in index:
+                return False
+            now = self._clock()
+            try:
+                os.utime(os.path.join(self._directory, name), (now, now))
+            except OSError as e:
+                logger.warning("Disk cache touch %s failed: %s", name, e)
+                self._discard(name)
+                return False
+            index[name] = (index[name][0], now)
+            return True
+
+    def _enforce_limit(self, keep: str) -> None:
+        """Удаляет самые старые записи, пока объём превышает лимит."""
+        index = self._ensure_index()
+        if self._bytes <= self._max_bytes:
+            return
+        for name, _ in sorted(index.items(), key=lambda item: item[1][1]):
+            if self._bytes <= self._max_bytes:
+                break
+            if name == keep:
+                continue
+            self._discard(name)
+            self._stats["evictions"] += 1
+
+    def _discard(self, name: str) -> None:
+        """Удаляет файл записи и исключает его из индекса."""
+        index = self._ensure_index()
+        entry = index.pop(name, None)
+        if entry is not None:
+            self._bytes -= entry[0]
+        try:
+            os.unlink(os.path.join(self._directory, name))
+        except FileNotFoundError:
+            pass
+
+    async def aget(self, key: Hashable) -> Optional[DiskEntry]:
+        """Асинхронная обёртка get(): чтение выполняется в пуле потоков."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: Hashable, data: Any, meta: Optional[dict] = None) -> None:
+        """Асинхронная обёртка set(): запись выполняется в пуле потоков."""
+        await asyncio.to_thread(self.set, key, data, meta)
+
+    async def atouch(self, key: Hashable) -> bool:
+        """Асинхронная обёртка touch()."""
+        return await asyncio.to_thread(self.touch, key)
+
+    def stats(self) -> dict:
+        """
+        Возвращает метрики дискового кэша.
+
+        Returns:
+            dict: hits, misses, writes, evictions, errors, entries, bytes, max_bytes.
+        """
+        return {
+            **self._stats,
+            "entries": len(self._index) if self._index is not None else None,
+            "bytes": self._bytes if self._index is not None else None,
+            "max_bytes": self._max_bytes,
+        }
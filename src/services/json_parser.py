@@ -121,11 +121,14 @@ def format_map_for_llm(goals_map: GoalsMap, selected_goal_id: str | None = None)
         "",
     ]
 
-    # Определяем корневые цели (без родителей)
-    root_nodes = [n for n in goals_map.nodes if n.parent_id is None]
-    node_map = {n.id: n for n in goals_map.nodes}
-
-    def format_node(node: GoalNodeV1, indent: int = 0) -> None:
+    # Связи берём из индекса карты: он строится один раз на карту.
+    # Корни — цели без родителя (как и раньше; цели с отсутствующим в карте родителем не выводятся)
+    index = goals_map.index
+    nodes = goals_map.nodes
+    roots = [position for position, node in enumerate(nodes) if node.parent_id is None]
+
+    def format_node(position: int, indent: int = 0) -> None:
+        node = nodes[position]
         prefix = "  " * indent + ("- " if indent > 0 else "")
         marker = " [ВЫБРАННАЯ ЦЕЛЬ]" if node.id == selected_goal_id else ""
         lines.append(f"{prefix}**{node.code}**: {node.name}{marker}")
@@ -139,17 +142,16 @@ def format_map_for_llm(goals_map: GoalsMap, selected_goal_id: str | None = None)
         lines.append("")
 
         # Дочерние цели
-        for child_id in node.child_ids:
-            if child_id in node_map:
-                format_node(node_map[child_id], indent + 1)
+        for child in index.children(position):
+            format_node(child, indent + 1)
 
-    if root_nodes:
-        for root in root_nodes:
+    if roots:
+        for root in roots:
             format_node(root)
     else:
         # Если нет корневых — выводим все подряд
-        for node in goals_map.nodes:
-            format_node(node)
+        for position in range(len(nodes)):
+            format_node(position)
 
     return "\n".join(lines)
 
@@ -165,7 +167,5 @@ def get_goal_by_id(goals_map: GoalsMap, goal_id: str) -> GoalNodeV1 | None:
     Returns:
         GoalNodeV1 или None если цель не найдена.
     """
-    for node in goals_map.nodes:
-        if node.id == goal_id:
-            return node
-    return None
+    index = goals_map.index.index_of(goal_id)
+    return goals_map.nodes[index] if index is not None else None
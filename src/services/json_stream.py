@@ -0,0 +1,144 @@
+"""Потоковый разбор JSON-объекта с большими массивами из последовательности байтовых фрагментов."""
+
+import codecs
+import json
+import re
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Mapping
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# Прочитанный префикс буфера отбрасывается, когда превышает этот размер
+_COMPACT_THRESHOLD = 64 * 1024
+
+
+class _Reader:
+    """
+    Буфер над потоком байтов: раскодирует UTF-8 и разбирает JSON-значения по одному.
+
+    В памяти держится только ещё не разобранная часть потока.
+    """
+
+    def __init__(self, chunks: AsyncIterable[bytes]):
+        self._chunks: AsyncIterator[bytes] = chunks.__aiter__()
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._decoder = json.JSONDecoder()
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+
+    async def _fill(self) -> bool:
+        """Дочитывает следующий фрагмент потока; False, если поток закончился."""
+        if self._eof:
+            return False
+        try:
+            chunk = await self._chunks.__anext__()
+        except StopAsyncIteration:
+            self._eof = True
+            chunk, final = b"", True
+        else:
+            final = False
+        if self._pos > _COMPACT_THRESHOLD:
+            self._buffer = self._buffer[self._pos:]
+            self._pos = 0
+        try:
+            self._buffer += self._utf8.decode(chunk, final=final)
+        except UnicodeDecodeError as e:
+            raise ValueError(f"Невалидный UTF-8: {e}") from e
+        return not self._eof
+
+    async def peek(self) -> str:
+        """Пропускает пробелы и возвращает следующий символ ("" в конце потока)."""
+        while True:
+            self._pos = _WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not await self._fill():
+                return ""
+
+    async def expect(self, char: str) -> None:
+        """Пропускает ожидаемый символ-разделитель."""
+        found = await self.peek()
+        if found != char:
+            raise ValueError(f"Ожидался '{char}', получено {found or 'конец данных'!r}")
+        self._pos += 1
+
+    async def value(self) -> Any:
+        """Разбирает следующее JSON-значение целиком."""
+        await self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError as e:
+                if self._eof:
+                    raise ValueError(f"Невалидный JSON: {e}") from e
+            else:
+                # Значение у конца буфера может быть неполным (например, число 12 из 123)
+                if end < len(self._buffer) or self._eof:
+                    self._pos = end
+                    return value
+            await self._fill()
+
+
+async def _iter_array(reader: _Reader) -> AsyncIterator[Any]:
+    """Отдаёт элементы JSON-массива по одному (открывающая скобка уже прочитана)."""
+    if await reader.peek() == "]":
+        await reader.expect("]")
+        return
+    while True:
+        yield await reader.value()
+        if await reader.peek() == ",":
+            await reader.expect(",")
+            continue
+        await reader.expect("]")
+        return
+
+
+async def parse_object(
+    chunks: AsyncIterable[bytes],
+    item_parsers: Mapping[str, Callable[[Any], Any]],
+) -> dict:
+    """
+    Разбирает JSON-объект из потока, обрабатывая элементы выбранных массивов по одному.
+
+    Для ключей из item_parsers, значение которых — массив, каждый элемент
+    передаётся в парсер сразу после декодирования, а в результат попадает
+    список результатов парсера. Так в памяти одновременно находятся только
+    один сырой элемент и уже разобранные объекты, а не всё дерево ответа.
+    Остальные значения декодируются целиком.
+
+    Args:
+        chunks: Фрагменты тела ответа.
+        item_parsers: {ключ массива: парсер одного элемента}.
+
+    Returns:
+        dict: Ключи объекта верхнего уровня со значениями.
+
+    Raises:
+        ValueError: Если поток не является валидным JSON-объектом.
+        Exception: Исключение парсера элемента пробрасывается как есть.
+    """
+    reader = _Reader(chunks)
+    result: dict = {}
+    await reader.expect("{")
+    if await reader.peek() == "}":
+        await reader.expect("}")
+    else:
+        while True:
+            key = await reader.value()
+            if not isinstance(key, str):
+                raise ValueError("Ключ JSON-объекта должен быть строкой")
+            await reader.expect(":")
+            parser = item_parsers.get(key)
+            if parser is not None and await reader.peek() == "[":
+                await reader.expect("[")
+                result[key] = [parser(item) async for item in _iter_array(reader)]
+            else:
+                result[key] = await reader.value()
+            if await reader.peek() == ",":
+                await reader.expect(",")
+                continue
+            await reader.expect("}")
+            break
+    if await reader.peek() != "":
+        raise ValueError("Лишние данные после JSON-объекта")
+    return result
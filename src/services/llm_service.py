@@ -1,27 +1,164 @@
 """Сервис для взаимодействия с LLM через OpenAI Python SDK."""
 
 from typing import AsyncGenerator
-from openai import AsyncOpenAI, APIStatusError
-from src.config import get_openai_api_key, get_openai_model, get_openai_server
 
+import httpx
+from openai import AsyncOpenAI, APIStatusError, DefaultAsyncHttpxClient
+from src.config import (
+    get_openai_api_key, get_openai_model, get_openai_server,
+    get_model_context_window, get_llm_response_tokens,
+    get_openai_timeout, get_openai_connect_timeout, get_openai_max_retries,
+    get_openai_max_connections, get_openai_max_keepalive_connections, get_openai_keepalive_expiry,
+)
+from src.services.context_builder import estimate_tokens
 
-def _create_client() -> AsyncOpenAI:
+# Общие клиенты с пулом keep-alive соединений: по одному на endpoint (OPENAI_SERVER) и ключ API
+_clients: dict[tuple[str | None, str], AsyncOpenAI] = {}
+
+# Служебные токены разметки сообщения чата (роль, разделители) и начала ответа
+_TOKENS_PER_MESSAGE = 4
+_TOKENS_PER_REPLY = 3
+
+# Итоги предварительной проверки размера запросов: поместились, сокращены, отклонены
+_preflight_stats = {"fits": 0, "pruned": 0, "rejected": 0}
+
+
+def _create_client(api_key: str, base_url: str | None) -> AsyncOpenAI:
     """
-    Создаёт клиент OpenAI с настройками из переменных окружения.
+    Создаёт клиент OpenAI с пулом соединений и таймаутами из переменных окружения.
+
+    Args:
+        api_key: Ключ API.
+        base_url: Кастомный endpoint или None.
 
     Returns:
         AsyncOpenAI: Асинхронный клиент OpenAI.
     """
-    api_key = get_openai_api_key()
-    base_url = get_openai_server()
-
-    kwargs = {"api_key": api_key or "dummy"}
+    kwargs = {
+        "api_key": api_key or "dummy",
+        "timeout": httpx.Timeout(get_openai_timeout(), connect=get_openai_connect_timeout()),
+        "max_retries": get_openai_max_retries(),
+        "http_client": DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=get_openai_max_connections(),
+                max_keepalive_connections=get_openai_max_keepalive_connections(),
+                keepalive_expiry=get_openai_keepalive_expiry(),
+            ),
+        ),
+    }
     if base_url:
         kwargs["base_url"] = base_url
 
     return AsyncOpenAI(**kwargs)
 
 
+def get_client() -> AsyncOpenAI:
+    """
+    Возвращает общий клиент OpenAI для endpoint'а и ключа из настроек.
+
+    Клиент создаётся при старте приложения (startup) или лениво при первом
+    обращении (например, в тестах без lifespan) и переиспользуется всеми
+    запросами, поэтому соединения пула не открываются заново на каждый
+    ответ.
+
+    Returns:
+        AsyncOpenAI: Общий клиент.
+    """
+    key = (get_openai_server(), get_openai_api_key())
+    client = _clients.get(key)
+    if client is None or client.is_closed():
+        client = _clients[key] = _create_client(key[1], key[0])
+    return client
+
+
+async def startup() -> None:
+    """Создаёт общий клиент OpenAI при старте приложения."""
+    get_client()
+
+
+async def shutdown() -> None:
+    """Закрывает клиенты OpenAI и соединения их пулов при остановке приложения."""
+    clients = list(_clients.values())
+    _clients.clear()
+    for client in clients:
+        await client.close()
+
+
+def count_message_tokens(messages: list[dict], model: str | None = None) -> int:
+    """
+    Считает токены запроса к chat completions.
+
+    Args:
+        messages: Список сообщений в формате [{role, content}].
+        model: Название модели (если None — берётся из конфигурации).
+
+    Returns:
+        int: Число токенов содержимого сообщений с учётом служебной разметки.
+    """
+    model_name = model or get_openai_model()
+    return sum(
+        estimate_tokens(message.get("content") or "", model_name) + _TOKENS_PER_MESSAGE
+        for message in messages
+    ) + _TOKENS_PER_REPLY
+
+
+def preflight(messages: list[dict], model: str | None = None, prune_history: bool = False) -> list[dict]:
+    """
+    Проверяет, что запрос помещается в окно контекста модели, до отправки в API.
+
+    В окне должно остаться LLM_RESPONSE_TOKENS токенов на ответ. Если
+    запрос не помещается и prune_history=True, из истории удаляются самые
+    старые сообщения (системное и последнее сообщение сохраняются).
+    Результат проверки учитывается в preflight_stats().
+
+    Args:
+        messages: Список сообщений в формате [{role, content}].
+        model: Название модели (если None — берётся из конфигурации).
+        prune_history: Разрешить сокращение истории сообщений.
+
+    Returns:
+        list[dict]: Сообщения, которые помещаются в окно (исходный список, если сокращение не нужно).
+
+    Raises:
+        ValueError: Если запрос не помещается в окно даже после сокращения.
+    """
+    model_name = model or get_openai_model()
+    limit = get_model_context_window(model_name) - get_llm_response_tokens()
+
+    # Токен BPE кодирует хотя бы один байт: короткий запрос не нужно токенизировать
+    size = sum(len((m.get("content") or "").encode("utf-8")) + _TOKENS_PER_MESSAGE for m in messages)
+    if size + _TOKENS_PER_REPLY <= limit:
+        _preflight_stats["fits"] += 1
+        return messages
+
+    counts = [estimate_tokens(m.get("content") or "", model_name) + _TOKENS_PER_MESSAGE for m in messages]
+    total = sum(counts) + _TOKENS_PER_REPLY
+    if total <= limit:
+        _preflight_stats["fits"] += 1
+        return messages
+
+    if prune_history:
+        start = 1 if messages and messages[0].get("role") == "system" else 0
+        dropped = 0
+        while total > limit and len(messages) - start - dropped > 1:
+            total -= counts[start + dropped]
+            dropped += 1
+        if total <= limit:
+            _preflight_stats["pruned"] += 1
+            return messages[:start] + messages[start + dropped:]
+
+    _preflight_stats["rejected"] += 1
+    raise ValueError(
+        f"Запрос слишком большой для модели {model_name}: {total} токенов при лимите {limit}. "
+        "Выберите конкретную цель или начните новый диалог."
+    )
+
+
+def preflight_stats() -> dict:
+    """Возвращает счётчики предварительной проверки размера запросов (fits, pruned, rejected)."""
+    return dict(_preflight_stats)
+
+
 async def stream_completion(
     messages: list[dict],
     model: str | None = None,
@@ -40,7 +177,7 @@ async def stream_completion(
         ValueError: Если превышен лимит контекста модели.
         RuntimeError: При других ошибках API.
     """
-    client = _create_client()
+    client = get_client()
     model_name = model or get_openai_model()
 
     try:
@@ -83,7 +220,7 @@ async def get_completion(messages: list[dict], model: str | None = None) -> str:
     Raises:
         RuntimeError: При ошибках API.
     """
-    client = _create_client()
+    client = get_client()
     model_name = model or get_openai_model()
     try:
         response = await client.chat.completions.create(
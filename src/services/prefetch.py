@@ -0,0 +1,145 @@
+"""Фоновая предзагрузка целей карты в кэш сессии."""
+
+import asyncio
+import logging
+from itertools import islice
+from typing import Awaitable, Callable, Iterable
+
+logger = logging.getLogger("prefetch")
+
+
+class TargetPrefetcher:
+    """
+    Прогревает кэш сессии данными целей (TargetDetail + KeyResult) после загрузки графа карты.
+
+    Для каждой сессии запускается не более одной фоновой задачи; новая карта
+    в той же сессии отменяет предыдущую предзагрузку. Параллельность запросов
+    ограничена числом воркеров, а число целей — max_targets (первые в
+    переданном порядке). Счётчики hits/misses показывают, сколько открытий
+    целей было обслужено прогретым кэшем.
+    """
+
+    def __init__(self, concurrency: int = 4, max_targets: int | None = None):
+        self._concurrency = max(1, concurrency)
+        self._max_targets = max_targets
+        self._tasks: dict[str, asyncio.Task] = {}
+        self._warmed: dict[str, set[int]] = {}
+        self._stats = {
+            "scheduled": 0,
+            "prefetched": 0,
+            "failed": 0,
+            "cancelled": 0,
+            "hits": 0,
+            "misses": 0,
+        }
+
+    def schedule(
+        self,
+        session_id: str,
+        target_ids: Iterable[int],
+        load: Callable[[int], Awaitable[object]],
+    ) -> None:
+        """
+        Запускает фоновую предзагрузку целей для сессии.
+
+        Args:
+            session_id: ID сессии браузера.
+            target_ids: ID целей для предзагрузки в порядке важности
+                        (дубликаты игнорируются, лишние сверх max_targets отбрасываются).
+            load: Корутина загрузки одной цели в кэш сессии.
+        """
+        self.cancel(session_id)
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for target_id in islice(dict.fromkeys(target_ids), self._max_targets):
+            queue.put_nowait(target_id)
+        if queue.empty():
+            return
+
+        self._stats["scheduled"] += queue.qsize()
+        self._warmed.setdefault(session_id, set())
+        task = asyncio.create_task(self._run(session_id, queue, load))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda t: self._forget(session_id, t))
+
+    async def _run(
+        self,
+        session_id: str,
+        queue: asyncio.Queue,
+        load: Callable[[int], Awaitable[object]],
+    ) -> None:
+        """Обрабатывает очередь целей ограниченным числом воркеров."""
+        async def worker() -> None:
+            while True:
+                try:
+                    target_id = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                try:
+                    await load(target_id)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    # Ошибка предзагрузки не критична: цель загрузится по клику
+                    self._stats["failed"] += 1
+                    logger.debug("Prefetch target %s failed: %s", target_id, e)
+                else:
+                    self._stats["prefetched"] += 1
+                    warmed = self._warmed.get(session_id)
+                    if warmed is not None:
+                        warmed.add(target_id)
+
+        workers = min(self._concurrency, queue.qsize())
+        await asyncio.gather(*(worker() for _ in range(workers)))
+
+    def _forget(self, session_id: str, task: asyncio.Task) -> None:
+        """Удаляет завершившуюся задачу из реестра сессий."""
+        if self._tasks.get(session_id) is task:
+            del self._tasks[session_id]
+
+    def record_access(self, session_id: str, target_id: int) -> None:
+        """
+        Учитывает открытие цели пользователем в счётчиках hits/misses.
+
+        Учитываются только сессии, для которых запускалась предзагрузка.
+
+        Args:
+            session_id: ID сессии браузера.
+            target_id: ID открытой цели.
+        """
+        warmed = self._warmed.get(session_id)
+        if warmed is None:
+            return
+        if target_id in warmed:
+            self._stats["hits"] += 1
+        else:
+            self._stats["misses"] += 1
+
+    def cancel(self, session_id: str) -> None:
+        """
+        Отменяет предзагрузку сессии и забывает прогретые цели.
+
+        Args:
+            session_id: ID сессии браузера.
+        """
+        task = self._tasks.pop(session_id, None)
+        if task is not None and not task.done():
+            task.cancel()
+            self._stats["cancelled"] += 1
+        self._warmed.pop(session_id, None)
+
+    async def shutdown(self) -> None:
+        """Отменяет все фоновые задачи и дожидается их завершения."""
+        tasks = list(self._tasks.values())
+        for session_id in list(self._tasks):
+            self.cancel(session_id)
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def get_stats(self) -> dict:
+        """
+        Возвращает счётчики предзагрузки.
+
+        Returns:
+            dict: scheduled, prefetched, failed, cancelled, hits, misses, active.
+        """
+        return {**self._stats, "active": len(self._tasks)}
@@ -0,0 +1,152 @@
+"""Ограничение частоты и параллельности запросов к внешнему API."""
+
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
+
+
+class RequestLimiter:
+    """
+    Общий лимит запросов: не более max_concurrent одновременно и не чаще rate в секунду.
+
+    Частота ограничивается token bucket'ом ёмкостью burst: короткий всплеск
+    до burst запросов проходит сразу, дальше запросы выпускаются равномерно.
+    rate <= 0 отключает ограничение частоты. Время ожидания и длина очереди
+    доступны через stats().
+
+    Фоновые запросы (background=True, например предзагрузка) получают место,
+    только когда нет ожидающих обычных запросов, и не занимают последнее
+    свободное место, поэтому не задерживают интерактивные запросы.
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        rate: float,
+        burst: int,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._max_concurrent = max(1, max_concurrent)
+        self._rate = rate
+        self._burst = max(1, burst)
+        self._clock = clock
+        self._tokens = float(self._burst)
+        self._refilled_at = clock()
+        self._active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._background_waiters: deque[asyncio.Future] = deque()
+        self._queued = 0
+        self._stats = {"acquired": 0, "max_queued": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0}
+
+    @asynccontextmanager
+    async def slot(self, background: bool = False) -> AsyncIterator[None]:
+        """
+        Занимает место для одного запроса на время блока async with.
+
+        Args:
+            background: Фоновый запрос с низким приоритетом.
+        """
+        await self.acquire(background)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, background: bool = False) -> None:
+        """
+        Ждёт свободного места и токена частоты.
+
+        Args:
+            background: Фоновый запрос с низким приоритетом.
+        """
+        started = self._clock()
+        self._queued += 1
+        self._stats["max_queued"] = max(self._stats["max_queued"], self._queued)
+        try:
+            await self._acquire_slot(background)
+            try:
+                await self._take_token()
+            except BaseException:
+                self.release()
+                raise
+        finally:
+            self._queued -= 1
+
+        wait_ms = (self._clock() - started) * 1000
+        self._stats["acquired"] += 1
+        self._stats["total_wait_ms"] += wait_ms
+        self._stats["max_wait_ms"] = max(self._stats["max_wait_ms"], wait_ms)
+
+    def release(self) -> None:
+        """Освобождает место и будит следующий ожидающий запрос."""
+        self._active -= 1
+        self._wake_next()
+
+    def _has_room(self, background: bool) -> bool:
+        """Проверяет, может ли запрос данного приоритета занять место сейчас."""
+        if background:
+            return not self._waiters and self._active < max(1, self._max_concurrent - 1)
+        return self._active < self._max_concurrent
+
+    async def _acquire_slot(self, background: bool = False) -> None:
+        """Ждёт, пока для запроса данного приоритета не освободится место."""
+        waiters = self._background_waiters if background else self._waiters
+        while not self._has_room(background):
+            waiter = asyncio.get_running_loop().create_future()
+            waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Освободившееся место передаём следующему
+                    self._wake_next()
+                else:
+                    waiters.remove(waiter)
+                raise
+        self._active += 1
+
+    def _wake_next(self) -> None:
+        """Будит первый ещё ожидающий обычный запрос, а если таких нет — фоновый."""
+        for waiters, background in ((self._waiters, False), (self._background_waiters, True)):
+            if not self._has_room(background):
+                continue
+            while waiters:
+                waiter = waiters.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+
+    async def _take_token(self) -> None:
+        """Забирает токен из bucket'а, при необходимости дожидаясь пополнения."""
+        if self._rate <= 0:
+            return
+        while True:
+            now = self._clock()
+            self._tokens = min(self._burst, self._tokens + (now - self._refilled_at) * self._rate)
+            self._refilled_at = now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self._rate)
+
+    def stats(self) -> dict:
+        """
+        Возвращает метрики лимитера.
+
+        Returns:
+            dict: in_flight, queued, max_queued, acquired, avg_wait_ms, max_wait_ms,
+                  max_concurrent, rate.
+        """
+        acquired = self._stats["acquired"]
+        return {
+            "in_flight": self._active,
+            "queued": self._queued,
+            "max_queued": self._stats["max_queued"],
+            "acquired": acquired,
+            "avg_wait_ms": round(self._stats["total_wait_ms"] / acquired, 1) if acquired else 0.0,
+            "max_wait_ms": round(self._stats["max_wait_ms"], 1),
+            "max_concurrent": self._max_concurrent,
+            "rate": self._rate,
+        }
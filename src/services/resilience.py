@@ -0,0 +1,180 @@
+"""Повторы с экспоненциальной задержкой и circuit breaker для внешних API."""
+
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Запрос не выполнен: circuit breaker разомкнут."""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"Circuit '{name}' is open, retry after {retry_after:.1f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker для одного endpoint'а внешнего API.
+
+    После failure_threshold ошибок подряд цепь размыкается, и запросы
+    отклоняются без обращения к серверу в течение reset_timeout. Затем
+    пропускается один пробный запрос (half-open): успех замыкает цепь,
+    ошибка снова размыкает её.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int,
+        reset_timeout: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.name = name
+        self._failure_threshold = failure_threshold
+        self._reset_timeout = reset_timeout
+        self._clock = clock
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._stats = {"successes": 0, "failures": 0, "rejected": 0, "opened": 0}
+
+    @property
+    def state(self) -> str:
+        """Текущее состояние: closed, open или half_open."""
+        if self._state == OPEN and self._clock() - self._opened_at >= self._reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self) -> None:
+        """
+        Проверяет, можно ли выполнить запрос.
+
+        Raises:
+            CircuitOpenError: Если цепь разомкнута или пробный запрос уже выполняется.
+        """
+        state = self.state
+        if state == CLOSED:
+            return
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return
+        self._stats["rejected"] += 1
+        retry_after = max(0.0, self._reset_timeout - (self._clock() - self._opened_at))
+        raise CircuitOpenError(self.name, retry_after)
+
+    def record_success(self) -> None:
+        """Учитывает успешный запрос и замыкает цепь."""
+        self._stats["successes"] += 1
+        self._failures = 0
+        self._state = CLOSED
+        self._probe_in_flight = False
+
+    def release(self) -> None:
+        """Освобождает пробный запрос, прерванный без результата (например, отменой)."""
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        """Учитывает ошибку сервера; при превышении порога размыкает цепь."""
+        self._stats["failures"] += 1
+        self._failures += 1
+        if self._state == HALF_OPEN or self._failures >= self._failure_threshold:
+            if self._state != OPEN:
+                self._stats["opened"] += 1
+            self._state = OPEN
+            self._opened_at = self._clock()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        """
+        Возвращает состояние и счётчики цепи.
+
+        Returns:
+            dict: state, consecutive_failures, successes, failures, rejected, opened.
+        """
+        return {"state": self.state, "consecutive_failures": self._failures, **self._stats}
+
+
+def backoff_delay(attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    Возвращает задержку перед повтором: экспоненциальный рост с полным джиттером.
+
+    Случайная задержка в [0, min(max_delay, base_delay * 2**attempt)]
+    разносит повторы разных клиентов во времени.
+
+    Args:
+        attempt: Номер повтора, начиная с 0.
+        base_delay: Базовая задержка в секундах.
+        max_delay: Верхняя граница задержки в секундах.
+
+    Returns:
+        float: Задержка в секундах.
+    """
+    return random.uniform(0.0, min(max_delay, base_delay * (2 ** attempt)))
+
+
+async def call_with_retry(
+    fn: Callable[[], Awaitable[T]],
+    *,
+    breaker: CircuitBreaker,
+    retries: int,
+    base_delay: float,
+    max_delay: float,
+    is_failure: Callable[[T], bool] = lambda result: False,
+    retry_exceptions: tuple[type[BaseException], ...] = (),
+) -> T:
+    """
+    Выполняет запрос через circuit breaker с ограниченным числом повторов.
+
+    Повторяются исключения из retry_exceptions и результаты, для которых
+    is_failure() возвращает True. Если повторы исчерпаны, пробрасывается
+    последнее исключение или возвращается последний результат.
+
+    Args:
+        fn: Фабрика корутины, выполняющей запрос.
+        breaker: Circuit breaker endpoint'а.
+        retries: Число повторов (0 — без повторов).
+        base_delay: Базовая задержка перед повтором, сек.
+        max_delay: Максимальная задержка перед повтором, сек.
+        is_failure: Признак ошибочного результата (например, ответ 503).
+        retry_exceptions: Исключения, считающиеся сбоем сервера.
+
+    Returns:
+        T: Результат запроса.
+
+    Raises:
+        CircuitOpenError: Если цепь разомкнута.
+        Exception: Последнее исключение запроса после исчерпания повторов.
+    """
+    attempt = 0
+    while True:
+        breaker.before_call()
+        try:
+            result = await fn()
+        except retry_exceptions:
+            breaker.record_failure()
+            if attempt >= retries:
+                raise
+        except BaseException:
+            breaker.release()
+            raise
+        else:
+            if not is_failure(result):
+                breaker.record_success()
+                return result
+            breaker.record_failure()
+            if attempt >= retries:
+                return result
+
+        await asyncio.sleep(backoff_delay(attempt, base_delay, max_delay))
+        attempt += 1
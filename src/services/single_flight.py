@@ -0,0 +1,94 @@
+"""Объединение одновременных одинаковых запросов (single-flight)."""
+
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Call:
+    """Выполняющийся запрос и число ожидающих его вызовов."""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+def _finished(task: asyncio.Task) -> bool:
+    """Проверяет, что задача завершена или уже отменяется (Task.cancelling есть с Python 3.11)."""
+    cancelling = getattr(task, "cancelling", None)
+    return task.done() or (cancelling is not None and cancelling() > 0)
+
+
+class SingleFlight:
+    """
+    Гарантирует, что для одного ключа одновременно выполняется не более одного запроса.
+
+    Все вызовы do() с ключом, запрос по которому уже выполняется, ожидают
+    общий результат. Исключение запроса получают все ожидающие. Отмена
+    одного ожидающего не отменяет общий запрос; он отменяется, только
+    когда его перестали ждать все вызовы.
+    """
+
+    def __init__(self):
+        self._calls: dict[Hashable, _Call] = {}
+        self._stats = {"calls": 0, "coalesced": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """
+        Выполняет fn() или присоединяется к уже выполняющемуся запросу с тем же ключом.
+
+        Args:
+            key: Ключ запроса.
+            fn: Фабрика корутины, выполняющей запрос.
+
+        Returns:
+            T: Результат запроса.
+
+        Raises:
+            Exception: Исключение, выброшенное запросом.
+        """
+        call = self._calls.get(key)
+        if call is not None and _finished(call.task):
+            # Завершённый или отменяемый запрос ещё не снят с учёта колбэком
+            call = None
+        if call is None:
+            call = _Call(asyncio.create_task(fn()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda task: self._finish(key, call))
+            self._stats["calls"] += 1
+        else:
+            self._stats["coalesced"] += 1
+
+        call.waiters += 1
+        try:
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                # Результат больше никому не нужен — отменяем запрос и сразу снимаем его
+                # с учёта, чтобы следующий вызов запустил новый запрос, а не получил отмену
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+                call.task.cancel()
+
+    def _finish(self, key: Hashable, call: _Call) -> None:
+        """Снимает завершившийся запрос с учёта."""
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        if not call.task.cancelled():
+            # Помечаем исключение как полученное, даже если ожидающих не осталось
+            call.task.exception()
+
+    def in_flight(self) -> int:
+        """Возвращает число выполняющихся запросов."""
+        return len(self._calls)
+
+    def stats(self) -> dict:
+        """
+        Возвращает счётчики объединения запросов.
+
+        Returns:
+            dict: calls (реальные запросы), coalesced (присоединившиеся вызовы), in_flight.
+        """
+        return {**self._stats, "in_flight": len(self._calls)}
@@ -1,177 +1,1016 @@
 """Асинхронный HTTP-клиент для Directum Targets API."""
 
+import asyncio
+import hashlib
 import logging
-from typing import List
+import json
+import math
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, BinaryIO, Callable, Iterator, List, Tuple
 import httpx
 from fastapi import HTTPException
-from pydantic import ValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 
-from src.config import get_targets_base_url, get_targets_token
-from src.models.targets import TargetsMap, MapGraph, TargetDetail, KeyResult
+from src.config import (
+    get_targets_base_url, get_targets_token, get_targets_timeout,
+    get_targets_max_connections, get_targets_max_keepalive_connections,
+    get_targets_keepalive_expiry, get_targets_http2,
+    get_targets_retries, get_targets_retry_base_delay, get_targets_retry_max_delay,
+    get_targets_breaker_threshold, get_targets_breaker_reset_timeout,
+    get_targets_max_response_bytes, get_targets_odata_select, get_targets_page_concurrency,
+    get_targets_max_concurrent_requests, get_targets_rate_limit, get_targets_rate_burst,
+    get_targets_stream_map_graph,
+)
+from src.models.targets import TargetsMap, GoalNode, MapGraph, TargetDetail, KeyResult
+from src.services import json_stream
+from src.services.rate_limiter import RequestLimiter
+from src.services.resilience import CircuitBreaker, CircuitOpenError, call_with_retry
 
 logger = logging.getLogger("targets_api")
 
+# Общий клиент с пулом keep-alive соединений на всё приложение
+_client: httpx.AsyncClient | None = None
 
-async def get_maps() -> List[TargetsMap]:
+# Circuit breaker на каждый endpoint: сбой одного метода Directum не блокирует остальные
+_breakers: dict[str, CircuitBreaker] = {}
+
+# Метрики запросов по endpoint'ам: число, ошибки, время, объём ответов
+_request_stats: dict[str, dict] = {}
+
+# Общий лимит частоты и параллельности запросов к Directum; создаётся лениво
+_limiter: RequestLimiter | None = None
+
+# Запросы фоновых задач (предзагрузка) занимают места лимитера с низким приоритетом
+_background: ContextVar[bool] = ContextVar("targets_background", default=False)
+
+# Списки из ответа валидируются одним вызовом pydantic-core вместо цикла по элементам
+_MAPS_ADAPTER = TypeAdapter(List[TargetsMap])
+_KEY_RESULTS_ADAPTER = TypeAdapter(List[KeyResult])
+
+
+def _create_client() -> httpx.AsyncClient:
     """
-    Загружает список карт целей из Targets API.
+    Создаёт HTTP-клиент Targets API с пулом соединений из настроек окружения.
 
-    GET {TARGETS_BASE_URL}/Integration/odata/ITargetsTargetsMaps
-    Authorization: Bearer {TARGETS_TOKEN}
+    Returns:
+        httpx.AsyncClient: Клиент с keep-alive и, если доступно, HTTP/2.
+    """
+    http2 = get_targets_http2()
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("TARGETS_HTTP2 включён, но пакет h2 не установлен — используется HTTP/1.1")
+            http2 = False
+
+    limits = httpx.Limits(
+        max_connections=get_targets_max_connections(),
+        max_keepalive_connections=get_targets_max_keepalive_connections(),
+        keepalive_expiry=get_targets_keepalive_expiry(),
+    )
+    return httpx.AsyncClient(timeout=get_targets_timeout(), limits=limits, http2=http2)
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Возвращает общий HTTP-клиент Targets API.
+
+    Если клиент ещё не создан при старте приложения (например, в тестах
+    без lifespan), он создаётся лениво при первом обращении.
 
     Returns:
-        List[TargetsMap]: Список карт с полями Id, Name, Code, PeriodLabel,
-                          AchievementPercentage, Status.
+        httpx.AsyncClient: Общий клиент с пулом соединений.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = _create_client()
+    return _client
+
+
+def get_breaker(endpoint: str) -> CircuitBreaker:
+    """
+    Возвращает circuit breaker endpoint'а Targets API (создаётся при первом обращении).
+
+    Args:
+        endpoint: Имя endpoint'а ("maps", "map_graph", "target", "key_results").
+
+    Returns:
+        CircuitBreaker: Breaker с порогом и паузой из настроек окружения.
+    """
+    breaker = _breakers.get(endpoint)
+    if breaker is None:
+        breaker = CircuitBreaker(
+            endpoint,
+            failure_threshold=get_targets_breaker_threshold(),
+            reset_timeout=get_targets_breaker_reset_timeout(),
+        )
+        _breakers[endpoint] = breaker
+    return breaker
+
+
+def breaker_states() -> dict:
+    """
+    Возвращает состояние circuit breaker'ов всех использованных endpoint'ов.
+
+    Returns:
+        dict: {endpoint: {"state", "consecutive_failures", ...}}.
+    """
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+def get_limiter() -> RequestLimiter:
+    """
+    Возвращает общий лимитер запросов к Targets API.
+
+    Returns:
+        RequestLimiter: Лимитер с параметрами TARGETS_MAX_CONCURRENT_REQUESTS,
+                        TARGETS_RATE_LIMIT и TARGETS_RATE_BURST.
+    """
+    global _limiter
+    if _limiter is None:
+        _limiter = RequestLimiter(
+            max_concurrent=get_targets_max_concurrent_requests(),
+            rate=get_targets_rate_limit(),
+            burst=get_targets_rate_burst(),
+        )
+    return _limiter
+
+
+@contextmanager
+def background_requests() -> Iterator[None]:
+    """
+    Помечает запросы к Targets API внутри блока как фоновые.
+
+    Такие запросы ждут места в общем лимитере с низким приоритетом
+    (см. RequestLimiter), уступая интерактивным запросам пользователей.
+    Пометка наследуется задачами, созданными внутри блока.
+    """
+    token = _background.set(True)
+    try:
+        yield
+    finally:
+        _background.reset(token)
+
+
+def limiter_stats() -> dict:
+    """
+    Возвращает метрики лимитера запросов к Targets API.
+
+    Returns:
+        dict: Число выполняющихся и ожидающих запросов, время ожидания.
+    """
+    return get_limiter().stats()
+
+
+def reset_breakers() -> None:
+    """Сбрасывает circuit breaker'ы (используется в тестах и при смене настроек)."""
+    _breakers.clear()
+
+
+class NotModified(Exception):
+    """Сервер подтвердил, что данные не изменились с прошлого запроса (304)."""
+
+
+def _conditional_headers(validators: dict) -> dict:
+    """Возвращает заголовки условного запроса по сохранённым валидаторам."""
+    headers = {}
+    if validators.get("etag"):
+        headers["If-None-Match"] = validators["etag"]
+    if validators.get("last_modified"):
+        headers["If-Modified-Since"] = validators["last_modified"]
+    return headers
+
+
+def _store_validators(validators: dict, response: httpx.Response) -> None:
+    """Заменяет валидаторы значениями заголовков ETag/Last-Modified ответа."""
+    validators.clear()
+    if response.headers.get("ETag"):
+        validators["etag"] = response.headers["ETag"]
+    if response.headers.get("Last-Modified"):
+        validators["last_modified"] = response.headers["Last-Modified"]
+
+
+class _ResponseTooLarge(Exception):
+    """Ответ Targets API превысил TARGETS_MAX_RESPONSE_MB."""
+
+
+def _auth_headers() -> dict:
+    """
+    Возвращает заголовки авторизации Targets API.
+
+    Токен передаётся как есть — он может уже содержать схему (Bearer/Basic).
 
     Raises:
-        HTTPException: При ошибках авторизации, доступа или таймауте.
+        HTTPException: 500, если TARGETS_BASE_URL или TARGETS_TOKEN не заданы.
     """
     base_url = get_targets_base_url()
     token = get_targets_token()
-
     if not base_url or not token:
         raise HTTPException(
             status_code=500,
             detail="TARGETS_BASE_URL и TARGETS_TOKEN должны быть заданы в .env"
         )
+    return {"Authorization": token.strip('"').strip("'")}
 
-    url = f"{base_url}/Integration/odata/ITargetsTargetsMaps"
-    # Токен передаётся как есть — он может уже содержать схему (Bearer/Basic)
-    token_clean = token.strip('"').strip("'")
-    headers = {"Authorization": token_clean}
-    logger.warning("GET %s | Authorization: %s", url,
-                   token_clean[:50] + "..." if len(token_clean) > 50 else token_clean)
 
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers)
-            logger.warning("Response %s | status=%s | body[:300]=%s",
-                           url, response.status_code, response.text[:300])
-
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=401,
-                    detail=f"Ошибка авторизации (401). Ответ сервера: {response.text[:300]}"
-                )
-            elif response.status_code == 403:
-                raise HTTPException(
-                    status_code=403,
-                    detail=f"Доступ запрещён (403). Ответ сервера: {response.text[:300]}"
-                )
-            elif response.status_code == 404:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Endpoint не найден (404). Ответ сервера: {response.text[:300]}"
-                )
-            elif response.status_code >= 500:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ошибка API Targets ({response.status_code}): {response.text[:300]}"
-                )
-
-            response.raise_for_status()
-            data = response.json()
-
-            # Ожидаем формат {"value": [...]}
-            if isinstance(data, dict) and "value" in data:
-                maps_data = data["value"]
-            else:
-                maps_data = data if isinstance(data, list) else []
-
-            # Валидация и фильтрация через Pydantic
-            maps = []
-            for item in maps_data:
-                try:
-                    maps.append(TargetsMap(**item))
-                except ValidationError:
-                    # Пропускаем невалидные записи
-                    continue
-
-            return maps
+class _LimitedBody:
+    """
+    Тело потокового ответа, читаемое фрагментами с проверкой лимита размера.
+
+    Число прочитанных байт доступно в атрибуте received.
+    """
+
+    def __init__(self, response: httpx.Response, max_bytes: int):
+        declared = response.headers.get("Content-Length")
+        if declared is not None and declared.isdigit() and int(declared) > max_bytes:
+            raise _ResponseTooLarge()
+        self._response = response
+        self._max_bytes = max_bytes
+        self.received = 0
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._response.aiter_bytes():
+            self.received += len(chunk)
+            if self.received > self._max_bytes:
+                raise _ResponseTooLarge()
+            yield chunk
+
+
+async def _read_limited(response: httpx.Response, max_bytes: int) -> bytes:
+    """
+    Читает тело ответа, прерывая чтение при превышении лимита.
+
+    Args:
+        response: Потоковый ответ httpx.
+        max_bytes: Максимальный размер тела в байтах.
+
+    Returns:
+        bytes: Тело ответа.
+
+    Raises:
+        _ResponseTooLarge: Если тело больше max_bytes.
+    """
+    return b"".join([chunk async for chunk in _LimitedBody(response, max_bytes)])
+
+
+def _error_for_status(status_code: int, body: bytes, not_found: str) -> HTTPException:
+    """
+    Преобразует неуспешный ответ Targets API в HTTPException.
+
+    Args:
+        status_code: Код ответа.
+        body: Тело ответа.
+        not_found: Сообщение для 404.
+
+    Returns:
+        HTTPException: Ошибка для клиента приложения.
+    """
+    text = body[:300].decode("utf-8", errors="replace")
+    if status_code == 401:
+        return HTTPException(
+            status_code=401,
+            detail="Bearer-токен истёк. Обновите TARGETS_TOKEN в .env и перезапустите приложение."
+        )
+    if status_code == 403:
+        return HTTPException(status_code=403, detail="Доступ запрещён. Проверьте права токена.")
+    if status_code == 404:
+        return HTTPException(status_code=404, detail=not_found)
+    if status_code >= 500:
+        return HTTPException(status_code=500, detail=f"Ошибка API Targets ({status_code}): {text}")
+    return HTTPException(status_code=status_code, detail=f"Ошибка при запросе к Targets API: {text}")
+
 
+def _record(endpoint: str, elapsed_ms: float, size: int, error: bool, not_modified: bool = False) -> None:
+    """Учитывает запрос к endpoint'у в метриках request_stats()."""
+    stats = _request_stats.setdefault(
+        endpoint,
+        {"requests": 0, "errors": 0, "not_modified": 0, "total_ms": 0.0, "max_ms": 0.0, "bytes": 0},
+    )
+    stats["requests"] += 1
+    stats["errors"] += int(error)
+    stats["not_modified"] += int(not_modified)
+    stats["total_ms"] += elapsed_ms
+    stats["max_ms"] = max(stats["max_ms"], elapsed_ms)
+    stats["bytes"] += size
+
+
+def request_stats() -> dict:
+    """
+    Возвращает метрики запросов к Targets API по endpoint'ам.
+
+    Returns:
+        dict: {endpoint: {"requests", "errors", "not_modified", "avg_ms", "max_ms", "bytes"}}.
+    """
+    return {
+        endpoint: {
+            "requests": stats["requests"],
+            "errors": stats["errors"],
+            "not_modified": stats["not_modified"],
+            "avg_ms": round(stats["total_ms"] / stats["requests"], 1),
+            "max_ms": round(stats["max_ms"], 1),
+            "bytes": stats["bytes"],
+        }
+        for endpoint, stats in _request_stats.items()
+    }
+
+
+async def _request(
+    endpoint: str,
+    method: str,
+    path: str,
+    *,
+    params: dict | None = None,
+    json_body: Any = None,
+    idempotent: bool = True,
+    not_found: str = "Объект не найден в Targets API.",
+    validators: dict | None = None,
+    consume: Callable[[AsyncIterable[bytes]], Awaitable[Any]] | None = None,
+) -> Any:
+    """
+    Выполняет запрос к Targets API и возвращает декодированный JSON.
+
+    Единая точка для всех endpoint'ов: авторизация, общий пул соединений,
+    лимит частоты и параллельности, повторы и circuit breaker (для
+    идемпотентных запросов), лимит размера ответа, замер времени и
+    преобразование ошибок в HTTPException.
+
+    Args:
+        endpoint: Имя endpoint'а для breaker'а и метрик.
+        method: HTTP-метод.
+        path: Путь относительно TARGETS_BASE_URL или абсолютный URL на том же сервере.
+        params: Параметры строки запроса (например, $select/$filter).
+        json_body: Тело запроса (для POST).
+        idempotent: Можно ли безопасно повторять запрос.
+        not_found: Сообщение об ошибке для ответа 404.
+        validators: Валидаторы прошлого ответа ({"etag", "last_modified"}).
+                    Если заданы, запрос отправляется условным; после ответа
+                    200 словарь обновляется валидаторами нового ответа.
+        consume: Потоковый разбор успешного ответа. Получает фрагменты
+                 тела по мере чтения (тело целиком в память не читается)
+                 и возвращает результат запроса вместо декодированного JSON.
+
+    Returns:
+        Any: Декодированный JSON ответа или результат consume.
+
+    Raises:
+        NotModified: Если сервер ответил 304 на условный запрос.
+        HTTPException: 401/403/404 по ответу сервера, 500 при ошибке API
+                       или отсутствии настроек, 502 при недоступности API,
+                       слишком большом или невалидном ответе, 503 при
+                       разомкнутом breaker'е, 504 при таймауте.
+    """
+    headers = _auth_headers()
+    if validators:
+        headers.update(_conditional_headers(validators))
+    # Ссылки следующей страницы OData (@odata.nextLink) приходят абсолютными URL
+    url = path if path.startswith(("http://", "https://")) else f"{get_targets_base_url()}{path}"
+    max_bytes = get_targets_max_response_bytes()
+    client = get_client()
+
+    async def attempt() -> tuple[httpx.Response, Any, int]:
+        request = client.build_request(method, url, headers=headers, params=params, json=json_body)
+        # Каждая попытка (включая повторы) проходит через общий лимит
+        async with get_limiter().slot(background=_background.get()):
+            response = await client.send(request, stream=True)
+            try:
+                if consume is not None and response.is_success:
+                    body = _LimitedBody(response, max_bytes)
+                    return response, await consume(body), body.received
+                content = await _read_limited(response, max_bytes)
+                return response, content, len(content)
+            finally:
+                await response.aclose()
+
+    started = time.perf_counter()
+    size = 0
+    failed = True
+    not_modified = False
+    try:
+        response, payload, size = await call_with_retry(
+            attempt,
+            breaker=get_breaker(endpoint),
+            retries=get_targets_retries() if idempotent else 0,
+            base_delay=get_targets_retry_base_delay(),
+            max_delay=get_targets_retry_max_delay(),
+            is_failure=lambda result: result[0].status_code >= 500,
+            retry_exceptions=(httpx.TransportError,),
+        )
+        if response.status_code == 304 and validators:
+            failed = False
+            not_modified = True
+            raise NotModified()
+        if not response.is_success:
+            raise _error_for_status(response.status_code, payload, not_found)
+        if consume is not None:
+            data = payload
+        else:
+            try:
+                data = json.loads(payload)
+            except ValueError:
+                raise HTTPException(status_code=502, detail="API Targets вернул невалидный JSON.")
+        if validators is not None:
+            _store_validators(validators, response)
+        failed = False
+        return data
+    except CircuitOpenError as e:
+        logger.warning("Targets API endpoint %s is unavailable: %s", endpoint, e)
+        raise HTTPException(
+            status_code=503,
+            detail="API Targets временно недоступен. Повторите запрос позже.",
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))},
+        )
     except httpx.TimeoutException:
         raise HTTPException(
             status_code=504,
             detail="Таймаут API Targets. Повторите запрос позже."
         )
-    except httpx.HTTPStatusError as e:
-        # Обработка других HTTP ошибок
+    except httpx.TransportError as e:
+        raise HTTPException(status_code=502, detail=f"API Targets недоступен: {e}")
+    except _ResponseTooLarge:
         raise HTTPException(
-            status_code=e.response.status_code,
-            detail=f"Ошибка при запросе к Targets API: {e.response.text}"
+            status_code=502,
+            detail=f"Ответ API Targets превышает лимит {max_bytes // (1024 * 1024)} МБ."
         )
+    finally:
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record(endpoint, elapsed_ms, size, failed, not_modified)
+        logger.debug("%s %s -> %.0f ms, %d bytes", method, path, elapsed_ms, size)
 
 
-async def get_map_graph(map_id: int) -> MapGraph:
+def token_identity() -> str:
     """
-    Загружает граф целей карты из Targets API.
+    Возвращает идентификатор текущего токена Targets API для ключей кэша.
+
+    Сам токен в ключах не хранится — используется префикс его SHA-256.
+
+    Returns:
+        str: Хэш токена или пустая строка, если токен не задан.
+    """
+    token = get_targets_token()
+    if not token:
+        return ""
+    token_clean = token.strip('"').strip("'")
+    return hashlib.sha256(token_clean.encode("utf-8")).hexdigest()[:16]
+
+
+def cache_key(entity: str, entity_id: object = None) -> tuple:
+    """
+    Формирует ключ общего кэша данных Targets API.
+
+    Ключ включает базовый URL и идентификатор токена, поэтому данные,
+    полученные с разными правами доступа, не смешиваются.
+
+    Args:
+        entity: Тип сущности ("maps", "map_graph", "target").
+        entity_id: ID сущности (None для списка карт).
+
+    Returns:
+        tuple: (base_url, token_identity, entity, entity_id).
+    """
+    return (get_targets_base_url() or "", token_identity(), entity, entity_id)
+
+
+async def startup() -> None:
+    """Создаёт общий HTTP-клиент Targets API при старте приложения."""
+    get_client()
+
+
+async def shutdown() -> None:
+    """Закрывает общий HTTP-клиент и все соединения пула при остановке приложения."""
+    global _client, _limiter
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _limiter = None
+
+
+# Поля, которые приложение читает из ответов OData. Необязательные поля моделей
+# (например, TargetDetail.CodeIndex) в проекцию не входят: запрос свойства,
+# которого нет на сервере, OData отклоняет с ошибкой 400
+_SELECT_FIELDS: dict[type[BaseModel], tuple[str, ...]] = {
+    TargetsMap: ("Id", "Name", "Code", "PeriodLabel", "AchievementPercentage", "Status"),
+    TargetDetail: (
+        "Id", "Name", "Code", "StatusDescription", "PeriodLabel", "AchievementPercentage",
+        "PeriodStart", "PeriodEnd", "IsPersonal", "Description", "Notes", "Priority",
+    ),
+}
+
+
+def _odata_select(model: type[BaseModel]) -> str:
+    """
+    Формирует значение $select из читаемых полей модели (см. _SELECT_FIELDS).
+
+    Args:
+        model: Pydantic-модель, в которую разбирается ответ.
+
+    Returns:
+        str: Список полей через запятую.
+    """
+    return ",".join(_SELECT_FIELDS[model])
+
+
+def _odata_string(value: str) -> str:
+    """Возвращает строковый литерал OData (одинарные кавычки экранируются удвоением)."""
+    return "'" + value.replace("'", "''") + "'"
+
+
+def _odata_params(model: type[BaseModel], filter_expr: str | None = None) -> dict:
+    """
+    Формирует параметры OData-запроса: проекцию по читаемым полям модели и фильтр.
+
+    Проекция отключается TARGETS_ODATA_SELECT=false — на случай, если
+    сервер не знает какое-то из полей модели.
+
+    Args:
+        model: Pydantic-модель, в которую разбирается ответ.
+        filter_expr: Выражение $filter (опционально).
+
+    Returns:
+        dict: Параметры строки запроса.
+    """
+    params = {}
+    if get_targets_odata_select():
+        params["$select"] = _odata_select(model)
+    if filter_expr:
+        params["$filter"] = filter_expr
+    return params
+
+
+_MAPS_PATH = "/Integration/odata/ITargetsTargetsMaps"
+
+
+def _page_items(data: Any) -> list:
+    """Возвращает элементы страницы OData ({"value": [...]}) или пустой список."""
+    if isinstance(data, dict):
+        items = data.get("value", [])
+        return items if isinstance(items, list) else []
+    return data if isinstance(data, list) else []
+
+
+def _resolve_next_link(link: str, request_path: str) -> str:
+    """
+    Преобразует @odata.nextLink в абсолютный URL на сервере Targets.
+
+    Ссылки на другой хост не выполняются, чтобы не передать туда токен.
+
+    Args:
+        link: Значение @odata.nextLink (абсолютное или относительное).
+        request_path: Путь запроса, относительно которого разрешается ссылка.
+
+    Returns:
+        str: Абсолютный URL следующей страницы.
+
+    Raises:
+        HTTPException: 502, если ссылка ведёт на другой сервер.
+    """
+    base = httpx.URL(get_targets_base_url())
+    url = httpx.URL(f"{get_targets_base_url()}{request_path}").join(link)
+    if (url.scheme, url.host, url.port) != (base.scheme, base.host, base.port):
+        raise HTTPException(status_code=502, detail="API Targets вернул ссылку на страницу другого сервера.")
+    return str(url)
+
+
+def _stable_order(params: dict, key: str = "Id") -> dict:
+    """
+    Добавляет в $orderby ключ-разрешитель ничьих.
+
+    Без полного порядка сервер может по-разному упорядочить элементы в
+    параллельных запросах $skip/$top, и страницы пересекутся или пропустят
+    элементы. Заданный порядок сохраняется, ключ дописывается последним.
+    """
+    order = params.get("$orderby")
+    if not order:
+        return {**params, "$orderby": key}
+    if key in (part.split()[0] for part in order.split(",") if part.strip()):
+        return params
+    return {**params, "$orderby": f"{order},{key}"}
+
+
+async def _iter_skip_pages(
+    endpoint: str, path: str, params: dict, page_size: int, total: int, not_found: str
+) -> AsyncIterator[list]:
+    """
+    Параллельно загружает оставшиеся страницы по $skip/$top и отдаёт их по порядку.
+
+    Число одновременных запросов ограничено TARGETS_PAGE_CONCURRENCY.
+    При остановке итерации или ошибке незавершённые запросы отменяются.
+    """
+    semaphore = asyncio.Semaphore(get_targets_page_concurrency())
+
+    async def fetch(skip: int) -> list:
+        async with semaphore:
+            page_params = {**params, "$skip": skip, "$top": page_size}
+            return _page_items(await _request(endpoint, "GET", path, params=page_params, not_found=not_found))
+
+    tasks = [asyncio.ensure_future(fetch(skip)) for skip in range(page_size, total, page_size)]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def _iter_pages(
+    endpoint: str, path: str, params: dict, not_found: str, validators: dict | None = None
+) -> AsyncIterator[list]:
+    """
+    Постранично загружает коллекцию OData и отдаёт элементы каждой страницы.
+
+    Если сервер сообщил общее число элементов (@odata.count) и постраничит
+    через $skip, оставшиеся страницы загружаются параллельно; иначе
+    последовательно выполняются переходы по @odata.nextLink. Все страницы
+    запрашиваются с одним и тем же полным порядком $orderby (см. _stable_order).
+
+    Args:
+        endpoint: Имя endpoint'а для breaker'а и метрик.
+        path: Путь коллекции относительно TARGETS_BASE_URL.
+        params: Параметры запроса ($select, $filter, $orderby).
+        not_found: Сообщение об ошибке для ответа 404.
+        validators: Валидаторы для условного запроса первой страницы.
+
+    Yields:
+        list: Сырые элементы очередной страницы.
+
+    Raises:
+        NotModified: Если первая страница не изменилась (304).
+        HTTPException: При ошибке загрузки любой страницы.
+    """
+    params = _stable_order(params)
+    data = await _request(
+        endpoint, "GET", path, params={**params, "$count": "true"},
+        not_found=not_found, validators=validators,
+    )
+    items = _page_items(data)
+    yield items
+
+    next_link = data.get("@odata.nextLink") if isinstance(data, dict) else None
+    total = data.get("@odata.count") if isinstance(data, dict) else None
+    if next_link and isinstance(total, int) and items and "$skip=" in next_link:
+        async for page in _iter_skip_pages(endpoint, path, params, len(items), total, not_found):
+            yield page
+        return
+
+    while next_link:
+        data = await _request(endpoint, "GET", _resolve_next_link(next_link, path), not_found=not_found)
+        yield _page_items(data)
+        next_link = data.get("@odata.nextLink") if isinstance(data, dict) else None
+
+
+def iter_maps_pages(period: str | None = None) -> AsyncIterator[list]:
+    """
+    Постранично загружает список карт целей без разбора в модели.
+
+    GET {TARGETS_BASE_URL}/Integration/odata/ITargetsTargetsMaps
+        ?$select=<поля TargetsMap>&$filter=PeriodLabel eq '<period>'&$orderby=Id&$count=true
+
+    Args:
+        period: Значение PeriodLabel для фильтрации на стороне сервера.
+
+    Returns:
+        AsyncIterator[list]: Сырые элементы страниц по порядку.
+    """
+    filter_expr = f"PeriodLabel eq {_odata_string(period)}" if period else None
+    return _iter_pages(
+        "maps", _MAPS_PATH, _odata_params(TargetsMap, filter_expr),
+        not_found="Endpoint списка карт не найден.",
+    )
+
+
+async def _collect_pages(pages: AsyncIterator[list], validators: dict | None) -> dict:
+    """
+    Собирает элементы всех страниц в один ответ {"value": [...]}.
+
+    Валидаторы первой страницы описывают только её, поэтому для
+    многостраничного ответа они сбрасываются.
+    """
+    items = []
+    page_count = 0
+    async for page in pages:
+        items.extend(page)
+        page_count += 1
+    if validators is not None and page_count > 1:
+        validators.clear()
+    return {"value": items}
+
+
+async def fetch_maps_raw(period: str | None = None, validators: dict | None = None) -> Any:
+    """
+    Загружает все страницы списка карт целей без разбора в модели.
+
+    Args:
+        period: Значение PeriodLabel для фильтрации на стороне сервера.
+        validators: Валидаторы прошлого ответа для условного запроса
+                    (используются, только если список умещается в одну страницу).
+
+    Returns:
+        Any: {"value": [...]} с элементами всех страниц.
+
+    Raises:
+        NotModified: Если список не изменился (304).
+        HTTPException: При ошибках авторизации, доступа или таймауте.
+    """
+    filter_expr = f"PeriodLabel eq {_odata_string(period)}" if period else None
+    pages = _iter_pages(
+        "maps", _MAPS_PATH, _odata_params(TargetsMap, filter_expr),
+        not_found="Endpoint списка карт не найден.", validators=validators,
+    )
+    return await _collect_pages(pages, validators)
+
+
+async def fetch_map_periods_raw(validators: dict | None = None) -> Any:
+    """
+    Загружает только периоды карт (PeriodLabel) без разбора.
+
+    GET {TARGETS_BASE_URL}/Integration/odata/ITargetsTargetsMaps?$select=PeriodLabel
+
+    Args:
+        validators: Валидаторы прошлого ответа для условного запроса.
+
+    Returns:
+        Any: {"value": [{"PeriodLabel": ...}, ...]} с элементами всех страниц.
+
+    Raises:
+        NotModified: Если список не изменился (304).
+        HTTPException: При ошибках авторизации, доступа или таймауте.
+    """
+    pages = _iter_pages(
+        "maps", _MAPS_PATH, {"$select": "PeriodLabel"},
+        not_found="Endpoint списка карт не найден.", validators=validators,
+    )
+    return await _collect_pages(pages, validators)
+
+
+def parse_map_periods(data: Any) -> List[str]:
+    """
+    Разбирает ответ со списком периодов карт.
+
+    Args:
+        data: Декодированный JSON ответа.
+
+    Returns:
+        List[str]: Отсортированные уникальные непустые значения PeriodLabel.
+    """
+    items = data.get("value", []) if isinstance(data, dict) else data if isinstance(data, list) else []
+    return sorted({item["PeriodLabel"] for item in items if isinstance(item, dict) and item.get("PeriodLabel")})
+
+
+def _validate_items(adapter: TypeAdapter, model: type[BaseModel], items: Any) -> list:
+    """
+    Валидирует список записей ответа, пропуская невалидные.
+
+    Обычно весь список проходит одним вызовом адаптера; поэлементная
+    проверка выполняется, только если в ответе есть невалидная запись.
+
+    Args:
+        adapter: Предсобранный TypeAdapter списка моделей.
+        model: Модель одной записи.
+        items: Сырые записи.
+
+    Returns:
+        list: Валидные записи в исходном порядке.
+    """
+    try:
+        return adapter.validate_python(items)
+    except ValidationError:
+        pass
+    valid = []
+    for item in items:
+        try:
+            valid.append(model.model_validate(item))
+        except ValidationError:
+            # Пропускаем невалидные записи
+            continue
+    return valid
+
+
+def parse_maps(data: Any) -> List[TargetsMap]:
+    """
+    Разбирает ответ ITargetsTargetsMaps в список карт.
+
+    Args:
+        data: Декодированный JSON ответа.
+
+    Returns:
+        List[TargetsMap]: Список карт; невалидные записи пропускаются.
+    """
+    # Ожидаем формат {"value": [...]}
+    if isinstance(data, dict) and "value" in data:
+        maps_data = data["value"]
+    else:
+        maps_data = data if isinstance(data, list) else []
+
+    # Валидация и фильтрация через Pydantic
+    return _validate_items(_MAPS_ADAPTER, TargetsMap, maps_data)
+
+
+async def get_maps(period: str | None = None) -> List[TargetsMap]:
+    """
+    Загружает список карт целей из Targets API.
+
+    Args:
+        period: Значение PeriodLabel для фильтрации (опционально).
+
+    Returns:
+        List[TargetsMap]: Список карт с полями Id, Name, Code, PeriodLabel,
+                          AchievementPercentage, Status.
+
+    Raises:
+        HTTPException: При ошибках авторизации, доступа или таймауте.
+    """
+    return parse_maps(await fetch_maps_raw(period))
+
+
+async def fetch_map_graph_raw(map_id: int, validators: dict | None = None) -> Any:
+    """
+    Загружает граф целей карты из Targets API без разбора в модели.
 
     POST {TARGETS_BASE_URL}/integration/odata/Targets/GetTargetsMap
     Body: {"mapId": map_id}
 
+    Args:
+        map_id: ID карты.
+        validators: Валидаторы прошлого ответа для условного запроса.
+
     Returns:
-        MapGraph: Объект с полями Nodes (список GoalNode) и Map.
+        Any: Декодированный JSON ответа ({"Nodes": [...], "Map": {...}}).
 
     Raises:
+        NotModified: Если граф не изменился (304).
         HTTPException: При ошибках авторизации, доступа или таймауте.
     """
-    base_url = get_targets_base_url()
-    token = get_targets_token()
+    # GetTargetsMap только читает данные, поэтому POST безопасно повторять
+    return await _request(
+        "map_graph", "POST", "/integration/odata/Targets/GetTargetsMap",
+        json_body={"mapId": map_id},
+        idempotent=True,
+        not_found=f"Карта с ID {map_id} не найдена.",
+        validators=validators,
+    )
 
-    if not base_url or not token:
+
+def parse_map_graph(data: Any) -> MapGraph:
+    """
+    Разбирает ответ GetTargetsMap в граф карты.
+
+    Args:
+        data: Декодированный JSON ответа или уже разобранный MapGraph
+              (результат fetch_map_graph возвращается как есть).
+
+    Returns:
+        MapGraph: Объект с полями Nodes (список GoalNode) и Map.
+
+    Raises:
+        HTTPException: 422, если структура ответа невалидна.
+    """
+    if isinstance(data, MapGraph):
+        return data
+    # Валидация через Pydantic
+    try:
+        return MapGraph(**data)
+    except (ValidationError, TypeError) as e:
         raise HTTPException(
-            status_code=500,
-            detail="TARGETS_BASE_URL и TARGETS_TOKEN должны быть заданы в .env"
+            status_code=422,
+            detail=f"Невалидная структура ответа API: {str(e)}"
         )
 
-    url = f"{base_url}/integration/odata/Targets/GetTargetsMap"
-    token_clean = token.strip('"').strip("'")
-    headers = {
-        "Authorization": token_clean,
-        "Content-Type": "application/json"
-    }
 
+async def _read_map_graph(chunks: AsyncIterable[bytes]) -> MapGraph:
+    """
+    Потоково разбирает тело ответа GetTargetsMap в граф карты.
+
+    Узлы валидируются по одному по мере чтения, поэтому пиковая память
+    определяется одним сырым узлом, а не всем деревом ответа.
+
+    Raises:
+        HTTPException: 422, если структура ответа невалидна; 502, если тело не JSON-объект.
+    """
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(url, headers=headers, json={"mapId": map_id})
-
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=401,
-                    detail="Bearer-токен истёк. Обновите TARGETS_TOKEN в .env и перезапустите приложение."
-                )
-            elif response.status_code == 403:
-                raise HTTPException(
-                    status_code=403,
-                    detail="Доступ запрещён. Проверьте права токена."
-                )
-            elif response.status_code == 404:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Карта с ID {map_id} не найдена."
-                )
-            elif response.status_code >= 500:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ошибка API Targets: {response.text}"
-                )
-
-            response.raise_for_status()
-            data = response.json()
-
-            # Валидация через Pydantic
-            try:
-                return MapGraph(**data)
-            except ValidationError as e:
-                raise HTTPException(
-                    status_code=422,
-                    detail=f"Невалидная структура ответа API: {str(e)}"
-                )
+        data = await json_stream.parse_object(chunks, {"Nodes": GoalNode.model_validate})
+        # Узлы уже провалидированы: pydantic принимает готовые экземпляры без повторной проверки
+        return MapGraph(**data)
+    except (ValidationError, TypeError) as e:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Невалидная структура ответа API: {str(e)}"
+        )
+    except ValueError:
+        raise HTTPException(status_code=502, detail="API Targets вернул невалидный JSON.")
 
-    except httpx.TimeoutException:
+
+async def _copy_chunks(chunks: AsyncIterable[bytes], file: BinaryIO) -> AsyncIterator[bytes]:
+    """Передаёт фрагменты тела ответа дальше, попутно дописывая их в файл."""
+    async for chunk in chunks:
+        file.write(chunk)
+        yield chunk
+
+
+async def fetch_map_graph(
+    map_id: int, validators: dict | None = None, body: BinaryIO | None = None
+) -> MapGraph:
+    """
+    Загружает граф целей карты с потоковым разбором ответа.
+
+    В отличие от fetch_map_graph_raw, тело ответа не декодируется целиком:
+    узлы Nodes разбираются и валидируются по мере получения байтов.
+
+    Args:
+        map_id: ID карты.
+        validators: Валидаторы прошлого ответа для условного запроса.
+        body: Файл, в который копируются исходные байты ответа
+              (например, для дискового кэша без повторной сериализации).
+
+    Returns:
+        MapGraph: Объект с полями Nodes (список GoalNode) и Map.
+
+    Raises:
+        NotModified: Если граф не изменился (304).
+        HTTPException: При ошибках авторизации, доступа, таймауте или невалидном ответе.
+    """
+    consume = _read_map_graph
+    if body is not None:
+        async def consume(chunks: AsyncIterable[bytes]) -> MapGraph:
+            # Повтор после обрыва соединения начинает копию тела заново
+            body.seek(0)
+            body.truncate()
+            return await _read_map_graph(_copy_chunks(chunks, body))
+
+    return await _request(
+        "map_graph", "POST", "/integration/odata/Targets/GetTargetsMap",
+        json_body={"mapId": map_id},
+        idempotent=True,
+        not_found=f"Карта с ID {map_id} не найдена.",
+        validators=validators,
+        consume=consume,
+    )
+
+
+async def get_map_graph(map_id: int) -> MapGraph:
+    """
+    Загружает граф целей карты из Targets API.
+
+    Ответ разбирается потоково, если не отключено TARGETS_STREAM_MAP_GRAPH=false.
+
+    Returns:
+        MapGraph: Объект с полями Nodes (список GoalNode) и Map.
+
+    Raises:
+        HTTPException: При ошибках авторизации, доступа или таймауте.
+    """
+    if get_targets_stream_map_graph():
+        return await fetch_map_graph(map_id)
+    return parse_map_graph(await fetch_map_graph_raw(map_id))
+
+
+async def fetch_target_raw(target_id: int, validators: dict | None = None) -> Any:
+    """
+    Загружает расширенную информацию по цели без разбора в модель.
+
+    GET {TARGETS_BASE_URL}/Integration/odata/ITargetsTargets({target_id})?$select=<поля TargetDetail>
+
+    Args:
+        target_id: ID цели.
+        validators: Валидаторы прошлого ответа для условного запроса.
+
+    Returns:
+        Any: Декодированный JSON ответа.
+
+    Raises:
+        NotModified: Если цель не изменилась (304).
+        HTTPException: При ошибках авторизации, доступа или таймауте.
+    """
+    return await _request(
+        "target", "GET", f"/Integration/odata/ITargetsTargets({target_id})",
+        params=_odata_params(TargetDetail),
+        not_found=f"Цель с ID {target_id} не найдена.",
+        validators=validators,
+    )
+
+
+def parse_target(data: Any) -> TargetDetail:
+    """
+    Разбирает ответ ITargetsTargets в расширенную информацию по цели.
+
+    Args:
+        data: Декодированный JSON ответа.
+
+    Returns:
+        TargetDetail: Объект с полями Id, Name, Code, StatusDescription,
+                      PeriodLabel, AchievementPercentage, Description, Notes, Priority.
+
+    Raises:
+        HTTPException: 422, если структура ответа невалидна.
+    """
+    # Валидация через Pydantic
+    try:
+        return TargetDetail(**data)
+    except (ValidationError, TypeError) as e:
         raise HTTPException(
-            status_code=504,
-            detail="Таймаут API Targets. Повторите запрос позже."
+            status_code=422,
+            detail=f"Невалидная структура ответа API: {str(e)}"
         )
 
 
@@ -179,78 +1018,63 @@ async def get_target(target_id: int) -> TargetDetail:
     """
     Загружает расширенную информацию по цели из Targets API.
 
-    GET {TARGETS_BASE_URL}/Integration/odata/ITargetsTargets({target_id})
+    Returns:
+        TargetDetail: Расширенная информация по цели.
+
+    Raises:
+        HTTPException: При ошибках авторизации, доступа или таймауте.
+    """
+    return parse_target(await fetch_target_raw(target_id))
+
+
+async def fetch_key_results_raw(target_id: int, validators: dict | None = None) -> Any:
+    """
+    Загружает ключевые результаты цели без разбора в модели.
+
+    GET {TARGETS_BASE_URL}/integration/odata/Targets/GetKeyResults(targetId={target_id})
+
+    Args:
+        target_id: ID цели.
+        validators: Валидаторы прошлого ответа для условного запроса.
 
     Returns:
-        TargetDetail: Объект с полями Id, Name, Code, StatusDescription,
-                      PeriodLabel, AchievementPercentage, Description, Notes, Priority.
+        Any: Декодированный JSON ответа ({"Payload": {"Data": [...]}}).
 
     Raises:
+        NotModified: Если КР не изменились (304).
         HTTPException: При ошибках авторизации, доступа или таймауте.
     """
-    base_url = get_targets_base_url()
-    token = get_targets_token()
+    return await _request(
+        "key_results", "GET", f"/integration/odata/Targets/GetKeyResults(targetId={target_id})",
+        not_found=f"КР для цели {target_id} не найдены.",
+        validators=validators,
+    )
 
-    if not base_url or not token:
-        raise HTTPException(
-            status_code=500,
-            detail="TARGETS_BASE_URL и TARGETS_TOKEN должны быть заданы в .env"
-        )
 
-    url = f"{base_url}/Integration/odata/ITargetsTargets({target_id})"
-    token_clean = token.strip('"').strip("'")
-    headers = {"Authorization": token_clean}
+def parse_key_results(data: Any) -> List[KeyResult]:
+    """
+    Разбирает ответ GetKeyResults в список ключевых результатов.
 
-    try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers)
-
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=401,
-                    detail="Bearer-токен истёк. Обновите TARGETS_TOKEN в .env и перезапустите приложение."
-                )
-            elif response.status_code == 403:
-                raise HTTPException(
-                    status_code=403,
-                    detail="Доступ запрещён. Проверьте права токена."
-                )
-            elif response.status_code == 404:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Цель с ID {target_id} не найдена."
-                )
-            elif response.status_code >= 500:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ошибка API Targets: {response.text}"
-                )
-
-            response.raise_for_status()
-            data = response.json()
-
-            # Валидация через Pydantic
-            try:
-                return TargetDetail(**data)
-            except ValidationError as e:
-                raise HTTPException(
-                    status_code=422,
-                    detail=f"Невалидная структура ответа API: {str(e)}"
-                )
+    Args:
+        data: Декодированный JSON ответа.
 
-    except httpx.TimeoutException:
-        raise HTTPException(
-            status_code=504,
-            detail="Таймаут API Targets. Повторите запрос позже."
-        )
+    Returns:
+        List[KeyResult]: Список КР; невалидные записи пропускаются.
+    """
+    # Ожидаем формат {"Payload": {"Data": [...]}}
+    if isinstance(data, dict) and "Payload" in data and "Data" in data["Payload"]:
+        kr_data = data["Payload"]["Data"]
+    else:
+        kr_data = []
+
+    # Валидация через Pydantic
+    return _validate_items(_KEY_RESULTS_ADAPTER, KeyResult, kr_data)
 
 
 async def get_key_results(target_id: int) -> List[KeyResult]:
     """
     Загружает ключевые результаты цели из Targets API.
 
-    GET {TARGETS_BASE_URL}/integration/odata/Targets/GetKeyResults(targetId={target_id})
-
     Returns:
         List[KeyResult]: Список КР с полями Description, AchievementPercentage,
                          Metric, InitialValue, PlannedValue, ActualValue.
@@ -258,66 +1082,113 @@ async def get_key_results(target_id: int) -> List[KeyResult]:
     Raises:
         HTTPException: При ошибках авторизации, доступа или таймауте.
     """
-    base_url = get_targets_base_url()
-    token = get_targets_token()
+    return parse_key_results(await fetch_key_results_raw(target_id))
 
-    if not base_url or not token:
-        raise HTTPException(
-            status_code=500,
-            detail="TARGETS_BASE_URL и TARGETS_TOKEN должны быть заданы в .env"
-        )
 
-    url = f"{base_url}/integration/odata/Targets/GetKeyResults(targetId={target_id})"
-    token_clean = token.strip('"').strip("'")
-    headers = {"Authorization": token_clean}
+async def _gather_or_cancel(*aws: Awaitable[Any]) -> list:
+    """
+    Выполняет корутины параллельно; при ошибке одной отменяет остальные.
+
+    Args:
+        *aws: Корутины для параллельного выполнения.
+
+    Returns:
+        list: Результаты в порядке аргументов.
 
+    Raises:
+        Exception: Первое исключение среди корутин.
+    """
+    tasks = [asyncio.ensure_future(aw) for aw in aws]
     try:
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.get(url, headers=headers)
-
-            if response.status_code == 401:
-                raise HTTPException(
-                    status_code=401,
-                    detail="Bearer-токен истёк. Обновите TARGETS_TOKEN в .env и перезапустите приложение."
-                )
-            elif response.status_code == 403:
-                raise HTTPException(
-                    status_code=403,
-                    detail="Доступ запрещён. Проверьте права токена."
-                )
-            elif response.status_code == 404:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"КР для цели {target_id} не найдены."
-                )
-            elif response.status_code >= 500:
-                raise HTTPException(
-                    status_code=500,
-                    detail=f"Ошибка API Targets: {response.text}"
-                )
-
-            response.raise_for_status()
-            data = response.json()
-
-            # Ожидаем формат {"Payload": {"Data": [...]}}
-            if isinstance(data, dict) and "Payload" in data and "Data" in data["Payload"]:
-                kr_data = data["Payload"]["Data"]
-            else:
-                kr_data = []
-
-            # Валидация через Pydantic
-            key_results = []
-            for item in kr_data:
-                try:
-                    key_results.append(KeyResult(**item))
-                except ValidationError:
-                    # Пропускаем невалидные записи
-                    continue
-
-            return key_results
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        # Дожидаемся отмены, чтобы не оставлять висящих задач
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
 
-    except httpx.TimeoutException:
-        raise HTTPException(
-            status_code=504,
-            detail="Таймаут API Targets. Повторите запрос позже."
+
+async def get_target_bundle(target_id: int) -> Tuple[TargetDetail, List[KeyResult]]:
+    """
+    Параллельно загружает расширенную информацию по цели и её ключевые результаты.
+
+    Оба запроса независимы, поэтому выполняются одновременно: холодная загрузка
+    цели стоит одного сетевого круга вместо двух. Если один из запросов
+    завершился ошибкой, второй отменяется, а исходное исключение пробрасывается.
+
+    Args:
+        target_id: ID цели.
+
+    Returns:
+        Tuple[TargetDetail, List[KeyResult]]: Детали цели и список КР.
+
+    Raises:
+        HTTPException: При ошибке любого из запросов.
+    """
+    detail, key_results = await _gather_or_cancel(get_target(target_id), get_key_results(target_id))
+    return detail, key_results
+
+
+async def _unless_not_modified(aw: Awaitable[Any]) -> Any:
+    """Возвращает результат корутины или NotModified (экземпляр), если ответ 304."""
+    try:
+        return await aw
+    except NotModified as e:
+        return e
+
+
+async def fetch_target_bundle_raw(target_id: int, validators: dict | None = None) -> dict:
+    """
+    Параллельно загружает сырые ответы по цели и её КР.
+
+    Args:
+        target_id: ID цели.
+        validators: Валидаторы обоих запросов {"detail": {...}, "key_results": {...}}.
+                    Если не изменилась только одна часть, она загружается
+                    повторно без условия, чтобы вернуть полный ответ.
+
+    Returns:
+        dict: {"detail": <JSON цели>, "key_results": <JSON КР>}.
+
+    Raises:
+        NotModified: Если не изменились ни цель, ни КР.
+        HTTPException: При ошибке любого из запросов.
+    """
+    if validators is None:
+        detail, key_results = await _gather_or_cancel(
+            fetch_target_raw(target_id), fetch_key_results_raw(target_id)
         )
+        return {"detail": detail, "key_results": key_results}
+
+    # Новые словари частей: валидаторы вызывающего обновляются, только если загружены обе части
+    detail_validators = dict(validators.get("detail", {}))
+    kr_validators = dict(validators.get("key_results", {}))
+    detail, key_results = await _gather_or_cancel(
+        _unless_not_modified(fetch_target_raw(target_id, detail_validators)),
+        _unless_not_modified(fetch_key_results_raw(target_id, kr_validators)),
+    )
+    if isinstance(detail, NotModified) and isinstance(key_results, NotModified):
+        raise NotModified()
+    if isinstance(detail, NotModified):
+        detail_validators.clear()
+        detail = await fetch_target_raw(target_id, detail_validators)
+    if isinstance(key_results, NotModified):
+        kr_validators.clear()
+        key_results = await fetch_key_results_raw(target_id, kr_validators)
+    validators["detail"] = detail_validators
+    validators["key_results"] = kr_validators
+    return {"detail": detail, "key_results": key_results}
+
+
+def parse_target_bundle(data: dict) -> Tuple[TargetDetail, List[KeyResult]]:
+    """
+    Разбирает результат fetch_target_bundle_raw.
+
+    Args:
+        data: {"detail": <JSON цели>, "key_results": <JSON КР>}.
+
+    Returns:
+        Tuple[TargetDetail, List[KeyResult]]: Детали цели и список КР.
+    """
+    return parse_target(data["detail"]), parse_key_results(data["key_results"])
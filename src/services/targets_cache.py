@@ -0,0 +1,492 @@
+"""Общий (межсессионный) кэш данных Directum Targets API."""
+
+import asyncio
+import copy
+import logging
+import os
+import tempfile
+from typing import Any, AsyncIterator, Awaitable, Callable, List, NamedTuple, Tuple
+
+from src.config import (
+    get_data_dir, get_shared_cache_ttl, get_shared_cache_max_bytes, get_shared_cache_retention,
+    get_disk_cache_enabled, get_disk_cache_max_bytes,
+    get_disk_cache_fresh_ttl, get_disk_cache_stale_ttl, get_targets_stream_map_graph,
+)
+from src.models.goal_graph import GoalGraph
+from src.models.targets import TargetsMap, TargetDetail, KeyResult
+from src.services import targets_api
+from src.services.cache import TTLCache
+from src.services.disk_cache import DiskCache, JsonFile
+from src.services.single_flight import SingleFlight
+
+logger = logging.getLogger("targets_cache")
+
+# Общий кэш на процесс; создаётся лениво из настроек окружения
+_cache: TTLCache | None = None
+
+# Дисковый кэш сырых ответов в DATA_DIR/cache; индекс строится при первом обращении
+_disk: DiskCache | None = None
+
+# Валидаторы HTTP-кэша (ETag/Last-Modified) для записей общего кэша
+_validators: dict[tuple, dict] = {}
+
+# Одновременные промахи по одному ключу ждут один запрос к Targets API
+_flights = SingleFlight()
+
+# Число обновлений, подтверждённых ответом 304 без загрузки данных
+_revalidated = 0
+
+# Фоновые обновления устаревших записей (ссылки держим, чтобы задачи не собрал GC)
+_background: set[asyncio.Task] = set()
+
+
+class _Streamed(NamedTuple):
+    """Потоково разобранный ответ и копия его исходного тела для дискового кэша."""
+
+    value: Any
+    body: JsonFile
+
+
+def get_cache() -> TTLCache:
+    """
+    Возвращает общий кэш Targets.
+
+    Записи хранятся SHARED_CACHE_RETENTION секунд, но свежими считаются
+    только первые SHARED_CACHE_TTL: устаревшая запись не отдаётся, а
+    используется для условного запроса к Targets API.
+
+    Returns:
+        TTLCache: Кэш разобранных ответов Targets API.
+    """
+    global _cache
+    if _cache is None:
+        _cache = TTLCache(
+            max_bytes=get_shared_cache_max_bytes(),
+            default_ttl=max(get_shared_cache_retention(), get_shared_cache_ttl()),
+            on_remove=lambda key: _validators.pop(key, None),
+        )
+    return _cache
+
+
+def get_disk_cache() -> DiskCache | None:
+    """
+    Возвращает дисковый кэш сырых ответов или None, если он выключен.
+
+    Returns:
+        DiskCache | None: Кэш в директории DATA_DIR/cache.
+    """
+    global _disk
+    if not get_disk_cache_enabled():
+        return None
+    if _disk is None:
+        _disk = DiskCache(os.path.join(get_data_dir(), "cache"), get_disk_cache_max_bytes())
+    return _disk
+
+
+def clear() -> None:
+    """Сбрасывает in-memory состояние кэшей (используется в тестах и при смене настроек)."""
+    global _cache, _disk, _flights
+    _cache = None
+    _disk = None
+    _flights = SingleFlight()
+    _validators.clear()
+
+
+async def shutdown() -> None:
+    """Отменяет фоновые обновления кэша при остановке приложения."""
+    tasks = list(_background)
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def _get_fresh(key: tuple) -> Tuple[Any, float] | None:
+    """Возвращает (значение, возраст) из общего кэша, если запись моложе SHARED_CACHE_TTL."""
+    cache = get_cache()
+    if key not in cache:
+        return None
+    age = cache.age(key)
+    if age >= get_shared_cache_ttl():
+        return None
+    return cache.get(key), age
+
+
+async def _fetch_and_store(
+    key: tuple,
+    fetch_raw: Callable[[dict], Awaitable[Any]],
+    parse: Callable[[Any], Any],
+) -> Any:
+    """
+    Загружает ответ из Targets API и сохраняет его в общий и дисковый кэши.
+
+    Если в общем кэше есть прежнее значение с валидаторами, запрос
+    отправляется условным; при ответе 304 прежний разобранный объект
+    используется повторно без декодирования и валидации.
+    """
+    global _revalidated
+    cache = get_cache()
+    previous = cache.get(key) if key in cache else None
+    # Глубокая копия: fetch_raw дополняет вложенные валидаторы (например, частей пакета цели),
+    # а сохранённые меняются только после успешной загрузки и разбора всего ответа
+    validators = copy.deepcopy(_validators.get(key, {})) if previous is not None else {}
+
+    try:
+        raw = await fetch_raw(validators)
+    except targets_api.NotModified:
+        _revalidated += 1
+        if not cache.touch(key):
+            cache.set(key, previous)
+            _validators[key] = validators
+        disk = get_disk_cache()
+        if disk is not None:
+            await disk.atouch(key)
+        return previous
+
+    streamed = raw if isinstance(raw, _Streamed) else None
+    try:
+        value = parse(streamed.value if streamed is not None else raw)
+        cache.set(key, value)
+        if validators:
+            _validators[key] = validators
+        else:
+            _validators.pop(key, None)
+        disk = get_disk_cache()
+        if disk is not None:
+            # Потоковый ответ сохраняется исходными байтами, без повторной сериализации моделей
+            data = streamed.body if streamed is not None else raw
+            await disk.aset(key, data, {"validators": validators} if validators else None)
+    finally:
+        if streamed is not None:
+            streamed.body.file.close()
+    return value
+
+
+async def _refresh(
+    key: tuple,
+    fetch_raw: Callable[[dict], Awaitable[Any]],
+    parse: Callable[[Any], Any],
+) -> Any:
+    """Принудительно запрашивает Targets API (условно, если есть валидаторы) и обновляет кэши."""
+    return await _flights.do(("refresh", key), lambda: _fetch_and_store(key, fetch_raw, parse))
+
+
+def _refresh_in_background(
+    key: tuple,
+    fetch_raw: Callable[[dict], Awaitable[Any]],
+    parse: Callable[[Any], Any],
+    on_done: Callable[[Any], None] | None = None,
+) -> None:
+    """
+    Запускает фоновое обновление устаревшей записи.
+
+    Args:
+        key: Ключ записи.
+        fetch_raw: Корутина загрузки сырого ответа.
+        parse: Разбор сырого ответа в модели.
+        on_done: Вызывается со свежим значением после успешного обновления.
+    """
+    async def refresh() -> None:
+        try:
+            value = await _refresh(key, fetch_raw, parse)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning("Background refresh of %s failed: %s", key[2:], e)
+            return
+        if on_done is not None:
+            on_done(value)
+
+    task = asyncio.create_task(refresh())
+    _background.add(task)
+    task.add_done_callback(_background.discard)
+
+
+async def _load_from_disk(
+    key: tuple,
+    fetch_raw: Callable[[dict], Awaitable[Any]],
+    parse: Callable[[Any], Any],
+) -> Tuple[Any, float] | None:
+    """
+    Возвращает значение из дискового кэша по правилам stale-while-revalidate.
+
+    Свежая запись отдаётся как есть; устаревшая, но не старше
+    DISK_CACHE_STALE_TTL, отдаётся сразу с фоновым обновлением.
+
+    Returns:
+        tuple[Any, float] | None: (разобранное значение, возраст данных)
+                                  или None, если подходящей записи нет.
+    """
+    disk = get_disk_cache()
+    if disk is None:
+        return None
+
+    hit = await disk.aget(key)
+    if hit is None:
+        return None
+    raw, age, meta = hit
+    if age > get_disk_cache_stale_ttl():
+        return None
+
+    try:
+        value = parse(raw)
+    except Exception as e:
+        logger.warning("Disk cache entry for %s cannot be parsed: %s", key[2:], e)
+        return None
+
+    get_cache().set(key, value, age=age)
+    if meta and meta.get("validators"):
+        _validators[key] = meta["validators"]
+    if age > get_disk_cache_fresh_ttl():
+        _refresh_in_background(key, fetch_raw, parse)
+    return value, age
+
+
+async def _get_or_fetch_with_age(
+    key: tuple,
+    fetch_raw: Callable[[dict], Awaitable[Any]],
+    parse: Callable[[Any], Any],
+) -> Tuple[Any, float]:
+    """
+    Возвращает значение из общего кэша, дискового кэша или Targets API вместе с его возрастом.
+
+    Одновременные промахи по одному ключу объединяются в один запрос.
+
+    Args:
+        key: Ключ из targets_api.cache_key().
+        fetch_raw: Корутина загрузки сырого ответа при промахе; принимает
+                   валидаторы прошлого ответа для условного запроса.
+        parse: Разбор сырого ответа в модели.
+
+    Returns:
+        Tuple[Any, float]: Значение и возраст данных в секундах
+                           (время с момента получения от Targets API).
+    """
+    fresh = _get_fresh(key)
+    if fresh is not None:
+        return fresh
+
+    async def load() -> Tuple[Any, float]:
+        # Устаревшая запись в памяти обновляется условным запросом, без неё — читается диск
+        if key not in get_cache():
+            cached = await _load_from_disk(key, fetch_raw, parse)
+            if cached is not None:
+                return cached
+        return await _fetch_and_store(key, fetch_raw, parse), 0.0
+
+    return await _flights.do(key, load)
+
+
+async def _get_or_fetch(
+    key: tuple,
+    fetch_raw: Callable[[dict], Awaitable[Any]],
+    parse: Callable[[Any], Any],
+) -> Any:
+    """Возвращает значение из кэшей или Targets API (без возраста данных)."""
+    value, _ = await _get_or_fetch_with_age(key, fetch_raw, parse)
+    return value
+
+
+def _parse_goal_graph(data: Any) -> GoalGraph:
+    """Разбирает ответ GetTargetsMap и сворачивает его в компактный GoalGraph для кэша."""
+    return GoalGraph.from_map_graph(targets_api.parse_map_graph(data))
+
+
+async def _fetch_map_graph_streamed(map_id: int, validators: dict) -> Any:
+    """
+    Загружает граф карты с потоковым разбором ответа.
+
+    При включённом дисковом кэше тело ответа попутно копируется во
+    временный файл: на диск записываются исходные байты, а не заново
+    сериализованный MapGraph, поэтому пиковая память не растёт.
+
+    Returns:
+        Any: MapGraph или _Streamed с графом и копией тела.
+    """
+    if get_disk_cache() is None:
+        return await targets_api.fetch_map_graph(map_id, validators)
+    body = tempfile.TemporaryFile()
+    try:
+        graph = await targets_api.fetch_map_graph(map_id, validators, body=body)
+    except BaseException:
+        body.close()
+        raise
+    return _Streamed(graph, JsonFile(body))
+
+
+def _map_graph_source(map_id: int) -> tuple:
+    """
+    Возвращает (ключ, загрузка ответа, разбор) для графа карты.
+
+    При потоковом разборе загрузка сразу возвращает MapGraph, а
+    parse_map_graph пропускает его как есть. В памяти кэшируется
+    колоночный GoalGraph, а не pydantic-модели узлов.
+    """
+    if get_targets_stream_map_graph():
+        fetch = _fetch_map_graph_streamed
+    else:
+        fetch = targets_api.fetch_map_graph_raw
+    return (
+        targets_api.cache_key("map_graph", map_id),
+        lambda validators: fetch(map_id, validators),
+        _parse_goal_graph,
+    )
+
+
+async def get_maps(period: str | None = None) -> List[TargetsMap]:
+    """
+    Возвращает список карт из общего кэша или из Targets API.
+
+    Фильтр по периоду выполняется на стороне Targets API, поэтому
+    каждый фильтр кэшируется отдельно.
+
+    Args:
+        period: Значение PeriodLabel для фильтрации (None — все карты).
+
+    Returns:
+        List[TargetsMap]: Список карт целей.
+    """
+    return await _get_or_fetch(
+        targets_api.cache_key("maps", period),
+        lambda validators: targets_api.fetch_maps_raw(period, validators),
+        targets_api.parse_maps,
+    )
+
+
+async def iter_maps(period: str | None = None) -> AsyncIterator[List[TargetsMap]]:
+    """
+    Отдаёт список карт по страницам, не дожидаясь загрузки последней.
+
+    При попадании в общий или дисковый кэш весь список отдаётся одной
+    страницей. При промахе страницы Targets API разбираются и отдаются по
+    мере поступления, а после последней список сохраняется в кэши.
+    Одновременные холодные запросы в этом режиме не объединяются.
+
+    Args:
+        period: Значение PeriodLabel для фильтрации (None — все карты).
+
+    Yields:
+        List[TargetsMap]: Карты очередной страницы.
+    """
+    key = targets_api.cache_key("maps", period)
+
+    def fetch_raw(validators: dict) -> Awaitable[Any]:
+        return targets_api.fetch_maps_raw(period, validators)
+
+    maps = None
+    if key in get_cache():
+        # Свежая запись или условное обновление устаревшей
+        maps, _ = await _get_or_fetch_with_age(key, fetch_raw, targets_api.parse_maps)
+    else:
+        cached = await _load_from_disk(key, fetch_raw, targets_api.parse_maps)
+        if cached is not None:
+            maps = cached[0]
+    if maps is not None:
+        yield maps
+        return
+
+    raw_items: list = []
+    maps = []
+    async for items in targets_api.iter_maps_pages(period):
+        page = targets_api.parse_maps(items)
+        raw_items.extend(items)
+        maps.extend(page)
+        yield page
+
+    get_cache().set(key, maps)
+    _validators.pop(key, None)
+    disk = get_disk_cache()
+    if disk is not None:
+        await disk.aset(key, {"value": raw_items})
+
+
+async def get_map_periods() -> List[str]:
+    """
+    Возвращает список периодов карт из общего кэша или из Targets API.
+
+    Returns:
+        List[str]: Отсортированные уникальные значения PeriodLabel.
+    """
+    return await _get_or_fetch(
+        targets_api.cache_key("map_periods"),
+        targets_api.fetch_map_periods_raw,
+        targets_api.parse_map_periods,
+    )
+
+
+async def get_map_graph(map_id: int) -> GoalGraph:
+    """
+    Возвращает граф карты из общего кэша или из Targets API.
+
+    Args:
+        map_id: ID карты.
+
+    Returns:
+        GoalGraph: Граф целей карты.
+    """
+    return await _get_or_fetch(*_map_graph_source(map_id))
+
+
+async def get_map_graph_with_age(map_id: int) -> Tuple[GoalGraph, float]:
+    """
+    Возвращает граф карты и возраст его данных в секундах.
+
+    Args:
+        map_id: ID карты.
+
+    Returns:
+        Tuple[GoalGraph, float]: Граф целей карты и возраст данных.
+    """
+    return await _get_or_fetch_with_age(*_map_graph_source(map_id))
+
+
+async def refresh_map_graph(map_id: int) -> GoalGraph:
+    """
+    Загружает свежий граф карты из Targets API в обход кэшей и обновляет их.
+
+    Args:
+        map_id: ID карты.
+
+    Returns:
+        GoalGraph: Свежий граф целей карты.
+    """
+    return await _refresh(*_map_graph_source(map_id))
+
+
+def refresh_map_graph_in_background(map_id: int, on_done: Callable[[GoalGraph], None]) -> None:
+    """
+    Запускает фоновое обновление графа карты.
+
+    Args:
+        map_id: ID карты.
+        on_done: Вызывается со свежим графом после успешного обновления.
+    """
+    _refresh_in_background(*_map_graph_source(map_id), on_done=on_done)
+
+
+async def get_target_bundle(target_id: int) -> Tuple[TargetDetail, List[KeyResult]]:
+    """
+    Возвращает детали цели и КР из общего кэша или из Targets API.
+
+    Args:
+        target_id: ID цели.
+
+    Returns:
+        Tuple[TargetDetail, List[KeyResult]]: Детали цели и список КР.
+    """
+    return await _get_or_fetch(
+        targets_api.cache_key("target", target_id),
+        lambda validators: targets_api.fetch_target_bundle_raw(target_id, validators),
+        targets_api.parse_target_bundle,
+    )
+
+
+def stats() -> dict:
+    """Возвращает метрики общего и дискового кэшей, объединения запросов и условных обновлений."""
+    disk = get_disk_cache()
+    return {
+        **get_cache().stats(),
+        "single_flight": _flights.stats(),
+        "disk": disk.stats() if disk is not None else None,
+        "background_refreshes": len(_background),
+        "revalidated": _revalidated,
+    }
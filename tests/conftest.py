@@ -19,6 +19,17 @@ def set_test_data_dir(temp_data_dir, monkeypatch):
     monkeypatch.setenv("DATA_DIR", temp_data_dir)
 
 
+@pytest.fixture(autouse=True)
+def reset_targets_api_state():
+    """Сбрасывает circuit breaker'ы и лимитер Targets API, чтобы тесты не влияли друг на друга."""
+    from src.services import targets_api
+    targets_api.reset_breakers()
+    targets_api._limiter = None
+    yield
+    targets_api.reset_breakers()
+    targets_api._limiter = None
+
+
 @pytest.fixture(scope="session")
 def sample_json_text():
     """Возвращает минимальный валидный JSON карты целей."""
@@ -61,6 +61,19 @@ class TestApiHealth:
         assert resp.status_code == 200
         assert resp.json()["status"] == "ok"
 
+    def test_health_reports_open_breaker(self, app_client):
+        """Разомкнутый circuit breaker Targets API виден в healthcheck."""
+        from src.services import targets_api
+        breaker = targets_api.get_breaker("map_graph")
+        for _ in range(10):
+            breaker.record_failure()
+
+        resp = app_client.get("/api/health")
+        data = resp.json()
+        assert resp.status_code == 200
+        assert data["status"] == "degraded"
+        assert data["targets_api"]["map_graph"]["state"] == "open"
+
 
 class TestStaticPages:
     """Тесты раздачи статических страниц."""
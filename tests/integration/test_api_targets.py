@@ -0,0 +1,143 @@
+"""Интеграционные тесты для endpoint'ов, работающих с Targets API через кэш сессий."""
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src.services import targets_cache
+
+
+@pytest.fixture(autouse=True)
+def clear_shared_cache(monkeypatch):
+    """Изолирует тесты друг от друга: сбрасывает общий кэш и выключает дисковый."""
+    monkeypatch.setenv("DISK_CACHE_ENABLED", "false")
+    targets_cache.clear()
+    yield
+    targets_cache.clear()
+
+
+@pytest.fixture
+def sample_graph():
+    """Сырой ответ GetTargetsMap с двумя целями."""
+    return {
+        "Nodes": [
+            {"TargetId": 1, "Code": "T-1", "Name": "Цель 1", "ChildIds": [2]},
+            {"TargetId": 2, "Code": "T-2", "Name": "Цель 2", "ParentId": "1"},
+        ],
+        "Map": {"Id": 10, "Name": "Карта", "Progress": 40.0},
+    }
+
+
+@pytest.fixture
+def targets_mock(sample_graph):
+    """Подменяет загрузку сырых ответов targets_api фиксированными данными."""
+    async def maps_pages(period=None):
+        yield [{"Id": 10, "Name": "Карта", "PeriodLabel": "2026"}]
+        yield [{"Id": 11, "Name": "Карта 2", "PeriodLabel": "2026"}]
+
+    with patch("src.services.targets_api.iter_maps_pages", side_effect=maps_pages) as get_maps, \
+            patch("src.services.targets_api.fetch_map_periods_raw", new=AsyncMock(return_value={
+                "value": [{"PeriodLabel": "2026"}, {"PeriodLabel": "2025"}],
+            })) as get_periods, \
+            patch("src.services.targets_api.fetch_map_graph", new=AsyncMock(return_value=sample_graph)) as get_graph, \
+            patch("src.services.targets_api.fetch_target_bundle_raw", new=AsyncMock(return_value={
+                "detail": {"Id": 1, "Name": "Цель 1", "Code": "T-1"},
+                "key_results": {"Payload": {"Data": [{"Description": "КР"}]}},
+            })) as get_bundle, \
+            patch("src.main.get_targets_base_url", return_value="https://targets.test"):
+        yield {"maps": get_maps, "periods": get_periods, "graph": get_graph, "bundle": get_bundle}
+
+
+class TestSessionCaching:
+    """Проверка кэширования данных Targets API по сессиям."""
+
+    def test_maps_loaded_once_per_session(self, app_client, targets_mock):
+        """Повторный запрос карт в той же сессии обслуживается из кэша."""
+        headers = {"X-Session-Id": "maps-session"}
+        first = app_client.get("/api/maps", headers=headers)
+        second = app_client.get("/api/maps?period=2026", headers=headers)
+        assert first.status_code == 200
+        assert first.json()["periods"] == ["2026"]
+        assert [m["id"] for m in first.json()["maps"]] == [10, 11]
+        assert second.json()["maps"][0]["id"] == 10
+        # Фильтр применён к уже загруженному полному списку
+        assert targets_mock["maps"].call_count == 1
+        assert targets_mock["periods"].await_count == 0
+
+    def test_period_filter_pushed_to_api(self, app_client, targets_mock):
+        """Без полного списка фильтр по периоду уходит в Targets API и кэшируется."""
+        headers = {"X-Session-Id": "period-session"}
+        resp = app_client.get("/api/maps?period=2026", headers=headers)
+        app_client.get("/api/maps?period=2026", headers=headers)
+        assert resp.json()["periods"] == ["2025", "2026"]
+        targets_mock["maps"].assert_called_once_with("2026")
+        assert targets_mock["periods"].await_count == 1
+
+    def test_maps_shared_between_sessions(self, app_client, targets_mock):
+        """Список карт, загруженный потоком одной сессией, отдаётся другой из общего кэша."""
+        app_client.get("/api/maps", headers={"X-Session-Id": "a"})
+        resp = app_client.get("/api/maps", headers={"X-Session-Id": "b"})
+        assert len(resp.json()["maps"]) == 2
+        assert targets_mock["maps"].call_count == 1
+
+    def test_goals_shared_between_sessions(self, app_client, targets_mock):
+        """Граф карты, загруженный одной сессией, отдаётся другим из общего кэша."""
+        app_client.get("/api/maps/10/goals", headers={"X-Session-Id": "a"})
+        app_client.get("/api/maps/10/goals", headers={"X-Session-Id": "a"})
+        resp = app_client.get("/api/maps/10/goals", headers={"X-Session-Id": "b"})
+        assert resp.json()["map"]["name"] == "Карта"
+        assert len(resp.json()["nodes"]) == 2
+        assert targets_mock["graph"].await_count == 1
+
+    def test_goals_report_data_age(self, app_client, targets_mock):
+        """Ответ с графом содержит заголовок Age."""
+        resp = app_client.get("/api/maps/10/goals", headers={"X-Session-Id": "age"})
+        assert resp.headers["Age"] == "0"
+        assert "X-Data-Stale" not in resp.headers
+
+    def test_stale_goals_served_and_refreshed(self, app_client, targets_mock, monkeypatch):
+        """После MAP_GRAPH_SOFT_TTL граф отдаётся сразу и обновляется в фоне."""
+        headers = {"X-Session-Id": "stale"}
+        app_client.get("/api/maps/10/goals", headers=headers)
+        monkeypatch.setenv("MAP_GRAPH_SOFT_TTL", "0")
+        resp = app_client.get("/api/maps/10/goals", headers=headers)
+        assert resp.status_code == 200
+        assert resp.headers["X-Data-Stale"] == "true"
+        assert len(resp.json()["nodes"]) == 2
+        # Фоновое обновление выполняется в event loop тестового клиента
+        app_client.get("/api/health")
+        assert targets_mock["graph"].await_count == 2
+
+    def test_expired_goals_block_for_fresh_data(self, app_client, targets_mock, monkeypatch):
+        """После MAP_GRAPH_HARD_TTL запрос ждёт свежий граф."""
+        headers = {"X-Session-Id": "hard"}
+        app_client.get("/api/maps/10/goals", headers=headers)
+        monkeypatch.setenv("MAP_GRAPH_HARD_TTL", "0")
+        resp = app_client.get("/api/maps/10/goals", headers=headers)
+        assert resp.headers["Age"] == "0"
+        assert "X-Data-Stale" not in resp.headers
+        assert targets_mock["graph"].await_count == 2
+
+    def test_target_cached_per_session(self, app_client, targets_mock):
+        """Цель и КР кэшируются в сессии."""
+        headers = {"X-Session-Id": "target-session"}
+        app_client.get("/api/targets/1", headers=headers)
+        resp = app_client.get("/api/targets/1", headers=headers)
+        data = resp.json()
+        assert data["target"]["code"] == "T-1"
+        assert data["key_results"][0]["description"] == "КР"
+        assert targets_mock["bundle"].await_count == 1
+
+    def test_case_loads_map_on_cache_miss(self, app_client, targets_mock):
+        """Кейс по карте догружает граф, если его нет в кэше сессии."""
+        async def mock_stream(messages, model=None):
+            yield "OK"
+
+        with patch("src.services.cases_service.llm_service.stream_completion", side_effect=mock_stream):
+            resp = app_client.post(
+                "/api/cases/5",
+                json={"mode": "map", "map_id": 10},
+                headers={"X-Session-Id": "case-session"},
+            )
+        assert resp.status_code == 200
+        assert "OK" in resp.text
+        assert targets_mock["graph"].await_count == 1
@@ -0,0 +1,161 @@
+"""Unit-тесты для кэша с TTL и LRU-вытеснением."""
+
+import pytest
+
+from src.models.targets import TargetsMap
+from src.services.cache import TTLCache, SessionCache, estimate_size
+
+
+class FakeClock:
+    """Управляемые часы для проверки TTL."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestEstimateSize:
+    """Тесты оценки размера значений."""
+
+    def test_model_size_grows_with_content(self):
+        """Размер модели растёт вместе с её содержимым."""
+        small = TargetsMap(Id=1, Name="A")
+        big = TargetsMap(Id=1, Name="A" * 1000)
+        assert estimate_size(big) > estimate_size(small) + 900
+
+    def test_collections_sum_items(self):
+        """Размер списка не меньше суммы размеров элементов."""
+        items = [TargetsMap(Id=i) for i in range(3)]
+        assert estimate_size(items) >= 3 * estimate_size(items[0])
+
+
+class TestTTLCache:
+    """Тесты класса TTLCache."""
+
+    def test_get_returns_stored_value(self, clock):
+        """Сохранённое значение возвращается до истечения TTL."""
+        cache = TTLCache(max_bytes=1000, default_ttl=10, clock=clock)
+        cache.set("k", "value")
+        assert cache.get("k") == "value"
+        assert cache.stats()["hits"] == 1
+
+    def test_entry_expires_after_ttl(self, clock):
+        """Запись пропадает после истечения TTL."""
+        cache = TTLCache(max_bytes=1000, default_ttl=10, clock=clock)
+        cache.set("k", "value")
+        clock.now += 11
+        assert cache.get("k") is None
+        stats = cache.stats()
+        assert stats["expirations"] == 1
+        assert stats["bytes"] == 0
+
+    def test_per_entry_ttl(self, clock):
+        """TTL можно задать для отдельной записи."""
+        cache = TTLCache(max_bytes=1000, default_ttl=10, clock=clock)
+        cache.set("short", "a", ttl=1)
+        cache.set("long", "b")
+        clock.now += 5
+        assert "short" not in cache
+        assert cache.get("long") == "b"
+
+    def test_lru_eviction_by_bytes(self, clock):
+        """При превышении лимита вытесняется давно неиспользуемая запись."""
+        cache = TTLCache(max_bytes=25, default_ttl=100, clock=clock)
+        cache.set("a", "x" * 10)
+        cache.set("b", "x" * 10)
+        cache.get("a")  # "a" становится свежей
+        cache.set("c", "x" * 10)
+
+        assert "b" not in cache
+        assert cache.get("a") is not None
+        assert cache.get("c") is not None
+        assert cache.stats()["evictions"] == 1
+        assert cache.stats()["bytes"] == 20
+
+    def test_overwrite_updates_bytes(self, clock):
+        """Перезапись ключа корректно пересчитывает объём."""
+        cache = TTLCache(max_bytes=1000, default_ttl=100, clock=clock)
+        cache.set("a", "x" * 10)
+        cache.set("a", "x" * 30)
+        assert cache.stats()["bytes"] == 30
+        assert len(cache) == 1
+
+    def test_age_accounts_for_source_age(self, clock):
+        """Возраст записи учитывает возраст данных, взятых из другого кэша."""
+        cache = TTLCache(max_bytes=1000, default_ttl=10, clock=clock)
+        cache.set("k", "value", age=30)
+        clock.now += 5
+        assert cache.age("k") == 35
+        assert cache.get("k") == "value"
+        assert cache.age("missing") is None
+
+    def test_purge_expired_calls_on_remove(self, clock):
+        """Периодическая очистка удаляет просроченные записи и уведомляет владельца."""
+        removed = []
+        cache = TTLCache(max_bytes=1000, default_ttl=10, on_remove=removed.append, clock=clock)
+        cache.set("a", "1")
+        cache.set("b", "2", ttl=100)
+        clock.now += 20
+        assert cache.purge_expired() == 1
+        assert removed == ["a"]
+
+
+class TestSessionCache:
+    """Тесты класса SessionCache."""
+
+    def test_sessions_are_isolated(self, clock):
+        """Данные одной сессии не видны в другой."""
+        cache = SessionCache(max_bytes=10_000, ttl=100, clock=clock)
+        cache.session("s1").set_maps(["m"])
+        assert cache.session("s1").get_maps() == ["m"]
+        assert cache.session("s2").get_maps() is None
+
+    def test_graph_and_target_accessors(self, clock):
+        """Графы и цели хранятся по своим ID."""
+        cache = SessionCache(max_bytes=10_000, ttl=100, clock=clock)
+        view = cache.session("s1")
+        view.set_map_graph(5, "graph")
+        view.set_target(7, {"detail": "d", "key_results": []})
+        assert view.get_map_graph(5) == "graph"
+        assert view.get_map_graph(6) is None
+        assert view.get_target(7)["detail"] == "d"
+
+    def test_map_graph_age(self, clock):
+        """Возраст графа карты сессии растёт со временем."""
+        cache = SessionCache(max_bytes=10_000, ttl=100, clock=clock)
+        view = cache.session("s1")
+        view.set_map_graph(5, "graph", age=20)
+        clock.now += 10
+        assert view.get_map_graph_age(5) == 30
+        assert view.get_map_graph_age(6) is None
+
+    def test_session_expired_callback(self, clock):
+        """Когда у сессии не остаётся записей, вызывается on_session_expired."""
+        expired = []
+        cache = SessionCache(max_bytes=10_000, ttl=10, on_session_expired=expired.append, clock=clock)
+        cache.session("s1").set_maps(["m"])
+        cache.session("s1").set_map_graph(1, "g")
+        assert cache.has_session("s1")
+
+        clock.now += 11
+        cache.purge_expired()
+
+        assert expired == ["s1"]
+        assert not cache.has_session("s1")
+        assert cache.stats()["sessions"] == 0
+
+    def test_memory_bound_evicts_other_sessions(self, clock):
+        """Лимит объёма общий для всех сессий."""
+        cache = SessionCache(max_bytes=25, ttl=100, clock=clock)
+        cache.session("s1").set_maps("x" * 10)
+        cache.session("s2").set_maps("x" * 10)
+        cache.session("s3").set_maps("x" * 10)
+        assert cache.session("s1").get_maps() is None
+        assert cache.stats()["evictions"] == 1
@@ -1,5 +1,7 @@
 """Unit-тесты для сервиса кейсов OKR-анализа."""
 
+import asyncio
+import os
 import pytest
 from unittest.mock import patch, AsyncMock
 from src.services.json_parser import parse_goals_map
@@ -157,3 +159,75 @@ class TestRunCaseV2:
         """Несуществующий кейс v2 выбрасывает ValueError."""
         with pytest.raises(ValueError, match="не существует"):
             await cases_service.run_case_v2(0, None, None)
+
+
+class TestRunCaseMapReduce:
+    """Тесты run_case_map_reduce."""
+
+    async def test_only_cases_5_and_7(self):
+        """Map-reduce доступен только для кейсов по всей карте."""
+        with pytest.raises(ValueError, match="не выполняется по частям"):
+            await cases_service.run_case_map_reduce(1, ["часть"], 1000)
+
+    async def test_partials_reduced_into_streamed_answer(self):
+        """Каждая часть анализируется отдельно, итоговый ответ собирается из промежуточных итогов."""
+        streamed = []
+
+        async def mock_stream(messages, model=None):
+            streamed.append(messages)
+            yield "Итоговый "
+            yield "отчёт"
+
+        completion = AsyncMock(side_effect=lambda messages: f"итог: {messages[1]['content'][-7:]}")
+        with patch("src.services.llm_service.get_completion", completion), \
+                patch("src.services.llm_service.stream_completion", side_effect=mock_stream):
+            gen = await cases_service.run_case_map_reduce(7, ["часть-1", "часть-2", "часть-3"], 100000)
+            chunks = [chunk async for chunk in gen]
+
+        progress = [chunk for chunk in chunks if isinstance(chunk, cases_service.Progress)]
+        assert progress == [(1, 3), (2, 3), (3, 3)]
+        assert chunks[:3] == progress
+        assert "".join(chunk for chunk in chunks if isinstance(chunk, str)) == "Итоговый отчёт"
+        assert completion.await_count == 3
+        assert "часть 2 из 3" in completion.await_args_list[1].args[0][1]["content"]
+        reduce_prompt = streamed[0][1]["content"]
+        assert "итог: часть-1" in reduce_prompt and "итог: часть-3" in reduce_prompt
+        assert "Топ-3 цели с наибольшим отставанием" in reduce_prompt
+
+    async def test_partials_merged_when_over_budget(self):
+        """Промежуточные итоги, не помещающиеся в лимит, объединяются группами."""
+        async def mock_stream(messages, model=None):
+            yield "OK"
+
+        completion = AsyncMock(return_value="x" * 400)
+        with patch("src.services.llm_service.get_completion", completion), \
+                patch("src.services.llm_service.stream_completion", side_effect=mock_stream), \
+                patch.object(cases_service, "estimate_tokens", side_effect=lambda text, model="gpt-4o": len(text) // 4), \
+                patch("src.services.context_builder.estimate_tokens", side_effect=lambda text, model="gpt-4o": len(text) // 4):
+            gen = await cases_service.run_case_map_reduce(5, ["a", "b", "c", "d"], 250)
+            assert [chunk async for chunk in gen if isinstance(chunk, str)] == ["OK"]
+
+        # 4 запроса по частям + 2 объединения пар итогов
+        assert completion.await_count == 6
+        assert "Объедини промежуточные итоги" in completion.await_args_list[4].args[0][1]["content"]
+
+    async def test_failed_partial_cancels_others(self):
+        """Ошибка запроса по одной части отменяет остальные запросы."""
+        cancelled = []
+
+        async def completion(messages):
+            if "часть 1 из 3" in messages[1]["content"]:
+                raise RuntimeError("Ошибка LLM")
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(messages[1]["content"][-7:])
+                raise
+
+        with patch("src.services.llm_service.get_completion", side_effect=completion), \
+                patch.dict(os.environ, {"MAP_REDUCE_CONCURRENCY": "3"}):
+            gen = await cases_service.run_case_map_reduce(7, ["часть-1", "часть-2", "часть-3"], 100000)
+            with pytest.raises(RuntimeError, match="Ошибка LLM"):
+                [chunk async for chunk in gen]
+
+        assert sorted(cancelled) == ["часть-2", "часть-3"]
@@ -102,3 +102,29 @@ class TestGetTargetsToken:
         """Возвращает None если переменная не установлена."""
         with patch.dict(os.environ, {}, clear=True):
             assert config.get_targets_token() is None
+
+
+class TestGetMapContextMaxTokens:
+    """Тесты для get_model_context_window() и get_map_context_max_tokens()."""
+
+    def test_window_by_model_prefix(self):
+        """Окно ищется по самому длинному префиксу имени модели."""
+        with patch.dict(os.environ, {}, clear=True):
+            assert config.get_model_context_window("gpt-4o-2024-08-06") == 128000
+            assert config.get_model_context_window("gpt-4-0613") == 8192
+            assert config.get_model_context_window("unknown-model") == 128000
+
+    def test_window_override(self):
+        """LLM_CONTEXT_WINDOW переопределяет таблицу."""
+        with patch.dict(os.environ, {"LLM_CONTEXT_WINDOW": "32000"}, clear=True):
+            assert config.get_model_context_window("gpt-4") == 32000
+
+    def test_map_limit_defaults_to_window_minus_reserve(self):
+        """По умолчанию лимит карты — окно модели минус резерв."""
+        with patch.dict(os.environ, {"LLM_RESERVE_TOKENS": "1000"}, clear=True):
+            assert config.get_map_context_max_tokens("gpt-4") == 7192
+
+    def test_map_limit_from_env(self):
+        """MAP_CONTEXT_MAX_TOKENS задаёт лимит явно."""
+        with patch.dict(os.environ, {"MAP_CONTEXT_MAX_TOKENS": "5000"}, clear=True):
+            assert config.get_map_context_max_tokens("gpt-4o") == 5000
@@ -1,9 +1,12 @@
 """Тесты для сервиса построения контекста (context_builder)."""
 
 import pytest
+from unittest.mock import patch
+
 from src.services import context_builder
+from src.models.goal_graph import GoalGraph
 from src.models.targets import (
-    GoalNode, TargetsMap, TargetDetail, KeyResult,
+    GoalNode, MapGraph, TargetsMap, TargetDetail, KeyResult,
     ResponsiblePerson, StructuralUnitInfo, PeriodInfo, GoalStatus
 )
 
@@ -21,6 +24,9 @@ def sample_map_info():
     )
 
 
+MAP_INFO = TargetsMap(Id=1, Name="Тестовая карта целей", PeriodLabel="2026", AchievementPercentage=45.5)
+
+
 @pytest.fixture
 def sample_nodes():
     """Пример списка узлов целей."""
@@ -153,6 +159,112 @@ class TestBuildMapContext:
         assert "КР: 2" in result
 
 
+def _budget_graph() -> GoalGraph:
+    """Граф: корень → две ветви, у ветви B — лист High и лист Low с отчётом, у ветви C — внук."""
+    report = {"Description": "Подробный отчёт " * 20, "ReportDate": "2026-03-01"}
+    return GoalGraph.from_map_graph(MapGraph(Nodes=[
+        {"TargetId": 1, "Code": "A", "Name": "Корень", "ChildIds": ["2", "5"], "Priority": "High"},
+        {"TargetId": 2, "Code": "B", "Name": "Ветвь", "ParentId": "1", "ChildIds": ["3", "4"], "Priority": "High"},
+        {"TargetId": 3, "Code": "B1", "Name": "Лист важный", "ParentId": "2", "Priority": "High", "Progress": 80.0},
+        {"TargetId": 4, "Code": "B2", "Name": "Лист неважный", "ParentId": "2", "Priority": "Low", "Progress": 20.0,
+         "Status": {"Name": "В работе", "LastAchievementStatus": report}},
+        {"TargetId": 5, "Code": "C", "Name": "Ветвь 2", "ParentId": "1", "ChildIds": ["6"], "Priority": "High"},
+        {"TargetId": 6, "Code": "C1", "Name": "Подветвь", "ParentId": "5", "ChildIds": ["7"], "Priority": "High"},
+        {"TargetId": 7, "Code": "C11", "Name": "Внук", "ParentId": "6", "Priority": "High", "Progress": 40.0},
+    ]))
+
+
+def _fake_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Оценка токенов без tiktoken: один токен на четыре символа."""
+    return len(text) // 4
+
+
+def _counted(pruning) -> int:
+    """Число токенов варианта контекста по строкам (как считает build_map_context_budgeted)."""
+    _, tokens = context_builder._render_map_lines(
+        _budget_graph(), MAP_INFO, pruning, context_builder.TokenCounter(),
+    )
+    return tokens
+
+
+@patch.object(context_builder, "estimate_tokens", side_effect=_fake_tokens)
+class TestBuildMapContextBudgeted:
+    """Тесты для функции build_map_context_budgeted."""
+
+    def _budgeted(self, max_tokens: int) -> context_builder.RenderedContext:
+        return context_builder.build_map_context_budgeted(_budget_graph(), MAP_INFO, max_tokens)
+
+    def test_full_context_when_fits(self, _):
+        """В лимит помещается полный контекст — он не сокращается."""
+        graph = _budget_graph()
+        full = context_builder.build_map_context(graph, MAP_INFO)
+        assert context_builder.build_map_context_budgeted(graph, MAP_INFO, 100000).text == full
+
+    def test_drops_reports_first(self, _):
+        """Первым шагом убираются тексты отчётов, цели остаются."""
+        full_tokens = _counted(context_builder._Pruning())
+        context = self._budgeted(full_tokens - 10)
+        assert "Отчёт (" not in context.text
+        assert "[B2] Лист неважный" in context.text
+        assert "без текстов отчётов" in context.text
+        assert context.tokens() <= full_tokens - 10
+
+    def test_collapses_low_priority_leaves(self, _):
+        """Листья низкого приоритета сворачиваются в итог у родителя."""
+        context = self._budgeted(_counted(context_builder._Pruning(reports=False)) - 10)
+        assert "[B2]" not in context.text
+        assert "[B1] Лист важный" in context.text
+        assert "Свёрнуто подцелей: 1 | Средний прогресс: 20.0% | Статусы: В работе: 1" in context.text
+
+    def test_summarizes_deep_subtrees_keeping_hierarchy(self, _):
+        """Глубокие поддеревья сводятся в итоги, верхние уровни иерархии сохраняются."""
+        context = self._budgeted(_counted(context_builder._Pruning(reports=False, leaf_rank=1, depth_cap=2)))
+        assert "[C11]" not in context.text
+        assert "[A] Корень" in context.text
+        assert "[C1] Подветвь" in context.text
+        assert "  Дочерние: B, C" in context.text
+        assert "Свёрнуто подцелей: 1 | Средний прогресс: 40.0%" in context.text
+
+    def test_tiny_budget_still_returns_context(self, _):
+        """Даже при минимальном лимите возвращается заголовок и число непоказанных целей."""
+        context = self._budgeted(1)
+        assert "Карта целей: Тестовая карта целей" in context.text
+        assert "Не показано корневых поддеревьев: 1 (целей: 7)" in context.text
+
+    def test_lines_encoded_once(self, estimate):
+        """Строки, общие для вариантов сокращения, кодируются один раз."""
+        self._budgeted(1)
+        encoded = [call.args[0] for call in estimate.call_args_list]
+        assert len(encoded) == len(set(encoded))
+
+
+@patch.object(context_builder, "estimate_tokens", side_effect=_fake_tokens)
+class TestPartitionMap:
+    """Тесты для функции partition_map."""
+
+    def test_single_part_when_fits(self, _):
+        """Карта, помещающаяся в лимит, — одна часть с полным контекстом."""
+        graph = _budget_graph()
+        assert context_builder.partition_map(graph, MAP_INFO, 100000) == [
+            context_builder.build_map_context(graph, MAP_INFO)
+        ]
+
+    def test_parts_fit_and_cover_all_goals(self, _):
+        """Каждая часть помещается в лимит, каждая цель попадает ровно в одну часть."""
+        parts = context_builder.partition_map(_budget_graph(), MAP_INFO, 200)
+        assert len(parts) > 1
+        assert all(_fake_tokens(part) <= 200 for part in parts)
+        for code in ("A", "B", "B1", "B2", "C", "C1", "C11"):
+            assert sum(part.count(f"\n[{code}] ") for part in parts) == 1
+        assert f"Часть 1 из {len(parts)}" in parts[0]
+
+    def test_split_subtree_keeps_path(self, _):
+        """Часть, начинающаяся не с корня, содержит путь от корня."""
+        parts = context_builder.partition_map(_budget_graph(), MAP_INFO, 200)
+        part = next(part for part in parts if "[C] Ветвь 2" in part)
+        assert "Путь от корня: [A] Корень" in part
+
+
 class TestBuildTargetContext:
     """Тесты для функции build_target_context."""
 
@@ -189,6 +301,20 @@ class TestBuildTargetContext:
 class TestEstimateTokens:
     """Тесты для функции estimate_tokens."""
 
+    def test_encoding_loaded_once_per_model(self):
+        """Кодировка модели загружается один раз и переиспользуется."""
+        context_builder._encodings.pop("gpt-test", None)
+        with patch.object(context_builder.tiktoken, "get_encoding") as get_encoding:
+            context_builder.get_encoding("gpt-test")
+            context_builder.get_encoding("gpt-test")
+        assert get_encoding.call_count == 1
+        context_builder._encodings.pop("gpt-test", None)
+
+    def test_approximate_count_without_bpe(self):
+        """Без словаря BPE (нет сети и кэша) токены оцениваются по размеру текста."""
+        with patch.dict(context_builder._encodings, {"offline-model": None}):
+            assert context_builder.estimate_tokens("abcdef", model="offline-model") == 2
+
     def test_estimates_tokens_for_simple_text(self):
         """Оценивает количество токенов для простого текста."""
         text = "Это простой текст на русском языке"
@@ -0,0 +1,131 @@
+"""Unit-тесты для кэша готовых контекстов карт."""
+
+import pytest
+from unittest.mock import patch
+
+from src.models.goal_graph import GoalGraph
+from src.models.targets import KeyResult, MapGraph, TargetDetail, TargetsMap
+from src.services import context_builder, context_cache
+
+
+MAP_INFO = TargetsMap(Id=5, Name="Карта", PeriodLabel="2026", AchievementPercentage=40.0)
+
+
+def _graph(progress: float = 10.0) -> GoalGraph:
+    """Граф из двух узлов с заданным прогрессом корня."""
+    return GoalGraph.from_map_graph(MapGraph(Nodes=[
+        {"TargetId": 1, "Code": "T-1", "Name": "Корень", "ChildIds": ["2"], "Progress": progress},
+        {"TargetId": 2, "Code": "T-2", "Name": "Лист", "ParentId": "1"},
+    ]))
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache():
+    """Сбрасывает кэш контекстов до и после теста."""
+    context_cache.clear()
+    yield
+    context_cache.clear()
+
+
+class TestMapContextCache:
+    """Тесты get_map_context и invalidate_map."""
+
+    def test_rendered_once_per_graph_version(self):
+        """Повторные обращения и граф с тем же содержимым не перерисовывают контекст."""
+        with patch.object(context_cache, "build_map_context", wraps=context_builder.build_map_context) as build:
+            first = context_cache.get_map_context(5, _graph(), MAP_INFO)
+            second = context_cache.get_map_context(5, _graph(), MAP_INFO)
+        assert second is first
+        assert build.call_count == 1
+        assert "[T-1] Корень" in first.text
+        assert context_cache.stats()["hits"] == 1
+
+    def test_new_graph_version_replaces_old_entry(self):
+        """Изменённый граф получает новый контекст, а контекст прежней версии удаляется."""
+        old = context_cache.get_map_context(5, _graph(10.0), MAP_INFO)
+        new = context_cache.get_map_context(5, _graph(90.0), MAP_INFO)
+        assert "Прогресс: 90.0%" in new.text
+        assert new is not old
+        assert context_cache.stats()["entries"] == 1
+
+    def test_invalidate_map(self):
+        """invalidate_map удаляет контексты карты, кроме сохраняемой версии."""
+        graph = _graph()
+        context_cache.get_map_context(5, graph, MAP_INFO)
+        context_cache.invalidate_map(5, keep_version=graph.version)
+        assert context_cache.stats()["entries"] == 1
+        context_cache.invalidate_map(5)
+        assert context_cache.stats()["entries"] == 0
+
+    def test_token_count_memoized(self):
+        """Число токенов считается один раз на модель."""
+        context = context_cache.get_map_context(5, _graph(), MAP_INFO)
+        with patch.object(context_builder, "estimate_tokens", return_value=42) as estimate:
+            assert context.tokens("gpt-4o") == 42
+            assert context.tokens("gpt-4o") == 42
+        assert estimate.call_count == 1
+
+
+def _target_data(progress: float = 50.0) -> dict:
+    """Данные цели в формате кэша сессии."""
+    return {
+        "detail": TargetDetail(Id=7, Name="Цель", Code="T-7", AchievementPercentage=progress),
+        "key_results": [KeyResult(Description="Выручка", AchievementPercentage="30")],
+    }
+
+
+class TestTargetContextCache:
+    """Тесты get_target_context."""
+
+    def test_rendered_once_per_target_version(self):
+        """Контекст цели отрисовывается один раз на версию данных и хранится в кэше контекстов."""
+        target_data = _target_data()
+        with patch.object(context_cache, "build_target_context", wraps=context_builder.build_target_context) as build:
+            first = context_cache.get_target_context(7, target_data)
+            second = context_cache.get_target_context(7, _target_data())
+        assert second is first
+        assert build.call_count == 1
+        assert "Цель: [T-7] Цель" in first.text
+        assert set(target_data) == {"detail", "key_results"}
+        assert context_cache.stats()["targets"] == {"hits": 1, "misses": 1}
+        assert context_cache.stats()["bytes"] > len(first.text)
+
+    def test_refetched_target_replaces_old_context(self):
+        """Изменённые данные цели получают новый контекст, а контекст прежней версии удаляется."""
+        old = context_cache.get_target_context(7, _target_data(50.0))
+        new = context_cache.get_target_context(7, _target_data(80.0))
+        assert new is not old
+        assert "Прогресс: 80.0%" in new.text
+        assert context_cache.stats()["entries"] == 1
+
+    def test_target_and_map_with_same_id_are_independent(self):
+        """Контексты цели и карты с одинаковым ID не вытесняют друг друга."""
+        context_cache.get_target_context(5, _target_data())
+        context_cache.get_map_context(5, _graph(), MAP_INFO)
+        context_cache.invalidate_map(5)
+        assert context_cache.stats()["entries"] == 1
+
+    def test_version_depends_on_key_results(self):
+        """Версия данных цели меняется при изменении КР."""
+        data = _target_data()
+        changed = _target_data()
+        changed["key_results"][0].ActualValue = "100"
+        assert context_cache.target_version(data["detail"], data["key_results"]) != context_cache.target_version(
+            changed["detail"], changed["key_results"]
+        )
+
+
+class TestBudgetedMapContext:
+    """Тесты get_map_context с лимитом токенов."""
+
+    def test_budget_is_part_of_key(self):
+        """Контексты с разными лимитами кэшируются отдельно, полный — без сокращений."""
+        graph = _graph()
+        with patch.object(context_cache, "build_map_context_budgeted",
+                          wraps=context_builder.build_map_context_budgeted) as build:
+            budgeted = context_cache.get_map_context(5, graph, MAP_INFO, max_tokens=100000)
+            context_cache.get_map_context(5, graph, MAP_INFO, max_tokens=100000)
+        full = context_cache.get_map_context(5, graph, MAP_INFO)
+        assert build.call_count == 1
+        assert budgeted.text == full.text
+        assert context_cache.stats()["entries"] == 2
@@ -0,0 +1,104 @@
+"""Unit-тесты для колоночного графа целей GoalGraph."""
+
+import pytest
+
+from src.models.goal_graph import GoalGraph
+from src.models.targets import MapGraph
+from src.services.cache import estimate_size
+
+
+def _node(target_id: int, parent_id: str | None = None, child_ids: list | None = None, **extra) -> dict:
+    """Сырой узел GetTargetsMap с общими ответственным, подразделением и периодом."""
+    return {
+        "TargetId": target_id,
+        "Code": f"T-{target_id}",
+        "Name": f"Цель {target_id}",
+        "ParentId": parent_id,
+        "ChildIds": child_ids or [],
+        "Priority": "High",
+        "Progress": 12.5,
+        "KeyResultCount": 2,
+        "Status": {"State": "Active", "Name": "В работе", "Icon": "▶"},
+        "Responsible": {"Id": 1, "Name": "Иванов И.И."},
+        "StructuralUnit": {"Id": 2, "Name": "Отдел разработки"},
+        "Period": {"Name": "I квартал 2026"},
+        **extra,
+    }
+
+
+@pytest.fixture
+def graph() -> GoalGraph:
+    """Граф: корень 1 с детьми 2 и 3 (ссылка на 99 вне карты отбрасывается)."""
+    raw = {
+        "Nodes": [
+            _node(1, child_ids=["2", 3, "99"]),
+            _node(2, parent_id="1", Status={
+                "Name": "Выполнена", "LastAchievementStatus": {"Description": "Готово", "ReportDate": "2026-03-01"},
+            }),
+            _node(3, parent_id="1", Responsible=None, Period=None),
+        ],
+        "Map": {"Id": 5, "Name": "Карта"},
+    }
+    return GoalGraph.from_map_graph(MapGraph(**raw))
+
+
+class TestGoalGraph:
+    """Тесты построения и чтения GoalGraph."""
+
+    def test_columns(self, graph):
+        """Значения узлов читаются из столбцов в исходном порядке."""
+        assert len(graph) == 3
+        assert list(graph.target_ids) == [1, 2, 3]
+        assert [n.code for n in graph] == ["T-1", "T-2", "T-3"]
+        node = graph[1]
+        assert (node.name, node.progress, node.key_result_count, node.priority) == ("Цель 2", 12.5, 2, "High")
+        assert (node.status_name, node.status_icon) == ("Выполнена", None)
+        assert graph.map_info.Name == "Карта"
+
+    def test_links_resolved_to_indexes(self, graph):
+        """Родитель и дети хранятся индексами; ссылки на узлы вне карты отбрасываются."""
+        assert [c.code for c in graph[0].children] == ["T-2", "T-3"]
+        assert graph[0].parent_index == -1
+        assert graph[2].parent_index == 0
+        assert graph.index_of(3) == graph.index_of("3") == 2
+        assert graph.index_of(99) is None
+        assert [graph[i].depth for i in range(3)] == [0, 1, 1]
+        assert list(graph.index.subtree(0)) == [0, 1, 2]
+
+    def test_missing_nested_values(self, graph):
+        """Отсутствующие вложенные объекты дают None."""
+        assert graph[2].responsible_name is None
+        assert graph[2].period_name is None
+        assert graph[2].unit_name == "Отдел разработки"
+
+    def test_repeated_strings_interned(self, graph):
+        """Повторяющиеся строки хранятся в таблице графа один раз."""
+        assert len(set(graph.responsible)) == 2  # «Иванов И.И.» и отсутствующее значение
+        assert graph.responsible[0] == graph.responsible[1]
+        assert graph._strings.count("Отдел разработки") == 1
+
+    def test_reports(self, graph):
+        """Сохраняются только отчёты с описанием."""
+        assert graph[1].report == ("2026-03-01", "Готово")
+        assert graph[0].report is None
+
+    def test_size_is_smaller_than_models(self):
+        """Колоночный граф занимает меньше, чем JSON узлов pydantic-моделей."""
+        nodes = [_node(i, parent_id=str(i // 2) if i else None) for i in range(500)]
+        model = MapGraph(Nodes=nodes)
+        compact = GoalGraph.from_map_graph(model)
+        assert estimate_size(compact) == compact.nbytes
+        assert compact.nbytes < estimate_size(model)
+
+    def test_version_tracks_content(self, graph):
+        """Хэш версии одинаков для одинаковых данных и меняется при их изменении."""
+        raw = {"Nodes": [_node(1), _node(2, parent_id="1")]}
+        same = GoalGraph.from_map_graph(MapGraph(**raw))
+        assert same.version == GoalGraph.from_map_graph(MapGraph(**raw)).version
+        raw["Nodes"][1]["Progress"] = 99.0
+        assert same.version != GoalGraph.from_map_graph(MapGraph(**raw)).version
+
+    def test_index_out_of_range(self, graph):
+        """Обращение за пределы графа вызывает IndexError."""
+        with pytest.raises(IndexError):
+            graph[3]
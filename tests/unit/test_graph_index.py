@@ -0,0 +1,54 @@
+"""Unit-тесты для индекса смежности графа целей."""
+
+from src.models.graph_index import GraphIndex
+
+
+def _index(edges: dict, order: list | None = None) -> GraphIndex:
+    """Строит индекс по {id: parent_id}; дети — в порядке перечисления узлов."""
+    ids = order or list(edges)
+    children = {node_id: [] for node_id in ids}
+    for node_id in ids:
+        if edges[node_id] in children:
+            children[edges[node_id]].append(node_id)
+    return GraphIndex(ids, [edges[i] for i in ids], [children[i] for i in ids])
+
+
+class TestGraphIndex:
+    """Тесты GraphIndex."""
+
+    def test_links_and_roots(self):
+        """Родители и дети разрешаются в позиции, ссылки вне графа отбрасываются."""
+        index = GraphIndex(["1", "2", "3"], [None, "1", "77"], [["2", "99"], [], []])
+        assert list(index.children(0)) == [1]
+        assert list(index.parent) == [-1, 0, -1]
+        assert list(index.roots) == [0, 2]
+        assert index.index_of(2) == index.index_of("2") == 1
+        assert index.index_of("99") is None
+
+    def test_subtree_ranges_and_depth(self):
+        """Поддерево узла — непрерывный диапазон обхода, глубина считается от корня."""
+        index = _index({"a": None, "b": "a", "c": "b", "d": "a", "e": None})
+        pos = {name: index.index_of(name) for name in "abcde"}
+        names = {v: k for k, v in pos.items()}
+
+        assert [names[i] for i in index.subtree(pos["a"])] == ["a", "b", "c", "d"]
+        assert [names[i] for i in index.subtree(pos["b"])] == ["b", "c"]
+        assert [names[i] for i in index.subtree(pos["e"])] == ["e"]
+        assert [index.depth[pos[n]] for n in "abcde"] == [0, 1, 2, 1, 0]
+        assert [names[i] for i in index.ancestors(pos["c"])] == ["b", "a"]
+
+    def test_cycle_nodes_visited_once(self):
+        """Узлы цикла без корня попадают в обход ровно один раз."""
+        index = GraphIndex(["1", "2"], ["2", "1"], [["2"], ["1"]])
+        assert list(index.roots) == []
+        assert sorted(index.order) == [0, 1]
+        assert list(index.subtree(0)) == [0, 1]
+        assert index.ancestors(0) == [1]
+
+    def test_deep_chain_without_recursion(self):
+        """Глубокая цепочка обходится без переполнения стека."""
+        count = 5000
+        ids = [str(i) for i in range(count)]
+        index = GraphIndex(ids, [None] + ids[:-1], [[ids[i + 1]] if i + 1 < count else [] for i in range(count)])
+        assert index.depth[count - 1] == count - 1
+        assert len(index.subtree(0)) == count
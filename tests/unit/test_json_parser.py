@@ -113,6 +113,16 @@ class TestFormatMapForLlm:
         assert "ВЫБРАННАЯ ЦЕЛЬ" not in text
 
 
+    def test_goal_with_missing_parent_is_not_a_root(self, sample_json_text):
+        """Цель, родителя которой нет в карте, не выводится как корень (корни — цели без ParentId)."""
+        goals_map = parse_goals_map(sample_json_text)
+        get_goal_by_id(goals_map, "1").child_ids.clear()
+        get_goal_by_id(goals_map, "2").parent_id = "999"
+        text = format_map_for_llm(goals_map)
+        assert "U-26.4.1" in text
+        assert "U-1Q26.1-1" not in text
+
+
 class TestGetGoalById:
     """Тесты функции get_goal_by_id."""
 
@@ -128,3 +138,33 @@ class TestGetGoalById:
         goals_map = parse_goals_map(sample_json_text)
         goal = get_goal_by_id(goals_map, "999")
         assert goal is None
+
+    def test_index_built_once(self, sample_json_text):
+        """Индекс карты строится при первом поиске и переиспользуется."""
+        goals_map = parse_goals_map(sample_json_text)
+        get_goal_by_id(goals_map, "1")
+        index = goals_map.index
+        format_map_for_llm(goals_map)
+        get_goal_by_id(goals_map, "2")
+        assert goals_map.index is index
+
+    def test_index_follows_node_replaced_in_place(self, sample_json_text):
+        """Замена узла по индексу списка перестраивает индекс, хотя число узлов не изменилось."""
+        goals_map = parse_goals_map(sample_json_text)
+        goal = get_goal_by_id(goals_map, "1")
+        renamed = goal.model_copy(update={"id": "100"})
+        goals_map.nodes[goals_map.nodes.index(goal)] = renamed
+
+        assert get_goal_by_id(goals_map, "100") is renamed
+        assert get_goal_by_id(goals_map, "1") is None
+
+    def test_index_follows_edited_links(self, sample_json_text):
+        """Правка связей узла на месте отражается в индексе и в тексте карты."""
+        goals_map = parse_goals_map(sample_json_text)
+        get_goal_by_id(goals_map, "1").child_ids.clear()
+        get_goal_by_id(goals_map, "2").parent_id = None
+
+        text = format_map_for_llm(goals_map)
+        assert list(goals_map.index.children(0)) == []
+        assert "- **U-1Q26.1-1**" not in text
+        assert "\n**U-1Q26.1-1**" in text
@@ -0,0 +1,69 @@
+"""Unit-тесты для потокового разбора JSON."""
+
+import json
+import pytest
+
+from src.services import json_stream
+
+
+async def _chunks(data: bytes, size: int):
+    """Отдаёт данные фрагментами фиксированного размера."""
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+
+class TestParseObject:
+    """Тесты parse_object."""
+
+    @pytest.mark.parametrize("size", [1, 3, 7, 1024])
+    async def test_matches_json_loads_for_any_chunking(self, size):
+        """Результат не зависит от того, как поток разбит на фрагменты."""
+        doc = {
+            "Nodes": [{"TargetId": i, "Name": f"Цель «{i}»", "Progress": 12.5} for i in range(20)],
+            "Map": {"Id": 123, "Name": "Карта"},
+            "Count": 12345,
+            "Flag": True,
+            "Empty": None,
+        }
+        data = json.dumps(doc, ensure_ascii=False, indent=1).encode("utf-8")
+        result = await json_stream.parse_object(_chunks(data, size), {})
+        assert result == doc
+
+    async def test_array_items_parsed_one_by_one(self):
+        """Элементы выбранного массива передаются в парсер по одному."""
+        seen = []
+
+        def parse(item):
+            seen.append(item)
+            return item["id"] * 10
+
+        data = b'{"Map": {"Id": 1}, "Nodes": [{"id": 1}, {"id": 2}, {"id": 3}]}'
+        result = await json_stream.parse_object(_chunks(data, 5), {"Nodes": parse})
+        assert result == {"Map": {"Id": 1}, "Nodes": [10, 20, 30]}
+        assert seen == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+    async def test_empty_array_and_non_array_value(self):
+        """Пустой массив и значение-не-массив для ключа с парсером разбираются без вызова парсера."""
+        data = b'{"Nodes": [], "Other": null}'
+        result = await json_stream.parse_object(_chunks(data, 2), {"Nodes": int, "Other": int})
+        assert result == {"Nodes": [], "Other": None}
+
+    @pytest.mark.parametrize("data", [
+        b"[1, 2]",
+        b'{"Nodes": [1, 2}',
+        b'{"Nodes": [1, 2]',
+        b'{"a": 1} trailing',
+        b"",
+    ])
+    async def test_invalid_json(self, data):
+        """Невалидный или обрезанный поток вызывает ValueError."""
+        with pytest.raises(ValueError):
+            await json_stream.parse_object(_chunks(data, 3), {"Nodes": int})
+
+    async def test_parser_error_propagates(self):
+        """Исключение парсера элемента пробрасывается как есть."""
+        def parse(item):
+            raise KeyError(item)
+
+        with pytest.raises(KeyError):
+            await json_stream.parse_object(_chunks(b'{"Nodes": [1]}', 4), {"Nodes": parse})
@@ -0,0 +1,102 @@
+"""Unit-тесты для предварительной проверки размера запросов в llm_service."""
+
+import pytest
+from unittest.mock import patch
+
+from src.services import llm_service
+
+
+def _fake_tokens(text: str, model: str = "gpt-4o") -> int:
+    """Оценка токенов без tiktoken: один токен на символ."""
+    return len(text)
+
+
+@pytest.fixture(autouse=True)
+def small_window(monkeypatch):
+    """Окно модели 1000 токенов, 100 из них — на ответ; счётчики проверки сбрасываются."""
+    monkeypatch.setenv("LLM_CONTEXT_WINDOW", "1000")
+    monkeypatch.setenv("LLM_RESPONSE_TOKENS", "100")
+    monkeypatch.setattr(llm_service, "_preflight_stats", {"fits": 0, "pruned": 0, "rejected": 0})
+    with patch.object(llm_service, "estimate_tokens", side_effect=_fake_tokens):
+        yield
+
+
+class TestPreflight:
+    """Тесты preflight и preflight_stats."""
+
+    def test_small_request_passes_unchanged(self):
+        """Запрос, помещающийся в окно, передаётся без изменений."""
+        messages = [{"role": "system", "content": "s"}, {"role": "user", "content": "u"}]
+        assert llm_service.preflight(messages) is messages
+        assert llm_service.preflight_stats()["fits"] == 1
+
+    def test_oversized_request_rejected(self):
+        """Запрос больше окна отклоняется до отправки."""
+        messages = [{"role": "system", "content": "ы" * 950}]
+        with pytest.raises(ValueError, match="слишком большой"):
+            llm_service.preflight(messages)
+        assert llm_service.preflight_stats()["rejected"] == 1
+
+    def test_history_pruned_from_oldest(self):
+        """Для чата удаляются самые старые сообщения истории, системное и последнее остаются."""
+        messages = [
+            {"role": "system", "content": "s" * 300},
+            {"role": "user", "content": "old" * 100},
+            {"role": "assistant", "content": "a" * 300},
+            {"role": "user", "content": "new" * 50},
+        ]
+        pruned = llm_service.preflight(messages, prune_history=True)
+        assert pruned == [messages[0], messages[2], messages[3]]
+        assert llm_service.preflight_stats() == {"fits": 0, "pruned": 1, "rejected": 0}
+
+    def test_rejected_when_last_message_does_not_fit(self):
+        """Если не помещается даже последнее сообщение, запрос отклоняется."""
+        messages = [{"role": "system", "content": "s" * 500}, {"role": "user", "content": "u" * 500}]
+        with pytest.raises(ValueError):
+            llm_service.preflight(messages, prune_history=True)
+        assert llm_service.preflight_stats()["rejected"] == 1
+
+    def test_count_includes_message_overhead(self):
+        """Подсчёт учитывает служебные токены каждого сообщения и ответа."""
+        messages = [{"role": "system", "content": "abc"}, {"role": "user", "content": "de"}]
+        assert llm_service.count_message_tokens(messages) == 5 + 2 * 4 + 3
+
+
+class TestClientPool:
+    """Тесты общего клиента OpenAI."""
+
+    @pytest.fixture(autouse=True)
+    async def clean_clients(self):
+        """Закрывает клиенты, созданные тестом."""
+        await llm_service.shutdown()
+        yield
+        await llm_service.shutdown()
+
+    async def test_client_reused(self, monkeypatch):
+        """Повторные обращения получают один и тот же клиент."""
+        monkeypatch.setenv("OPENAI_SERVER", "https://llm.example.com/v1")
+        assert llm_service.get_client() is llm_service.get_client()
+
+    async def test_client_per_endpoint(self, monkeypatch):
+        """Для другого endpoint'а создаётся отдельный клиент."""
+        monkeypatch.setenv("OPENAI_SERVER", "https://a.example.com/v1")
+        first = llm_service.get_client()
+        monkeypatch.setenv("OPENAI_SERVER", "https://b.example.com/v1")
+        second = llm_service.get_client()
+        assert first is not second
+        assert str(second.base_url).startswith("https://b.example.com")
+
+    async def test_pool_settings_from_env(self, monkeypatch):
+        """Таймауты и повторы клиента берутся из настроек."""
+        monkeypatch.setenv("OPENAI_TIMEOUT", "42")
+        monkeypatch.setenv("OPENAI_MAX_RETRIES", "5")
+        client = llm_service.get_client()
+        assert client.timeout.read == 42
+        assert client.max_retries == 5
+
+    async def test_shutdown_closes_clients(self):
+        """shutdown закрывает клиенты, следующий запрос создаёт новый."""
+        client = llm_service.get_client()
+        await llm_service.shutdown()
+        assert client.is_closed()
+        assert llm_service.get_client() is not client
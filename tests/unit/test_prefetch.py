@@ -0,0 +1,124 @@
+"""Unit-тесты для фоновой предзагрузки целей."""
+
+import asyncio
+import pytest
+
+from src.services.prefetch import TargetPrefetcher
+
+
+async def _wait_idle(prefetcher: TargetPrefetcher) -> None:
+    """Ждёт завершения всех фоновых задач предзагрузки."""
+    for _ in range(100):
+        if prefetcher.get_stats()["active"] == 0:
+            return
+        await asyncio.sleep(0.005)
+
+
+class TestTargetPrefetcher:
+    """Тесты класса TargetPrefetcher."""
+
+    async def test_loads_all_unique_targets(self):
+        """Загружает каждую цель ровно один раз."""
+        loaded = []
+
+        async def load(target_id):
+            loaded.append(target_id)
+
+        prefetcher = TargetPrefetcher(concurrency=2)
+        prefetcher.schedule("s1", [1, 2, 2, 3], load)
+        await _wait_idle(prefetcher)
+
+        assert sorted(loaded) == [1, 2, 3]
+        assert prefetcher.get_stats()["prefetched"] == 3
+
+    async def test_concurrency_is_bounded(self):
+        """Число одновременных загрузок не превышает лимит."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def load(target_id):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.005)
+            in_flight -= 1
+
+        prefetcher = TargetPrefetcher(concurrency=3)
+        prefetcher.schedule("s1", range(20), load)
+        await _wait_idle(prefetcher)
+
+        assert max_in_flight == 3
+
+    async def test_max_targets_keeps_first(self):
+        """Загружаются только первые max_targets уникальных целей."""
+        loaded = []
+
+        async def load(target_id):
+            loaded.append(target_id)
+
+        prefetcher = TargetPrefetcher(concurrency=1, max_targets=3)
+        prefetcher.schedule("s1", [5, 5, 4, 3, 2, 1], load)
+        await _wait_idle(prefetcher)
+
+        assert loaded == [5, 4, 3]
+        assert prefetcher.get_stats()["scheduled"] == 3
+
+    async def test_failures_are_counted_and_skipped(self):
+        """Ошибка загрузки одной цели не останавливает остальные."""
+        async def load(target_id):
+            if target_id == 2:
+                raise RuntimeError("boom")
+
+        prefetcher = TargetPrefetcher(concurrency=1)
+        prefetcher.schedule("s1", [1, 2, 3], load)
+        await _wait_idle(prefetcher)
+
+        stats = prefetcher.get_stats()
+        assert stats["prefetched"] == 2
+        assert stats["failed"] == 1
+
+    async def test_cancel_stops_session_prefetch(self):
+        """Отмена сессии останавливает фоновую задачу."""
+        started = asyncio.Event()
+
+        async def load(target_id):
+            started.set()
+            await asyncio.sleep(10)
+
+        prefetcher = TargetPrefetcher(concurrency=1)
+        prefetcher.schedule("s1", [1, 2], load)
+        await started.wait()
+        prefetcher.cancel("s1")
+        await _wait_idle(prefetcher)
+
+        stats = prefetcher.get_stats()
+        assert stats["cancelled"] == 1
+        assert stats["active"] == 0
+
+    async def test_hits_and_misses(self):
+        """Открытие прогретой цели — hit, непрогретой — miss."""
+        async def load(target_id):
+            pass
+
+        prefetcher = TargetPrefetcher()
+        prefetcher.record_access("s1", 1)  # Сессия без предзагрузки не учитывается
+        prefetcher.schedule("s1", [1], load)
+        await _wait_idle(prefetcher)
+        prefetcher.record_access("s1", 1)
+        prefetcher.record_access("s1", 99)
+
+        stats = prefetcher.get_stats()
+        assert stats["hits"] == 1
+        assert stats["misses"] == 1
+
+    async def test_shutdown_cancels_everything(self):
+        """shutdown отменяет все активные задачи."""
+        async def load(target_id):
+            await asyncio.sleep(10)
+
+        prefetcher = TargetPrefetcher()
+        prefetcher.schedule("s1", [1], load)
+        prefetcher.schedule("s2", [2], load)
+        await prefetcher.shutdown()
+
+        assert prefetcher.get_stats()["active"] == 0
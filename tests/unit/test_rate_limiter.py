@@ -0,0 +1,104 @@
+"""Unit-тесты для лимитера частоты и параллельности запросов."""
+
+import asyncio
+import pytest
+
+from src.services.rate_limiter import RequestLimiter
+
+
+class TestConcurrency:
+    """Тесты ограничения числа одновременных запросов."""
+
+    async def test_caps_concurrent_requests(self):
+        """Одновременно выполняется не больше max_concurrent запросов."""
+        limiter = RequestLimiter(max_concurrent=2, rate=0, burst=1)
+        running = []
+        peak = []
+
+        async def request():
+            async with limiter.slot():
+                running.append(1)
+                peak.append(len(running))
+                await asyncio.sleep(0.01)
+                running.pop()
+
+        await asyncio.gather(*(request() for _ in range(6)))
+        assert max(peak) == 2
+        stats = limiter.stats()
+        assert stats["acquired"] == 6
+        assert stats["max_queued"] >= 4
+        assert stats["in_flight"] == 0
+        assert stats["max_wait_ms"] > 0
+
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        """Отмена ожидающего запроса не теряет и не занимает место."""
+        limiter = RequestLimiter(max_concurrent=1, rate=0, burst=1)
+        await limiter.acquire()
+        waiter = asyncio.create_task(limiter.acquire())
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        limiter.release()
+
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+        assert limiter.stats()["in_flight"] == 1
+        assert limiter.stats()["queued"] == 0
+
+
+class TestBackgroundPriority:
+    """Тесты низкого приоритета фоновых запросов."""
+
+    async def test_background_never_takes_last_slot(self):
+        """Фоновые запросы оставляют одно место свободным для обычных."""
+        limiter = RequestLimiter(max_concurrent=3, rate=0, burst=1)
+        await limiter.acquire(background=True)
+        await limiter.acquire(background=True)
+        third = asyncio.create_task(limiter.acquire(background=True))
+        await asyncio.sleep(0)
+        assert not third.done()
+
+        await asyncio.wait_for(limiter.acquire(), timeout=1)
+        assert limiter.stats()["in_flight"] == 3
+        third.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await third
+
+    async def test_waiting_requests_served_before_background(self):
+        """Освободившееся место достаётся ожидающему обычному запросу, а не фоновому."""
+        limiter = RequestLimiter(max_concurrent=2, rate=0, burst=1)
+        await limiter.acquire()
+        await limiter.acquire()
+        order = []
+
+        async def request(name, background):
+            await limiter.acquire(background=background)
+            order.append(name)
+
+        background = asyncio.create_task(request("background", True))
+        await asyncio.sleep(0)
+        interactive = asyncio.create_task(request("interactive", False))
+        await asyncio.sleep(0)
+
+        limiter.release()
+        await interactive
+        assert order == ["interactive"]
+        limiter.release()
+        limiter.release()
+        await asyncio.wait_for(background, timeout=1)
+        assert order == ["interactive", "background"]
+
+
+class TestRate:
+    """Тесты token bucket'а."""
+
+    async def test_burst_then_paced(self):
+        """После всплеска в burst запросов следующие выпускаются с частотой rate."""
+        limiter = RequestLimiter(max_concurrent=10, rate=50, burst=2)
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        for _ in range(4):
+            async with limiter.slot():
+                pass
+        # Два запроса сразу, ещё два — с интервалом 1/50 сек
+        assert loop.time() - started >= 0.035
@@ -0,0 +1,127 @@
+"""Unit-тесты для повторов и circuit breaker'а."""
+
+import pytest
+
+from src.services.resilience import (
+    CircuitBreaker, CircuitOpenError, backoff_delay, call_with_retry,
+)
+
+
+class FakeClock:
+    """Управляемые часы для проверки паузы breaker'а."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestCircuitBreaker:
+    """Тесты класса CircuitBreaker."""
+
+    def test_opens_after_threshold(self, clock):
+        """После порога ошибок подряд цепь размыкается и отклоняет вызовы."""
+        breaker = CircuitBreaker("t", failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+        with pytest.raises(CircuitOpenError) as exc:
+            breaker.before_call()
+        assert exc.value.retry_after == 10
+        assert breaker.snapshot()["rejected"] == 1
+
+    def test_success_resets_failure_count(self, clock):
+        """Успешный вызов обнуляет счётчик ошибок подряд."""
+        breaker = CircuitBreaker("t", failure_threshold=2, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        breaker.record_success()
+        breaker.record_failure()
+        assert breaker.state == "closed"
+
+    def test_half_open_allows_single_probe(self, clock):
+        """После паузы пропускается один пробный вызов; его успех замыкает цепь."""
+        breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=10, clock=clock)
+        breaker.record_failure()
+        clock.now += 10
+        assert breaker.state == "half_open"
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        assert breaker.state == "closed"
+
+    def test_failed_probe_reopens(self, clock):
+        """Ошибка пробного вызова снова размыкает цепь."""
+        breaker = CircuitBreaker("t", failure_threshold=3, reset_timeout=10, clock=clock)
+        for _ in range(3):
+            breaker.record_failure()
+        clock.now += 10
+        breaker.before_call()
+        breaker.record_failure()
+        assert breaker.state == "open"
+
+
+class TestBackoff:
+    """Тесты расчёта задержки перед повтором."""
+
+    def test_delay_bounded_by_exponential_and_cap(self):
+        """Задержка не превышает base * 2**attempt и max_delay."""
+        for attempt in range(6):
+            delay = backoff_delay(attempt, base_delay=0.1, max_delay=1.0)
+            assert 0.0 <= delay <= min(1.0, 0.1 * 2 ** attempt)
+
+
+class TestCallWithRetry:
+    """Тесты функции call_with_retry."""
+
+    async def test_retries_failed_results(self, clock):
+        """Ошибочный результат повторяется, пока не будет получен успешный."""
+        results = iter([503, 503, 200])
+        breaker = CircuitBreaker("t", failure_threshold=10, reset_timeout=10, clock=clock)
+
+        async def call():
+            return next(results)
+
+        result = await call_with_retry(
+            call, breaker=breaker, retries=3, base_delay=0, max_delay=0,
+            is_failure=lambda status: status >= 500,
+        )
+        assert result == 200
+        assert breaker.snapshot()["failures"] == 2
+
+    async def test_exhausted_retries_raise_last_error(self, clock):
+        """После исчерпания повторов пробрасывается исключение."""
+        calls = []
+        breaker = CircuitBreaker("t", failure_threshold=10, reset_timeout=10, clock=clock)
+
+        async def call():
+            calls.append(1)
+            raise ConnectionError("down")
+
+        with pytest.raises(ConnectionError):
+            await call_with_retry(
+                call, breaker=breaker, retries=2, base_delay=0, max_delay=0,
+                retry_exceptions=(ConnectionError,),
+            )
+        assert len(calls) == 3
+
+    async def test_other_exceptions_not_retried(self, clock):
+        """Исключения вне retry_exceptions не повторяются и не считаются сбоем."""
+        breaker = CircuitBreaker("t", failure_threshold=1, reset_timeout=10, clock=clock)
+
+        async def call():
+            raise ValueError("bad")
+
+        with pytest.raises(ValueError):
+            await call_with_retry(
+                call, breaker=breaker, retries=2, base_delay=0, max_delay=0,
+                retry_exceptions=(ConnectionError,),
+            )
+        assert breaker.state == "closed"
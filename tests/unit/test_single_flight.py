@@ -0,0 +1,132 @@
+"""Unit-тесты для объединения одновременных запросов (single-flight)."""
+
+import asyncio
+import pytest
+
+from src.services.single_flight import SingleFlight
+
+
+class TestSingleFlight:
+    """Тесты класса SingleFlight."""
+
+    async def test_concurrent_calls_share_one_request(self):
+        """Одновременные вызовы с одним ключом выполняют запрос один раз."""
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "graph"
+
+        results = await asyncio.gather(*(flight.do("map:1", fetch) for _ in range(5)))
+
+        assert results == ["graph"] * 5
+        assert calls == 1
+        assert flight.stats()["coalesced"] == 4
+        assert flight.in_flight() == 0
+
+    async def test_different_keys_run_separately(self):
+        """Разные ключи не объединяются."""
+        flight = SingleFlight()
+        calls = []
+
+        async def fetch(key):
+            calls.append(key)
+            await asyncio.sleep(0)
+            return key
+
+        await asyncio.gather(flight.do(1, lambda: fetch(1)), flight.do(2, lambda: fetch(2)))
+        assert sorted(calls) == [1, 2]
+
+    async def test_exception_propagates_to_all_waiters(self):
+        """Исключение запроса получают все ожидающие."""
+        flight = SingleFlight()
+
+        async def fetch():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream failed")
+
+        results = await asyncio.gather(
+            *(flight.do("k", fetch) for _ in range(3)), return_exceptions=True
+        )
+        assert all(isinstance(r, RuntimeError) for r in results)
+        assert flight.in_flight() == 0
+
+    async def test_next_call_after_failure_retries(self):
+        """После ошибки следующий вызов выполняет новый запрос."""
+        flight = SingleFlight()
+        attempts = 0
+
+        async def fetch():
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RuntimeError("boom")
+            return "ok"
+
+        with pytest.raises(RuntimeError):
+            await flight.do("k", fetch)
+        assert await flight.do("k", fetch) == "ok"
+
+    async def test_cancelled_waiter_does_not_cancel_others(self):
+        """Отмена одного ожидающего не прерывает запрос для остальных."""
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def fetch():
+            await release.wait()
+            return "value"
+
+        first = asyncio.create_task(flight.do("k", fetch))
+        second = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.sleep(0)
+        release.set()
+
+        assert await second == "value"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    async def test_request_cancelled_when_all_waiters_gone(self):
+        """Запрос отменяется, когда его перестают ждать все вызовы."""
+        flight = SingleFlight()
+        cancelled = asyncio.Event()
+
+        async def fetch():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        waiter = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait_for(cancelled.wait(), timeout=1)
+        await asyncio.sleep(0)
+        assert flight.in_flight() == 0
+
+    async def test_call_right_after_cancellation_gets_result(self):
+        """Вызов сразу после отмены единственного ожидающего запускает новый запрос, а не получает отмену."""
+        flight = SingleFlight()
+        calls = 0
+
+        async def fetch():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01 if calls > 1 else 10)
+            return calls
+
+        waiter = asyncio.create_task(flight.do("k", fetch))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        # Второй вызов запускается в той же итерации цикла, что и отмена первого
+        second = asyncio.create_task(flight.do("k", fetch))
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+        assert await asyncio.wait_for(second, timeout=1) == 2
+        assert flight.stats()["calls"] == 2
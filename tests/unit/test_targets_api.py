@@ -0,0 +1,471 @@
+"""Unit-тесты для HTTP-клиента Directum Targets API."""
+
+import asyncio
+import json
+import os
+import tempfile
+import pytest
+import httpx
+from unittest.mock import patch
+from fastapi import HTTPException
+
+from src.models.targets import TargetDetail, TargetsMap
+from src.services import targets_api
+
+
+TARGETS_ENV = {
+    "TARGETS_BASE_URL": "https://targets.test",
+    "TARGETS_TOKEN": "Bearer test",
+    "TARGETS_RETRY_BASE_DELAY": "0",
+}
+
+
+@pytest.fixture
+def mock_client():
+    """
+    Подменяет общий клиент Targets API клиентом с MockTransport.
+
+    Возвращает функцию, принимающую обработчик запросов и список,
+    в который записываются все выполненные запросы.
+    """
+    requests_log = []
+
+    def install(handler):
+        def logging_handler(request: httpx.Request) -> httpx.Response:
+            requests_log.append(request)
+            return handler(request)
+
+        targets_api._client = httpx.AsyncClient(transport=httpx.MockTransport(logging_handler))
+        return requests_log
+
+    with patch.dict(os.environ, TARGETS_ENV):
+        yield install
+    targets_api._client = None
+
+
+class TestClientLifecycle:
+    """Тесты жизненного цикла общего HTTP-клиента."""
+
+    async def test_get_client_reuses_instance(self):
+        """Повторные вызовы возвращают один и тот же клиент."""
+        await targets_api.shutdown()
+        client = targets_api.get_client()
+        assert targets_api.get_client() is client
+        await targets_api.shutdown()
+
+    async def test_shutdown_closes_client(self):
+        """После shutdown клиент закрыт и будет создан заново."""
+        await targets_api.startup()
+        client = targets_api.get_client()
+        await targets_api.shutdown()
+        assert client.is_closed
+        assert targets_api.get_client() is not client
+        await targets_api.shutdown()
+
+    async def test_pool_limits_from_env(self):
+        """Лимиты пула берутся из переменных окружения."""
+        with patch.dict(os.environ, {"TARGETS_MAX_CONNECTIONS": "7", "TARGETS_HTTP2": "false"}):
+            client = targets_api._create_client()
+        pool = client._transport._pool
+        assert pool._max_connections == 7
+        await client.aclose()
+
+
+class TestFetchers:
+    """Тесты функций загрузки данных через общий клиент."""
+
+    async def test_get_maps_uses_shared_client(self, mock_client):
+        """Список карт загружается через общий клиент."""
+        log = mock_client(lambda r: httpx.Response(200, json={"value": [{"Id": 1, "Name": "Карта"}]}))
+        maps = await targets_api.get_maps()
+        maps_again = await targets_api.get_maps()
+        assert maps[0].Name == "Карта"
+        assert len(maps_again) == 1
+        assert len(log) == 2
+        assert log[0].headers["Authorization"] == "Bearer test"
+
+    async def test_get_target_not_found(self, mock_client):
+        """404 от API превращается в HTTPException 404."""
+        mock_client(lambda r: httpx.Response(404, text="not found"))
+        with pytest.raises(HTTPException) as exc:
+            await targets_api.get_target(5)
+        assert exc.value.status_code == 404
+
+    async def test_timeout_maps_to_504(self, mock_client):
+        """Таймаут API превращается в HTTPException 504."""
+        def handler(request):
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        mock_client(handler)
+        with pytest.raises(HTTPException) as exc:
+            await targets_api.get_key_results(5)
+        assert exc.value.status_code == 504
+
+
+class TestRequestPipeline:
+    """Тесты общего исполнителя запросов _request."""
+
+    async def test_missing_settings(self):
+        """Без TARGETS_BASE_URL и TARGETS_TOKEN запрос не выполняется."""
+        with patch.dict(os.environ, {"TARGETS_BASE_URL": "", "TARGETS_TOKEN": ""}):
+            with pytest.raises(HTTPException) as exc:
+                await targets_api.fetch_maps_raw()
+        assert exc.value.status_code == 500
+
+    async def test_maps_query_projection_and_filter(self, mock_client):
+        """Список карт запрашивается с $select по читаемым полям модели и $filter по периоду."""
+        log = mock_client(lambda r: httpx.Response(200, json={"value": []}))
+        await targets_api.get_maps(period="2026 O'Q")
+        params = log[0].url.params
+        assert params["$select"] == "Id,Name,Code,PeriodLabel,AchievementPercentage,Status"
+        assert params["$filter"] == "PeriodLabel eq '2026 O''Q'"
+
+    async def test_target_projection_skips_optional_fields(self, mock_client):
+        """В $select цели нет необязательных полей, которых может не быть на сервере."""
+        log = mock_client(lambda r: httpx.Response(200, json={"Id": 1}))
+        await targets_api.get_target(1)
+        selected = log[0].url.params["$select"].split(",")
+        assert set(selected) <= set(TargetDetail.model_fields)
+        assert not {"KeyResultsByMetrics", "CodeIndex", "PeriodData", "Status"} & set(selected)
+
+    async def test_projection_can_be_disabled(self, mock_client):
+        """TARGETS_ODATA_SELECT=false отключает $select."""
+        log = mock_client(lambda r: httpx.Response(200, json={"Id": 1}))
+        with patch.dict(os.environ, {"TARGETS_ODATA_SELECT": "false"}):
+            await targets_api.get_target(1)
+        assert "$select" not in log[0].url.params
+
+    async def test_map_periods(self, mock_client):
+        """Периоды запрашиваются отдельной проекцией и возвращаются уникальными."""
+        log = mock_client(lambda r: httpx.Response(200, json={"value": [
+            {"PeriodLabel": "2026"}, {"PeriodLabel": "2025"}, {"PeriodLabel": "2026"}, {"PeriodLabel": ""},
+        ]}))
+        raw = await targets_api.fetch_map_periods_raw()
+        assert targets_api.parse_map_periods(raw) == ["2025", "2026"]
+        assert log[0].url.params["$select"] == "PeriodLabel"
+
+    async def test_post_sends_json_body(self, mock_client):
+        """GetTargetsMap отправляется POST-запросом с mapId в теле."""
+        log = mock_client(lambda r: httpx.Response(200, json={"Nodes": []}))
+        await targets_api.fetch_map_graph_raw(42)
+        assert log[0].method == "POST"
+        assert log[0].url.path == "/integration/odata/Targets/GetTargetsMap"
+        assert log[0].content == b'{"mapId":42}'
+
+    async def test_response_size_limit(self, mock_client):
+        """Ответ больше TARGETS_MAX_RESPONSE_MB отклоняется с 502."""
+        mock_client(lambda r: httpx.Response(200, content=b"[" + b"0," * 1000 + b"0]"))
+        with patch.dict(os.environ, {"TARGETS_MAX_RESPONSE_MB": "0.001"}):
+            with pytest.raises(HTTPException) as exc:
+                await targets_api.fetch_maps_raw()
+        assert exc.value.status_code == 502
+
+    async def test_invalid_json(self, mock_client):
+        """Невалидный JSON в ответе превращается в 502."""
+        mock_client(lambda r: httpx.Response(200, content=b"<html>"))
+        with pytest.raises(HTTPException) as exc:
+            await targets_api.fetch_target_raw(1)
+        assert exc.value.status_code == 502
+
+    async def test_requests_pass_through_limiter(self, mock_client):
+        """Каждая попытка запроса проходит через общий лимитер."""
+        responses = iter([httpx.Response(503), httpx.Response(200, json={"Id": 1})])
+        mock_client(lambda r: next(responses))
+        with patch.dict(os.environ, {"TARGETS_MAX_CONCURRENT_REQUESTS": "3"}):
+            targets_api._limiter = None
+            await targets_api.fetch_target_raw(1)
+        stats = targets_api.limiter_stats()
+        assert stats["acquired"] == 2
+        assert stats["max_concurrent"] == 3
+        assert stats["in_flight"] == 0
+
+    async def test_request_stats(self, mock_client):
+        """Время, объём и ошибки запросов учитываются по endpoint'ам."""
+        responses = iter([httpx.Response(200, json={"Id": 1}), httpx.Response(403)])
+        mock_client(lambda r: next(responses))
+        before = targets_api.request_stats().get("target", {"requests": 0, "errors": 0})
+        await targets_api.fetch_target_raw(1)
+        with pytest.raises(HTTPException):
+            await targets_api.fetch_target_raw(2)
+
+        stats = targets_api.request_stats()["target"]
+        assert stats["requests"] == before["requests"] + 2
+        assert stats["errors"] == before["errors"] + 1
+        assert stats["bytes"] > 0
+
+
+class TestConditionalRequests:
+    """Тесты условных запросов с ETag/Last-Modified."""
+
+    async def test_validators_sent_and_updated(self, mock_client):
+        """Сохранённые валидаторы отправляются, новые берутся из ответа 200."""
+        log = mock_client(lambda r: httpx.Response(
+            200, json={"Id": 1}, headers={"ETag": '"v2"', "Last-Modified": "Wed, 01 Jan 2026 00:00:00 GMT"},
+        ))
+        validators = {"etag": '"v1"'}
+        await targets_api.fetch_target_raw(1, validators)
+        assert log[0].headers["If-None-Match"] == '"v1"'
+        assert validators == {"etag": '"v2"', "last_modified": "Wed, 01 Jan 2026 00:00:00 GMT"}
+
+    async def test_not_modified(self, mock_client):
+        """Ответ 304 на условный запрос превращается в NotModified."""
+        mock_client(lambda r: httpx.Response(304))
+        with pytest.raises(targets_api.NotModified):
+            await targets_api.fetch_map_graph_raw(5, {"etag": '"v1"'})
+        assert targets_api.request_stats()["map_graph"]["not_modified"] >= 1
+
+    async def test_bundle_partially_modified(self, mock_client):
+        """Если изменились только КР, неизменённая цель загружается повторно без условия."""
+        def handler(request):
+            if "ITargetsTargets" in request.url.path and "If-None-Match" in request.headers:
+                return httpx.Response(304)
+            if "ITargetsTargets" in request.url.path:
+                return httpx.Response(200, json={"Id": 7}, headers={"ETag": '"d"'})
+            return httpx.Response(200, json={"Payload": {"Data": []}}, headers={"ETag": '"k2"'})
+
+        log = mock_client(handler)
+        validators = {"detail": {"etag": '"d"'}, "key_results": {"etag": '"k1"'}}
+        raw = await targets_api.fetch_target_bundle_raw(7, validators)
+        assert raw["detail"] == {"Id": 7}
+        assert validators == {"detail": {"etag": '"d"'}, "key_results": {"etag": '"k2"'}}
+        assert len(log) == 3
+
+
+class TestParsers:
+    """Тесты разбора ответов в модели."""
+
+    def test_parse_maps_skips_invalid_records(self):
+        """Невалидные записи пропускаются, порядок остальных сохраняется."""
+        data = {"value": [{"Id": 1, "Name": "A"}, {"Name": "без Id"}, "мусор", {"Id": 3}]}
+        assert [m.Id for m in targets_api.parse_maps(data)] == [1, 3]
+
+    def test_parse_key_results(self):
+        """КР разбираются из Payload.Data; записи без Description пропускаются."""
+        data = {"Payload": {"Data": [{"Description": "КР 1", "AchievementPercentage": "50"}, {"Metric": "%"}]}}
+        key_results = targets_api.parse_key_results(data)
+        assert [kr.Description for kr in key_results] == ["КР 1"]
+        assert targets_api.parse_key_results({}) == []
+
+
+class TestStreamingMapGraph:
+    """Тесты потокового разбора графа карты."""
+
+    @staticmethod
+    def chunked(data: bytes, size: int = 16) -> httpx.Response:
+        """Ответ 200, тело которого приходит фрагментами по size байт."""
+        async def stream():
+            for i in range(0, len(data), size):
+                yield data[i:i + size]
+
+        return httpx.Response(200, content=stream())
+
+    async def test_nodes_parsed_from_chunks(self, mock_client):
+        """Граф из фрагментированного ответа совпадает с разбором целиком."""
+        raw = {
+            "Nodes": [{"TargetId": i, "Name": f"Цель {i}", "ChildIds": [i + 1]} for i in range(50)],
+            "Map": {"Id": 42, "Name": "Карта"},
+        }
+        data = json.dumps(raw, ensure_ascii=False).encode("utf-8")
+        mock_client(lambda r: self.chunked(data))
+        graph = await targets_api.fetch_map_graph(42)
+        assert graph == targets_api.parse_map_graph(raw)
+        assert targets_api.parse_map_graph(graph) is graph
+        assert targets_api.request_stats()["map_graph"]["bytes"] >= len(data)
+
+    async def test_body_copied_to_file(self, mock_client):
+        """Исходные байты ответа копируются в переданный файл по мере разбора."""
+        data = json.dumps({"Nodes": [{"TargetId": 1}], "Map": {"Id": 7}}).encode("utf-8")
+        mock_client(lambda r: self.chunked(data))
+        with tempfile.TemporaryFile() as body:
+            body.write(b"from a failed attempt")
+            graph = await targets_api.fetch_map_graph(7, body=body)
+            body.seek(0)
+            assert body.read() == data
+        assert graph.Map.Id == 7
+
+    async def test_invalid_node_maps_to_422(self, mock_client):
+        """Невалидный узел даёт 422, как и разбор ответа целиком."""
+        mock_client(lambda r: self.chunked(b'{"Nodes": [{"TargetId": "x"}], "Map": null}'))
+        with pytest.raises(HTTPException) as exc:
+            await targets_api.fetch_map_graph(1)
+        assert exc.value.status_code == 422
+
+    async def test_truncated_body_maps_to_502(self, mock_client):
+        """Обрезанный ответ даёт 502."""
+        mock_client(lambda r: self.chunked(b'{"Nodes": [{"TargetId": 1}, {"Targ'))
+        with pytest.raises(HTTPException) as exc:
+            await targets_api.fetch_map_graph(1)
+        assert exc.value.status_code == 502
+
+    async def test_size_limit_applies_while_streaming(self, mock_client):
+        """Лимит TARGETS_MAX_RESPONSE_MB проверяется и при потоковом разборе."""
+        nodes = ",".join('{"TargetId": %d}' % i for i in range(200))
+        mock_client(lambda r: self.chunked(('{"Nodes": [%s]}' % nodes).encode()))
+        with patch.dict(os.environ, {"TARGETS_MAX_RESPONSE_MB": "0.001"}):
+            with pytest.raises(HTTPException) as exc:
+                await targets_api.fetch_map_graph(1)
+        assert exc.value.status_code == 502
+
+    async def test_not_modified(self, mock_client):
+        """Ответ 304 на условный запрос не передаётся в потоковый разбор."""
+        mock_client(lambda r: httpx.Response(304))
+        with pytest.raises(targets_api.NotModified):
+            await targets_api.fetch_map_graph(5, {"etag": '"v1"'})
+
+
+class TestPaging:
+    """Тесты постраничной загрузки OData."""
+
+    async def test_follows_next_links(self, mock_client):
+        """Без @odata.count страницы загружаются по цепочке @odata.nextLink."""
+        def handler(request):
+            if "$skiptoken" not in str(request.url):
+                return httpx.Response(200, json={
+                    "value": [{"Id": 1}],
+                    "@odata.nextLink": "ITargetsTargetsMaps?$skiptoken=2",
+                })
+            return httpx.Response(200, json={"value": [{"Id": 2}]})
+
+        log = mock_client(handler)
+        pages = [page async for page in targets_api.iter_maps_pages()]
+        assert pages == [[{"Id": 1}], [{"Id": 2}]]
+        assert str(log[1].url) == "https://targets.test/Integration/odata/ITargetsTargetsMaps?$skiptoken=2"
+
+    async def test_skip_pages_loaded_concurrently(self, mock_client):
+        """При известном @odata.count оставшиеся страницы запрашиваются по $skip и отдаются по порядку."""
+        def handler(request):
+            skip = int(request.url.params.get("$skip", 0))
+            body = {"value": [{"Id": skip}, {"Id": skip + 1}]}
+            if skip == 0:
+                body.update({"@odata.count": 6, "@odata.nextLink": "https://targets.test/x?$skip=2"})
+            return httpx.Response(200, json=body)
+
+        log = mock_client(handler)
+        raw = await targets_api.fetch_maps_raw("2026")
+        assert [item["Id"] for item in raw["value"]] == [0, 1, 2, 3, 4, 5]
+        assert sorted(r.url.params.get("$skip") for r in log[1:]) == ["2", "4"]
+        assert all(r.url.params["$top"] == "2" for r in log[1:])
+        assert all("PeriodLabel" in r.url.params["$filter"] for r in log)
+        assert all(r.url.params["$orderby"] == "Id" for r in log)
+
+    def test_stable_order_keeps_user_order(self):
+        """Заданный порядок сохраняется, Id дописывается как разрешитель ничьих."""
+        assert targets_api._stable_order({})["$orderby"] == "Id"
+        assert targets_api._stable_order({"$orderby": "Name desc"})["$orderby"] == "Name desc,Id"
+        assert targets_api._stable_order({"$orderby": "Id desc"})["$orderby"] == "Id desc"
+
+    async def test_foreign_next_link_rejected(self, mock_client):
+        """Ссылка на страницу другого сервера не выполняется (токен не уходит наружу)."""
+        log = mock_client(lambda r: httpx.Response(200, json={
+            "value": [], "@odata.nextLink": "https://evil.test/ITargetsTargetsMaps?$skiptoken=2",
+        }))
+        with pytest.raises(HTTPException) as exc:
+            await targets_api.fetch_maps_raw()
+        assert exc.value.status_code == 502
+        assert len(log) == 1
+
+
+class TestResilience:
+    """Тесты повторов и circuit breaker'а при обращении к Targets API."""
+
+    async def test_transient_error_is_retried(self, mock_client):
+        """Ответ 503 повторяется, и успешный повтор возвращает данные."""
+        responses = iter([httpx.Response(503), httpx.Response(200, json={"value": [{"Id": 1}]})])
+        log = mock_client(lambda r: next(responses))
+        maps = await targets_api.get_maps()
+        assert maps[0].Id == 1
+        assert len(log) == 2
+
+    async def test_timeout_retried_then_504(self, mock_client):
+        """Таймаут повторяется TARGETS_RETRIES раз, затем превращается в 504."""
+        def handler(request):
+            raise httpx.ReadTimeout("timeout", request=request)
+
+        log = mock_client(handler)
+        with patch.dict(os.environ, {"TARGETS_RETRIES": "2"}):
+            with pytest.raises(HTTPException) as exc:
+                await targets_api.get_target(5)
+        assert exc.value.status_code == 504
+        assert len(log) == 3
+
+    async def test_client_errors_are_not_retried(self, mock_client):
+        """Ошибки 4xx не повторяются и не размыкают цепь."""
+        log = mock_client(lambda r: httpx.Response(404))
+        with pytest.raises(HTTPException):
+            await targets_api.get_map_graph(5)
+        assert len(log) == 1
+        assert targets_api.breaker_states()["map_graph"]["state"] == "closed"
+
+    async def test_open_breaker_rejects_without_request(self, mock_client):
+        """После порога ошибок запросы отклоняются с 503 без обращения к серверу."""
+        log = mock_client(lambda r: httpx.Response(500, text="down"))
+        with patch.dict(os.environ, {"TARGETS_RETRIES": "0", "TARGETS_BREAKER_THRESHOLD": "2"}):
+            for _ in range(2):
+                with pytest.raises(HTTPException):
+                    await targets_api.get_key_results(5)
+            with pytest.raises(HTTPException) as exc:
+                await targets_api.get_key_results(5)
+
+        assert exc.value.status_code == 503
+        assert "Retry-After" in exc.value.headers
+        assert len(log) == 2
+        assert targets_api.breaker_states()["key_results"]["state"] == "open"
+        # Цепи других endpoint'ов не затронуты
+        mock_client(lambda r: httpx.Response(200, json={"value": []}))
+        assert await targets_api.get_maps() == []
+
+
+class TestGetTargetBundle:
+    """Тесты параллельной загрузки цели и КР."""
+
+    async def test_returns_detail_and_key_results(self, mock_client):
+        """Возвращает детали цели и КР одним вызовом."""
+        def handler(request):
+            if "GetKeyResults" in request.url.path:
+                return httpx.Response(200, json={"Payload": {"Data": [{"Description": "КР 1"}]}})
+            return httpx.Response(200, json={"Id": 7, "Name": "Цель"})
+
+        log = mock_client(handler)
+        detail, key_results = await targets_api.get_target_bundle(7)
+        assert detail.Id == 7
+        assert key_results[0].Description == "КР 1"
+        assert len(log) == 2
+
+    async def test_requests_run_concurrently(self):
+        """Запросы деталей и КР выполняются одновременно."""
+        in_flight = 0
+        max_in_flight = 0
+
+        async def fake_call(target_id):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return target_id
+
+        with patch.object(targets_api, "get_target", side_effect=fake_call), \
+                patch.object(targets_api, "get_key_results", side_effect=fake_call):
+            await targets_api.get_target_bundle(1)
+        assert max_in_flight == 2
+
+    async def test_error_propagates_and_cancels_sibling(self):
+        """Ошибка одного запроса пробрасывается, второй запрос отменяется."""
+        cancelled = []
+
+        async def slow_detail(target_id):
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(target_id)
+                raise
+
+        async def failing_key_results(target_id):
+            raise HTTPException(status_code=404, detail="not found")
+
+        with patch.object(targets_api, "get_target", side_effect=slow_detail), \
+                patch.object(targets_api, "get_key_results", side_effect=failing_key_results):
+            with pytest.raises(HTTPException) as exc:
+                await targets_api.get_target_bundle(3)
+        assert exc.value.status_code == 404
+        assert cancelled == [3]
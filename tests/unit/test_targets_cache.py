@@ -0,0 +1,372 @@
+"""Unit-тесты для общего (межсессионного) и дискового кэшей Targets."""
+
+import asyncio
+import json
+import os
+import tempfile
+import pytest
+from fastapi import HTTPException
+from unittest.mock import AsyncMock, patch
+
+from src.services import targets_api, targets_cache
+from src.services.disk_cache import DiskCache, JsonFile
+
+
+GRAPH_RAW = {"Nodes": [{"TargetId": 1, "Code": "T-1"}], "Map": {"Id": 5, "Name": "Карта"}}
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache():
+    """Сбрасывает общий кэш до и после каждого теста, дисковый кэш выключен."""
+    targets_cache.clear()
+    with patch.dict(os.environ, {
+        "TARGETS_BASE_URL": "https://targets.test",
+        "TARGETS_TOKEN": "token-a",
+        "DISK_CACHE_ENABLED": "false",
+    }):
+        yield
+    targets_cache.clear()
+
+
+async def fetch_streamed(map_id, validators=None, body=None):
+    """Имитирует fetch_map_graph: копирует тело ответа в body и возвращает разобранный граф."""
+    if body is not None:
+        body.write(json.dumps(GRAPH_RAW, ensure_ascii=False).encode("utf-8"))
+    return targets_api.parse_map_graph(GRAPH_RAW)
+
+
+@pytest.fixture
+def graph_fetch():
+    """Подменяет загрузку графа из Targets API."""
+    with patch.object(targets_api, "fetch_map_graph", new=AsyncMock(side_effect=fetch_streamed)) as mock:
+        yield mock
+
+
+@pytest.fixture
+def disk_enabled(tmp_path):
+    """Включает дисковый кэш во временной директории."""
+    with patch.dict(os.environ, {"DISK_CACHE_ENABLED": "true", "DATA_DIR": str(tmp_path)}):
+        targets_cache.clear()
+        yield tmp_path / "cache"
+
+
+class TestCacheKey:
+    """Тесты формирования ключей общего кэша."""
+
+    def test_key_does_not_contain_raw_token(self):
+        """Ключ содержит хэш токена, а не сам токен."""
+        key = targets_api.cache_key("map_graph", 5)
+        assert key[0] == "https://targets.test"
+        assert "token-a" not in key[1]
+        assert key[2:] == ("map_graph", 5)
+
+    def test_different_tokens_give_different_keys(self):
+        """Разные токены дают разные ключи."""
+        key_a = targets_api.cache_key("maps")
+        with patch.dict(os.environ, {"TARGETS_TOKEN": "token-b"}):
+            key_b = targets_api.cache_key("maps")
+        assert key_a != key_b
+
+
+class TestSharedCache:
+    """Тесты загрузки через общий кэш."""
+
+    async def test_second_call_served_from_cache(self, graph_fetch):
+        """Повторный запрос графа не обращается к Targets API."""
+        first = await targets_cache.get_map_graph(5)
+        second = await targets_cache.get_map_graph(5)
+        assert first is second
+        assert first[0].code == "T-1"
+        assert graph_fetch.await_count == 1
+
+    async def test_token_change_isolates_entries(self, graph_fetch):
+        """Данные, загруженные под одним токеном, не отдаются под другим."""
+        await targets_cache.get_map_graph(5)
+        with patch.dict(os.environ, {"TARGETS_TOKEN": "token-b"}):
+            await targets_cache.get_map_graph(5)
+        assert graph_fetch.await_count == 2
+
+    async def test_freshness_window(self, graph_fetch):
+        """После окна свежести данные загружаются заново."""
+        with patch.dict(os.environ, {"SHARED_CACHE_TTL": "0"}):
+            targets_cache.clear()
+            await targets_cache.get_map_graph(5)
+            await targets_cache.get_map_graph(5)
+        assert graph_fetch.await_count == 2
+
+    async def test_concurrent_misses_are_coalesced(self):
+        """Одновременные промахи по одной карте дают один запрос к Targets API."""
+        async def slow_fetch(map_id, validators=None):
+            await asyncio.sleep(0.01)
+            return GRAPH_RAW
+
+        with patch.object(targets_api, "fetch_map_graph", new=AsyncMock(side_effect=slow_fetch)) as mock:
+            graphs = await asyncio.gather(*(targets_cache.get_map_graph(5) for _ in range(10)))
+
+        assert mock.await_count == 1
+        assert all(g is graphs[0] for g in graphs)
+        assert targets_cache.stats()["single_flight"]["coalesced"] == 9
+
+
+class TestConditionalRefresh:
+    """Тесты условных запросов при обновлении устаревших записей."""
+
+    @pytest.fixture
+    def etag_fetch(self):
+        """Загрузка графа, отвечающая 304, если передан сохранённый ETag."""
+        calls = []
+
+        async def fetch(map_id, validators=None, body=None):
+            calls.append(dict(validators or {}))
+            if validators and validators.get("etag") == '"v1"':
+                raise targets_api.NotModified()
+            if validators is not None:
+                validators["etag"] = '"v1"'
+            return await fetch_streamed(map_id, body=body)
+
+        with patch.object(targets_api, "fetch_map_graph", side_effect=fetch):
+            yield calls
+
+    async def test_not_modified_reuses_parsed_graph(self, etag_fetch):
+        """На 304 возвращается прежний разобранный объект, а его возраст обнуляется."""
+        with patch.dict(os.environ, {"SHARED_CACHE_TTL": "0"}):
+            targets_cache.clear()
+            first = await targets_cache.get_map_graph(5)
+            with patch.object(targets_api, "parse_map_graph", side_effect=AssertionError("no parse")):
+                second, age = await targets_cache.get_map_graph_with_age(5)
+
+        assert second is first
+        assert age == 0.0
+        assert etag_fetch == [{}, {"etag": '"v1"'}]
+        assert targets_cache.stats()["revalidated"] == 1
+
+    async def test_refresh_is_conditional(self, etag_fetch):
+        """Принудительное обновление тоже отправляет сохранённый ETag."""
+        first = await targets_cache.get_map_graph(5)
+        assert await targets_cache.refresh_map_graph(5) is first
+        assert etag_fetch[-1] == {"etag": '"v1"'}
+
+    async def test_validators_survive_restart(self, etag_fetch, disk_enabled):
+        """Валидаторы сохраняются на диске и используются после перезапуска."""
+        await targets_cache.get_map_graph(5)
+        targets_cache.clear()
+        graph = await targets_cache.get_map_graph(5)
+        assert await targets_cache.refresh_map_graph(5) is graph
+        assert etag_fetch[-1] == {"etag": '"v1"'}
+
+
+class TestTargetBundleValidators:
+    """Тесты валидаторов пакета цели (детали + КР) при частичных сбоях."""
+
+    async def test_partial_failure_keeps_stored_validators(self):
+        """Если КР не загрузились, новый ETag деталей не сохраняется и следующее обновление получает новые данные."""
+        server = {"name": "old", "etag": '"d1"', "kr_fails": False}
+
+        async def fetch_target(target_id, validators=None):
+            if validators is not None and validators.get("etag") == server["etag"]:
+                raise targets_api.NotModified()
+            if validators is not None:
+                validators["etag"] = server["etag"]
+            return {"Id": target_id, "Name": server["name"]}
+
+        async def fetch_key_results(target_id, validators=None):
+            if server["kr_fails"]:
+                raise HTTPException(status_code=404, detail="КР не найдены")
+            if validators is not None and validators.get("etag") == '"k1"':
+                raise targets_api.NotModified()
+            if validators is not None:
+                validators["etag"] = '"k1"'
+            return {"Payload": {"Data": []}}
+
+        with patch.object(targets_api, "fetch_target_raw", side_effect=fetch_target), \
+                patch.object(targets_api, "fetch_key_results_raw", side_effect=fetch_key_results), \
+                patch.dict(os.environ, {"SHARED_CACHE_TTL": "0"}):
+            detail, _ = await targets_cache.get_target_bundle(7)
+            assert detail.Name == "old"
+
+            server.update(name="new", etag='"d2"', kr_fails=True)
+            with pytest.raises(HTTPException):
+                await targets_cache.get_target_bundle(7)
+
+            server["kr_fails"] = False
+            detail, _ = await targets_cache.get_target_bundle(7)
+            assert detail.Name == "new"
+
+
+class TestMapsByPeriod:
+    """Тесты кэширования списка карт по фильтру периода."""
+
+    async def test_each_filter_cached_separately(self):
+        """Каждый фильтр по периоду кэшируется под своим ключом."""
+        raw = {"value": [{"Id": 1, "PeriodLabel": "2026"}]}
+        with patch.object(targets_api, "fetch_maps_raw", new=AsyncMock(return_value=raw)) as mock:
+            await targets_cache.get_maps("2026")
+            await targets_cache.get_maps("2026")
+            await targets_cache.get_maps()
+        assert [c.args[0] for c in mock.await_args_list] == ["2026", None]
+
+
+class TestIterMaps:
+    """Тесты потоковой выдачи списка карт."""
+
+    async def test_pages_streamed_then_cached(self):
+        """Страницы отдаются по мере загрузки, затем список берётся из кэша одной страницей."""
+        async def pages(period=None):
+            yield [{"Id": 1}]
+            yield [{"Id": 2}]
+
+        with patch.object(targets_api, "iter_maps_pages", side_effect=pages) as mock:
+            streamed = [[m.Id for m in page] async for page in targets_cache.iter_maps()]
+            cached = [[m.Id for m in page] async for page in targets_cache.iter_maps()]
+
+        assert streamed == [[1], [2]]
+        assert cached == [[1, 2]]
+        assert mock.call_count == 1
+        assert [m.Id for m in await targets_cache.get_maps()] == [1, 2]
+
+
+class TestMapGraphRefresh:
+    """Тесты возраста данных и принудительного обновления графа."""
+
+    async def test_age_of_fresh_and_cached_graph(self, graph_fetch):
+        """Только что загруженный граф имеет нулевой возраст, закэшированный — неотрицательный."""
+        graph, age = await targets_cache.get_map_graph_with_age(5)
+        assert age == 0.0
+        cached, cached_age = await targets_cache.get_map_graph_with_age(5)
+        assert cached is graph
+        assert cached_age >= 0.0
+        assert graph_fetch.await_count == 1
+
+    async def test_refresh_bypasses_cache(self, graph_fetch):
+        """refresh_map_graph запрашивает Targets API и обновляет общий кэш."""
+        first = await targets_cache.get_map_graph(5)
+        fresh = await targets_cache.refresh_map_graph(5)
+        assert fresh is not first
+        assert await targets_cache.get_map_graph(5) is fresh
+        assert graph_fetch.await_count == 2
+
+    async def test_background_refresh_calls_back(self, graph_fetch):
+        """Фоновое обновление передаёт свежий граф в callback."""
+        received = []
+        targets_cache.refresh_map_graph_in_background(5, received.append)
+        await asyncio.sleep(0.01)
+        assert received and received[0].map_info.Id == 5
+
+    async def test_disk_age_is_preserved(self, graph_fetch, disk_enabled):
+        """Граф, прочитанный с диска, сохраняет возраст дисковой записи."""
+        await targets_cache.get_map_graph(5)
+        targets_cache.clear()
+        _, age = await targets_cache.get_map_graph_with_age(5)
+        assert age > 0.0
+        assert graph_fetch.await_count == 1
+
+
+class TestDiskTier:
+    """Тесты дискового уровня кэша."""
+
+    async def test_response_survives_restart(self, graph_fetch, disk_enabled):
+        """После «перезапуска» (сброса памяти) граф читается с диска без запроса к API."""
+        await targets_cache.get_map_graph(5)
+        targets_cache.clear()
+        graph = await targets_cache.get_map_graph(5)
+
+        assert graph.map_info.Name == "Карта"
+        assert graph_fetch.await_count == 1
+        assert any(p.suffix == ".json" for p in disk_enabled.iterdir())
+
+    async def test_streamed_graph_saved_as_raw_body(self, graph_fetch, disk_enabled):
+        """Потоково разобранный граф сохраняется на диск исходным телом ответа, без сериализации моделей."""
+        first = await targets_cache.get_map_graph(5)
+        (path,) = [p for p in disk_enabled.iterdir() if p.suffix == ".json"]
+        assert json.loads(path.read_text(encoding="utf-8"))["data"] == GRAPH_RAW
+
+        targets_cache.clear()
+        restored = await targets_cache.get_map_graph(5)
+        assert graph_fetch.await_count == 1
+        assert [n.code for n in restored] == [n.code for n in first] == ["T-1"]
+        assert restored.map_info == first.map_info
+
+    async def test_stale_entry_served_and_refreshed(self, graph_fetch, disk_enabled):
+        """Устаревшая запись отдаётся сразу, а в фоне запрашивается свежая."""
+        await targets_cache.get_map_graph(5)
+        targets_cache.clear()
+
+        with patch.dict(os.environ, {"DISK_CACHE_FRESH_TTL": "0"}):
+            graph = await targets_cache.get_map_graph(5)
+            assert graph.map_info.Name == "Карта"
+            await asyncio.sleep(0.05)
+
+        assert graph_fetch.await_count == 2
+
+    async def test_too_old_entry_is_not_served(self, graph_fetch, disk_enabled):
+        """Запись старше DISK_CACHE_STALE_TTL не используется."""
+        await targets_cache.get_map_graph(5)
+        targets_cache.clear()
+        with patch.dict(os.environ, {"DISK_CACHE_STALE_TTL": "-1"}):
+            await targets_cache.get_map_graph(5)
+        assert graph_fetch.await_count == 2
+
+
+class TestDiskCache:
+    """Тесты класса DiskCache."""
+
+    def test_roundtrip_and_age(self, tmp_path):
+        """Сохранённые данные читаются вместе с возрастом записи."""
+        now = [1000.0]
+        cache = DiskCache(str(tmp_path), max_bytes=10_000, clock=lambda: now[0])
+        cache.set(("k", 1), {"value": [1, 2]})
+        now[0] += 30
+
+        data, age, meta = DiskCache(str(tmp_path), max_bytes=10_000, clock=lambda: now[0]).get(("k", 1))
+        assert data == {"value": [1, 2]}
+        assert age == 30
+        assert meta is None
+
+    def test_touch_resets_age_and_keeps_meta(self, tmp_path):
+        """touch() обнуляет возраст записи, не меняя данные и метаданные."""
+        now = [1000.0]
+        cache = DiskCache(str(tmp_path), max_bytes=10_000, clock=lambda: now[0])
+        cache.set("k", [1], meta={"validators": {"etag": '"v1"'}})
+        now[0] += 100
+        assert cache.touch("k")
+        assert not cache.touch("missing")
+
+        entry = DiskCache(str(tmp_path), max_bytes=10_000, clock=lambda: now[0]).get("k")
+        assert entry.age == 0
+        assert entry.data == [1]
+        assert entry.meta == {"validators": {"etag": '"v1"'}}
+
+    def test_json_file_copied_as_is(self, tmp_path):
+        """JsonFile записывается готовым JSON-текстом и читается как обычные данные."""
+        cache = DiskCache(str(tmp_path), max_bytes=10_000)
+        with tempfile.TemporaryFile() as f:
+            f.write(b'{"Nodes": [{"TargetId": 1}]}')
+            cache.set("k", JsonFile(f), meta={"validators": {"etag": '"v1"'}})
+
+        entry = DiskCache(str(tmp_path), max_bytes=10_000).get("k")
+        assert entry.data == {"Nodes": [{"TargetId": 1}]}
+        assert entry.meta == {"validators": {"etag": '"v1"'}}
+        assert cache.stats()["bytes"] == (tmp_path / DiskCache._filename("k")).stat().st_size
+
+    def test_size_cap_evicts_oldest(self, tmp_path):
+        """При превышении лимита удаляются самые старые записи."""
+        now = [1000.0]
+        cache = DiskCache(str(tmp_path), max_bytes=250, clock=lambda: now[0])
+        for i in range(3):
+            cache.set(i, "x" * 80)
+            now[0] += 1
+
+        assert cache.get(0) is None
+        assert cache.get(2) is not None
+        assert cache.stats()["evictions"] >= 1
+
+    def test_leftover_tmp_and_corrupt_files(self, tmp_path):
+        """Остатки прерванной записи удаляются, повреждённые файлы считаются промахом."""
+        (tmp_path / "partial.tmp").write_text("{")
+        (tmp_path / DiskCache._filename("bad")).write_text("not json")
+
+        cache = DiskCache(str(tmp_path), max_bytes=10_000)
+        assert cache.get("bad") is None
+        assert not (tmp_path / "partial.tmp").exists()
+        assert cache.stats()["errors"] == 1
+        assert cache.stats()["entries"] == 0